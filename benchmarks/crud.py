@@ -0,0 +1,180 @@
+"""
+Microbenchmark of the CRUD layer.
+
+Compares the single-statement queries of src.database against the previous
+ORM implementation (get the entity, mutate it, flush in an explicit
+transaction) and reports the database round trips and the time per call.
+Uses a temporary SQLite database unless --postgres-dsn is given, the round
+trip savings only show up in the timings against a real server. The upserts
+are built with the PostgreSQL dialect, SQLAlchemy renders their ON CONFLICT
+clause for SQLite as well.
+
+    python -m benchmarks.crud --postgres-dsn postgresql+asyncpg://.../bench
+"""
+
+import argparse
+import asyncio
+import time
+from collections import Counter
+from typing import Awaitable, Callable
+
+from sqlalchemy import event
+
+from benchmarks.load_test import create_sessionmaker
+
+
+async def legacy_post_lang(data, sessionmaker) -> None:
+    from src.database import User
+
+    async with sessionmaker() as session:
+        async with session.begin():
+            user = await session.get(User, data[0])
+
+            if user:
+                user.language = data[1]
+            else:
+                session.add(User(user_id=data[0], language=data[1]))
+
+
+async def legacy_update_data(data, sessionmaker) -> None:
+    from src.database import User
+
+    async with sessionmaker() as session:
+        async with session.begin():
+            user = await session.get(User, data[0])
+            user.latitude = data[1]["latitude"]
+            user.longitude = data[1]["longitude"]
+            user.temp_unit = data[1]["temp_unit"]
+            user.wind_unit = data[1]["wind_unit"]
+            user.timezone = data[1].get("timezone")
+
+
+async def legacy_get_language(user_id, sessionmaker) -> str:
+    from src.database import User
+
+    async with sessionmaker() as session:
+        async with session.begin():
+            user = await session.get(User, user_id)
+            return user.language
+
+
+async def legacy_get_profile(user_id, sessionmaker):
+    from src.database import User, UserProfile
+
+    async with sessionmaker() as session:
+        user = await session.get(User, user_id)
+
+    return UserProfile(
+        user_id=user.user_id,
+        language=user.language,
+        latitude=float(user.latitude),
+        longitude=float(user.longitude),
+        temp_unit=user.temp_unit,
+        wind_unit=user.wind_unit,
+        timezone=user.timezone,
+    )
+
+
+class RoundTrips:
+    """
+    Count the statements and the transaction control commands sent to the db.
+    """
+
+    def __init__(self, engine) -> None:
+        self.counts: Counter[str] = Counter()
+        event.listen(engine, "before_cursor_execute", self._statement)
+
+        for name in ("begin", "commit", "rollback"):
+            event.listen(engine, name, self._transaction(name.upper()))
+
+    def _statement(self, conn, cursor, statement, *args) -> None:
+        self.counts[statement.split(None, 1)[0].upper()] += 1
+
+    def _transaction(self, name: str) -> Callable:
+        def listener(conn) -> None:
+            # autocommit connections do not send transaction control commands
+            if conn.get_execution_options().get("isolation_level") != "AUTOCOMMIT":
+                self.counts[name] += 1
+
+        return listener
+
+
+async def measure(
+    iterations: int, call: Callable[[int], Awaitable], trips: RoundTrips
+) -> tuple[float, float, dict[str, int]]:
+    trips.counts.clear()
+    started = time.perf_counter()
+
+    for i in range(iterations):
+        await call(i)
+
+    elapsed = time.perf_counter() - started
+    return (
+        elapsed / iterations * 1e6,
+        sum(trips.counts.values()) / iterations,
+        dict(trips.counts),
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    import src.database as db
+
+    sessionmaker = await create_sessionmaker(args.postgres_dsn)
+    engine = sessionmaker.kw["bind"]
+    trips = RoundTrips(engine.sync_engine)
+
+    base = 2_000_000_000
+    settings = {
+        "latitude": 51.5,
+        "longitude": -0.12,
+        "temp_unit": "celsius",
+        "wind_unit": "kmph",
+        "timezone": "Europe/London",
+    }
+    cases = {
+        "post_lang": (
+            lambda i: legacy_post_lang((base + i, "EN"), sessionmaker),
+            lambda i: db.post_lang((base + i, "RU"), sessionmaker),
+        ),
+        "update_data": (
+            lambda i: legacy_update_data((base + i, settings), sessionmaker),
+            lambda i: db.update_data((base + i, settings), sessionmaker),
+        ),
+        "get_language": (
+            lambda i: legacy_get_language(base + i, sessionmaker),
+            lambda i: db.get_language(base + i, sessionmaker),
+        ),
+        "get_profile": (
+            lambda i: legacy_get_profile(base + i, sessionmaker),
+            lambda i: db.get_profile(base + i, sessionmaker),
+        ),
+    }
+
+    print(f"database: {engine.dialect.name}, iterations: {args.iterations}\n")
+    print(f"{'query':<14}{'impl':<8}{'us/call':>10}{'trips/call':>12}  statements")
+
+    for name, (legacy, current) in cases.items():
+        for impl, call in (("legacy", legacy), ("upsert", current)):
+            us, per_call, counts = await measure(args.iterations, call, trips)
+            print(f"{name:<14}{impl:<8}{us:>10.0f}{per_call:>12.1f}  {counts}")
+
+    async with engine.begin() as conn:
+        await conn.execute(db.User.__table__.delete().where(db.User.user_id >= base))
+    await db.dispose_sessionmaker(sessionmaker)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument(
+        "--postgres-dsn",
+        help="Postgres database of the benchmark, its tables are recreated, "
+        "so it must not be the database of the bot",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
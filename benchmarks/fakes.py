@@ -0,0 +1,233 @@
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncGenerator, Mapping
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import (
+    EditMessageText,
+    SendMessage,
+    SendPhoto,
+    TelegramMethod,
+)
+from aiogram.methods.base import TelegramType
+from aiogram.types import Chat, Message, PhotoSize
+from aiohttp import web
+
+
+class RecordingSession(BaseSession):
+    """
+    Bot session which records the outgoing calls instead of sending them.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+        self._message_ids = itertools.count(1)
+
+    async def make_request(
+        self, bot: Bot, method: TelegramMethod[TelegramType], timeout: int | None = None
+    ) -> TelegramType:
+        self.calls[type(method).__name__] += 1
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if isinstance(method, (SendMessage, EditMessageText, SendPhoto)):
+            return self._message(method)
+
+        return True
+
+    def _message(self, method: TelegramMethod[Any]) -> Message:
+        message_id = next(self._message_ids)
+        chat_id = method.chat_id or 0
+        photo = None
+
+        if isinstance(method, SendPhoto):
+            photo = [
+                PhotoSize(
+                    file_id=f"photo-{message_id}",
+                    file_unique_id=f"unique-{message_id}",
+                    width=640,
+                    height=480,
+                )
+            ]
+
+        return Message(
+            message_id=message_id,
+            date=datetime.now(timezone.utc),
+            chat=Chat(id=chat_id, type="private"),
+            text=getattr(method, "text", None),
+            photo=photo,
+        )
+
+    async def stream_content(
+        self,
+        url: str,
+        headers: dict[str, Any] | None = None,
+        timeout: int = 30,
+        chunk_size: int = 65536,
+        raise_for_status: bool = True,
+    ) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+def forecast_days(days: int = 3) -> list[str]:
+    """
+    Get the dates of the stub forecast.
+    """
+
+    today = datetime.now(timezone.utc).date()
+    return [(today + timedelta(days=i)).isoformat() for i in range(days)]
+
+
+class StubWeatherAPI:
+    """
+    Local stand-in for the current.json and forecast.json weather API endpoints,
+    single and bulk.
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0) -> None:
+        self.latency = latency
+        # the share of the requests answered with 503, 1 emulates an outage
+        self.error_rate = error_rate
+        self.requests: Counter[str] = Counter()
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        app = web.Application()
+        for endpoint in ("current.json", "forecast.json"):
+            app.router.add_get(f"/v1/{endpoint}", self._single)
+            app.router.add_post(f"/v1/{endpoint}", self._bulk)
+
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host=host, port=port)
+        await site.start()
+
+        port = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{port}/v1"
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _single(self, request: web.Request) -> web.Response:
+        endpoint = request.path.rsplit("/", 1)[-1]
+        self.requests[endpoint] += 1
+        await asyncio.sleep(self.latency)
+
+        if random.random() < self.error_rate:
+            return web.json_response({}, status=503)
+        return web.json_response(self._payload(endpoint, request.query))
+
+    async def _bulk(self, request: web.Request) -> web.Response:
+        # q=bulk with the locations in the body, as the real API expects
+        endpoint = request.path.rsplit("/", 1)[-1]
+        locations = (await request.json())["locations"]
+        self.requests[f"{endpoint} bulk"] += 1
+        self.requests[f"{endpoint} bulk locations"] += len(locations)
+        await asyncio.sleep(self.latency)
+
+        if random.random() < self.error_rate:
+            return web.json_response({}, status=503)
+        return web.json_response(
+            {
+                "bulk": [
+                    {
+                        "query": {
+                            "custom_id": location["custom_id"],
+                            "q": location["q"],
+                            **self._payload(
+                                endpoint, {**request.query, "q": location["q"]}
+                            ),
+                        }
+                    }
+                    for location in locations
+                ]
+            }
+        )
+
+    def _payload(self, endpoint: str, query: Mapping[str, str]) -> dict[str, Any]:
+        payload = {
+            "location": self._location(query["q"]),
+            "current": self._current_weather(),
+        }
+
+        if endpoint == "forecast.json":
+            days = int(query.get("days", 3))
+            payload["forecast"] = {
+                "forecastday": [
+                    self._forecast_day(date) for date in forecast_days(days)
+                ]
+            }
+
+        return payload
+
+    @staticmethod
+    def _location(q: str) -> dict[str, Any]:
+        lat, lon = q.split(",")
+        return {"lat": float(lat), "lon": float(lon), "tz_id": "Europe/London"}
+
+    @staticmethod
+    def _current_weather() -> dict[str, Any]:
+        # the upstream refreshes the data every 15 minutes
+        updated = int(time.time()) // 900 * 900
+        return {
+            "last_updated_epoch": updated,
+            "temp_c": 12.0,
+            "temp_f": 53.6,
+            "feelslike_c": 10.5,
+            "feelslike_f": 50.9,
+            "condition": {"text": "Partly cloudy"},
+            "wind_kph": 14.4,
+            "wind_dir": "SW",
+            "pressure_mb": 1012.0,
+            "precip_mm": 0.0,
+            "humidity": 71,
+            "cloud": 50,
+        }
+
+    @staticmethod
+    def _forecast_day(date: str) -> dict[str, Any]:
+        start = int(
+            datetime.fromisoformat(date).replace(tzinfo=timezone.utc).timestamp()
+        )
+        return {
+            "date": date,
+            "date_epoch": start,
+            "day": {
+                "maxtemp_c": 15.2,
+                "maxtemp_f": 59.4,
+                "mintemp_c": 8.1,
+                "mintemp_f": 46.6,
+                "avgtemp_c": 11.7,
+                "avgtemp_f": 53.1,
+                "maxwind_kph": 22.3,
+                "totalprecip_mm": 1.4,
+                "avghumidity": 74,
+                "condition": {"text": "Light rain"},
+            },
+            "hour": [
+                {
+                    "time_epoch": start + hour * 3600,
+                    "time": f"{date} {hour:02d}:00",
+                    "temp_c": 8.0 + hour * 0.3,
+                    "temp_f": 46.4 + hour * 0.54,
+                    "wind_kph": 10.0 + hour % 6,
+                    "precip_mm": 0.1 * (hour % 4),
+                    "humidity": 60 + hour,
+                    "condition": {"text": "Light rain"},
+                }
+                for hour in range(24)
+            ],
+        }
@@ -0,0 +1,363 @@
+"""
+End-to-end load test of the dispatcher with local stand-ins.
+
+Every virtual user walks through start -> settings -> weather -> days ->
+plots by feeding synthetic updates to the real dispatcher and router.
+Outgoing Telegram calls are recorded by a fake bot session and the weather
+API is emulated by a local stub server. Redis and Postgres are replaced
+by fakeredis and a temporary SQLite database unless --redis-url or
+--postgres-dsn are given. They must be dedicated to the benchmarks, as
+they are wiped before the run.
+
+    python -m benchmarks.load_test --users 500 --cities 20 --upstream-latency 0.2
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import replace
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable
+
+from aiogram import Bot
+from aiogram.types import TelegramObject, Update
+
+from benchmarks.fakes import RecordingSession, StubWeatherAPI, forecast_days
+
+# the required settings of the bot, real values are not needed here
+for name, value in {
+    "BOT_TOKEN": "42:TEST",
+    "WEATHER_API": "test",
+    "POSTGRES_DRIVER": "postgresql+asyncpg",
+    "POSTGRES_DB": "weather_bot",
+    "POSTGRES_USER": "postgres",
+    "POSTGRES_PASSWORD": "postgres",
+    "POSTGRES_HOST": "localhost",
+    "POSTGRES_PORT": "5432",
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+}.items():
+    os.environ.setdefault(name, value)
+
+_update_ids = itertools.count(1)
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class HandlerTimer:
+    """
+    Inner middleware which records the processing time of every handler.
+    """
+
+    def __init__(self) -> None:
+        self.timings: dict[str, list[float]] = defaultdict(list)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        started = time.perf_counter()
+
+        try:
+            return await handler(event, data)
+        finally:
+            self.timings[data["handler"].callback.__name__].append(
+                time.perf_counter() - started
+            )
+
+
+def _user(user_id: int) -> dict[str, Any]:
+    return {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"}
+
+
+def _chat(user_id: int) -> dict[str, Any]:
+    return {"id": user_id, "type": "private"}
+
+
+def message_update(user_id: int, **content: Any) -> Update:
+    message = {
+        "message_id": next(_update_ids),
+        "date": int(time.time()),
+        "chat": _chat(user_id),
+        "from": _user(user_id),
+        **content,
+    }
+    return Update.model_validate({"update_id": next(_update_ids), "message": message})
+
+
+def command_update(user_id: int, command: str) -> Update:
+    return message_update(
+        user_id,
+        text=command,
+        entities=[{"type": "bot_command", "offset": 0, "length": len(command)}],
+    )
+
+
+def callback_update(user_id: int, data: str) -> Update:
+    callback = {
+        "id": str(next(_update_ids)),
+        "chat_instance": str(user_id),
+        "data": data,
+        "from": _user(user_id),
+        "message": {
+            "message_id": next(_update_ids),
+            "date": int(time.time()),
+            "chat": _chat(user_id),
+            "text": "menu",
+        },
+    }
+    return Update.model_validate(
+        {"update_id": next(_update_ids), "callback_query": callback}
+    )
+
+
+def scenario(user_id: int, latitude: float, longitude: float) -> list[Update]:
+    """
+    Build the updates of one user going through the whole bot.
+    """
+
+    day = forecast_days()[0][-2:]
+    return [
+        command_update(user_id, "/start"),
+        callback_update(user_id, "EN"),
+        message_update(
+            user_id, location={"latitude": latitude, "longitude": longitude}
+        ),
+        callback_update(user_id, "celsius"),
+        callback_update(user_id, "kmph"),
+        command_update(user_id, "/weather"),
+        callback_update(user_id, "forecast_today"),
+        callback_update(user_id, "forecast_week"),
+        callback_update(user_id, day),
+        callback_update(user_id, "plots"),
+        callback_update(
+            user_id,
+            random.choice(["temp", "wind", "precip", "humid", "temp_h", "humid_h"]),
+        ),
+        command_update(user_id, "/profile"),
+    ]
+
+
+def add_service_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--redis-url",
+        help="Redis database of the benchmarks, e.g. redis://localhost:6379/15, "
+        "it is flushed, so it must not be the database 0 the bot uses",
+    )
+    parser.add_argument(
+        "--postgres-dsn",
+        help="Postgres database of the benchmarks, its tables are recreated, "
+        "so it must not be the database of the bot",
+    )
+
+
+async def create_sessionmaker(dsn: str | None):
+    from sqlalchemy.engine import make_url
+    from sqlalchemy.ext.asyncio import (
+        AsyncSession,
+        async_sessionmaker,
+        create_async_engine,
+    )
+
+    from src.config import load_config
+    from src.database import Base, get_sessionmaker
+
+    if dsn is not None:
+        url = make_url(dsn)
+        config = load_config().postgres
+
+        if (url.host, url.port or 5432, url.database) == (
+            config.host,
+            config.port,
+            config.database,
+        ):
+            sys.exit("--postgres-dsn must not be the database of the bot")
+
+        # the pool is tuned the same way as the one of the bot
+        sessionmaker = get_sessionmaker(
+            replace(
+                config,
+                driver=url.drivername,
+                user=url.username,
+                password=url.password,
+                host=url.host,
+                port=url.port or 5432,
+                database=url.database,
+                replica_host=None,
+            )
+        )
+
+        async with sessionmaker.kw["bind"].begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+        return sessionmaker
+
+    # a file, not :memory:, so every checkout is a separate connection,
+    # a single shared connection mixes up the transactions of the users
+    path = os.path.join(tempfile.mkdtemp(prefix="weather_bot_"), "bench.db")
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{path}", connect_args={"timeout": 30}
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return async_sessionmaker(bind=engine, class_=AsyncSession)
+
+
+async def create_redis(url: str | None):
+    if url is not None:
+        from redis.asyncio.client import Redis
+
+        redis = Redis.from_url(url)
+
+        # the bot keeps its state and caches in the database 0
+        if redis.connection_pool.connection_kwargs.get("db", 0) == 0:
+            sys.exit("--redis-url must name a database other than 0")
+
+        await redis.flushdb()
+        return redis
+
+    from fakeredis import FakeAsyncRedis
+
+    return FakeAsyncRedis()
+
+
+async def run(args: argparse.Namespace) -> None:
+    from bot import setup_dispatcher
+    from src.config import load_config
+    from src.database import dispose_sessionmaker
+    from src.handlers import router
+    from src.states import PipelinedRedisStorage
+
+    stub = StubWeatherAPI(
+        latency=args.upstream_latency, error_rate=args.upstream_error_rate
+    )
+    await stub.start()
+
+    config = load_config()
+    config.weather_api.base_url = stub.url
+    config.weather_api.batch_window = args.batch_window
+    config.metrics.enabled = False
+    config.subscriptions.enabled = False
+    config.warmer.enabled = False
+    config.plot.workers = args.plot_workers
+
+    if not args.throttling:
+        config.throttling.user_message_rate = 0
+        config.throttling.user_callback_rate = 0
+        config.throttling.global_message_rate = 0
+        config.throttling.global_callback_rate = 0
+
+    timer = HandlerTimer()
+    router.message.middleware(timer)
+    router.callback_query.middleware(timer)
+
+    redis = await create_redis(args.redis_url)
+    sessionmaker = await create_sessionmaker(args.postgres_dsn)
+    disp, data = setup_dispatcher(
+        config=config,
+        redis=redis,
+        storage=PipelinedRedisStorage(
+            redis=redis,
+            state_ttl=config.fsm.state_ttl or None,
+            data_ttl=config.fsm.data_ttl or None,
+        ),
+        sessionmaker=sessionmaker,
+    )
+
+    session = RecordingSession(latency=args.telegram_latency)
+    bot = Bot(token=config.bot.token, session=session)
+    await disp.emit_startup(bot=bot, dispatcher=disp, **data)
+
+    cities = [
+        (random.uniform(50.0, 58.0), random.uniform(-5.0, 1.5))
+        for _ in range(args.cities)
+    ]
+    update_latencies: list[float] = []
+    errors = 0
+
+    async def user(user_id: int) -> None:
+        nonlocal errors
+        latitude, longitude = random.choice(cities)
+
+        for update in scenario(
+            user_id,
+            latitude + random.uniform(-0.002, 0.002),
+            longitude + random.uniform(-0.002, 0.002),
+        ):
+            started = time.perf_counter()
+            try:
+                await disp.feed_update(bot, update, dispatcher=disp, **data)
+            except Exception:
+                errors += 1
+            update_latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(1_000_000 + i) for i in range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    await disp.emit_shutdown(bot=bot, dispatcher=disp, **data)
+    await stub.close()
+    await dispose_sessionmaker(sessionmaker)
+    await redis.aclose()
+
+    print(f"{datetime.now(timezone.utc):%Y-%m-%d %H:%M:%S} UTC")
+    print(
+        f"users: {args.users}, cities: {args.cities}, "
+        f"upstream latency: {args.upstream_latency * 1000:.0f} ms, "
+        f"telegram latency: {args.telegram_latency * 1000:.0f} ms"
+    )
+    print(
+        f"updates: {len(update_latencies)}, errors: {errors}, "
+        f"elapsed: {elapsed:.2f} s, "
+        f"throughput: {len(update_latencies) / elapsed:.1f} updates/s"
+    )
+    print(f"upstream requests: {dict(stub.requests)}")
+    print(f"telegram calls: {dict(session.calls)}\n")
+
+    rows = [("update", update_latencies), *sorted(timer.timings.items())]
+    print(f"{'handler':<22}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, values in rows:
+        print(
+            f"{name:<22}{len(values):>8}"
+            f"{percentile(values, 0.50) * 1000:>10.1f}"
+            f"{percentile(values, 0.95) * 1000:>10.1f}"
+            f"{percentile(values, 0.99) * 1000:>10.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--cities", type=int, default=10)
+    parser.add_argument("--upstream-latency", type=float, default=0.1)
+    parser.add_argument(
+        "--upstream-error-rate", type=float, default=0, help="share of 503 responses"
+    )
+    parser.add_argument("--telegram-latency", type=float, default=0.0)
+    parser.add_argument(
+        "--batch-window", type=float, default=0, help="upstream batch window, 0 is off"
+    )
+    parser.add_argument("--plot-workers", type=int, default=2)
+    parser.add_argument("--throttling", action="store_true")
+    add_service_arguments(parser)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
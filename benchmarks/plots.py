@@ -0,0 +1,141 @@
+"""
+Render benchmark of the plot backends.
+
+Every backend runs in a fresh interpreter, like a worker of the plot pool.
+It loads the chart library, renders the daily (3 points) and the hourly
+(72 points) plots of the bot and reports the render time, the CPU time per
+plot, the PNG size and the memory of the process.
+
+    python -m benchmarks.plots --iterations 200
+"""
+
+import argparse
+import json
+import math
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+PLOTS = {
+    "daily": (
+        ("18.10", "19.10", "20.10"),
+        "Дни",
+        "Температура, °C",
+        "График температуры",
+    ),
+    "hourly": (
+        tuple(f"{18 + hour // 24} {hour % 24:02}:00" for hour in range(72)),
+        "Часы",
+        "Температура, °C",
+        "Почасовой график температуры",
+    ),
+}
+
+
+def rss() -> float:
+    # the peak resident memory of the process in MB, KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(args: argparse.Namespace) -> None:
+    # the base is taken before any module of the bot is imported, the load
+    # covers src.plotting and the chart library like in a plot worker
+    result = {"rss_base": rss()}
+    started = time.perf_counter()
+
+    from src.plotting import PLOT_BACKENDS
+
+    backend = PLOT_BACKENDS[args.backend]
+    backend.warm_up(args.font)
+    result["load"] = time.perf_counter() - started
+    result["rss_loaded"] = rss()
+
+    for name, (x, xlabel, ylabel, title) in PLOTS.items():
+        y = tuple(round(15 + 10 * math.sin(index / 5), 1) for index in range(len(x)))
+        times = []
+        cpu = time.process_time()
+
+        for _ in range(args.iterations):
+            started = time.perf_counter()
+            png = backend.render(x, y, xlabel, ylabel, title)
+            times.append(time.perf_counter() - started)
+
+        result[name] = {
+            "p50": statistics.median(times),
+            "p95": statistics.quantiles(times, n=20)[-1],
+            "cpu": (time.process_time() - cpu) / args.iterations,
+            "size": len(png),
+        }
+
+    result["rss_peak"] = rss()
+    print(json.dumps(result))
+
+
+def run(args: argparse.Namespace) -> None:
+    results = {}
+
+    for backend in args.backends:
+        process = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.plots",
+                "--child",
+                f"--backend={backend}",
+                f"--iterations={args.iterations}",
+                f"--font={args.font}",
+            ],
+            capture_output=True,
+            text=True,
+        )
+
+        if process.returncode != 0:
+            sys.exit(process.stderr)
+
+        results[backend] = json.loads(process.stdout.splitlines()[-1])
+
+    print(f"iterations: {args.iterations}\n")
+    print(
+        f"{'backend':<12}{'plot':<8}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'cpu ms':>9}{'png KB':>9}"
+    )
+    for backend, result in results.items():
+        for name in PLOTS:
+            plot = result[name]
+            print(
+                f"{backend:<12}{name:<8}{plot['p50'] * 1000:>9.1f}"
+                f"{plot['p95'] * 1000:>9.1f}{plot['cpu'] * 1000:>9.1f}"
+                f"{plot['size'] / 1024:>9.1f}"
+            )
+
+    print(
+        f"\n{'backend':<12}{'load ms':>9}{'base MB':>9}{'loaded MB':>11}{'peak MB':>9}"
+    )
+    for backend, result in results.items():
+        print(
+            f"{backend:<12}{result['load'] * 1000:>9.1f}{result['rss_base']:>9.1f}"
+            f"{result['rss_loaded']:>11.1f}{result['rss_peak']:>9.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument(
+        "--backends", nargs="+", default=["matplotlib", "pillow"], metavar="BACKEND"
+    )
+    parser.add_argument("--font", default="DejaVuSans.ttf", help="font of pillow")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Cold start benchmark of the bot.
+
+Every run starts a fresh interpreter which imports the bot, builds the
+dispatcher, runs the startup steps and handles the updates of one user
+the way bot.py does, and reports the time from the start of the process
+to the first handled update. The same local stand-ins as in the load test
+are used.
+
+    python -m benchmarks.startup --runs 5 --telegram-latency 0.1
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+PHASES = (
+    ("interpreter", "interpreter start"),
+    ("imports", "imports"),
+    ("setup", "dispatcher setup"),
+    ("prepare", "startup steps"),
+    ("startup", "startup hooks"),
+    ("first_update", "first update"),
+    ("time_to_first_update", "time to first update"),
+    ("first_location", "first location"),
+    ("first_plot", "first plot"),
+)
+
+
+async def cold_start(args: argparse.Namespace, marks: dict[str, float]) -> None:
+    from aiogram import Bot
+
+    # the load test sets the required settings of the bot
+    from benchmarks.fakes import RecordingSession, StubWeatherAPI
+    from benchmarks.load_test import create_redis, create_sessionmaker, scenario
+    from bot import connect, prepare, setup_dispatcher
+    from src.config import load_config
+    from src.database import dispose_sessionmaker
+    from src.keyboards import set_main_menu
+    from src.states import PipelinedRedisStorage
+
+    stub = StubWeatherAPI()
+    await stub.start()
+
+    marks["setup"] = time.time()
+    config = load_config()
+    config.weather_api.base_url = stub.url
+    config.metrics.enabled = False
+    config.subscriptions.enabled = False
+    config.warmer.enabled = False
+    config.throttling.user_message_rate = 0
+    config.throttling.user_callback_rate = 0
+
+    redis = await create_redis(args.redis_url)
+    sessionmaker = await create_sessionmaker(args.postgres_dsn)
+    bot = Bot(
+        token=config.bot.token, session=RecordingSession(latency=args.telegram_latency)
+    )
+    disp, data = setup_dispatcher(
+        config=config,
+        redis=redis,
+        storage=PipelinedRedisStorage(redis=redis),
+        sessionmaker=sessionmaker,
+    )
+
+    marks["prepare"] = time.time()
+    if args.sequential:
+        await set_main_menu(bot)
+        await connect(redis, sessionmaker)
+        await bot.delete_webhook(drop_pending_updates=True)
+    else:
+        await prepare(bot, config, redis, sessionmaker)
+
+    if not args.gc:
+        gc.freeze()
+        gc.enable()
+
+    marks["startup"] = time.time()
+    await disp.emit_startup(bot=bot, dispatcher=disp, **data)
+
+    updates = scenario(args.user_id, 51.5, -0.1)
+    marks["first_update"] = time.time()
+
+    for step, update in enumerate(updates):
+        started = time.time()
+        await disp.feed_update(bot, update, dispatcher=disp, **data)
+
+        if step == 0:
+            marks["time_to_first_update"] = time.time()
+        elif step == 2:
+            marks["first_location"] = time.time() - started
+        elif step == len(updates) - 2:
+            marks["first_plot"] = time.time() - started
+
+    await disp.emit_shutdown(bot=bot, dispatcher=disp, **data)
+    await stub.close()
+    await dispose_sessionmaker(sessionmaker)
+    await redis.aclose()
+
+
+def child(args: argparse.Namespace) -> None:
+    marks = {"imports": time.time()}
+
+    # the same as in bot.py
+    if not args.gc:
+        gc.disable()
+
+    import bot  # noqa: F401
+
+    asyncio.run(cold_start(args, marks))
+
+    end = marks["time_to_first_update"]
+    phases = {
+        "interpreter": marks["imports"] - args.spawned,
+        "imports": marks["setup"] - marks["imports"],
+        "setup": marks["prepare"] - marks["setup"],
+        "prepare": marks["startup"] - marks["prepare"],
+        "startup": marks["first_update"] - marks["startup"],
+        "first_update": end - marks["first_update"],
+        "time_to_first_update": end - args.spawned,
+        "first_location": marks["first_location"],
+        "first_plot": marks["first_plot"],
+    }
+    print(json.dumps(phases))
+
+
+def run(args: argparse.Namespace) -> None:
+    command = [sys.executable, "-m", "benchmarks.startup", "--child"]
+    command += [f"--telegram-latency={args.telegram_latency}"]
+    command += [
+        flag
+        for flag, enabled in (
+            ("--sequential", args.sequential),
+            ("--gc", args.gc),
+        )
+        if enabled
+    ]
+    command += [
+        f"{flag}={value}"
+        for flag, value in (
+            ("--redis-url", args.redis_url),
+            ("--postgres-dsn", args.postgres_dsn),
+        )
+        if value is not None
+    ]
+    runs = []
+
+    for index in range(args.runs):
+        result = subprocess.run(
+            [*command, f"--user-id={1_000_000 + index}", f"--spawned={time.time()}"],
+            capture_output=True,
+            text=True,
+        )
+
+        if result.returncode != 0:
+            sys.exit(result.stderr)
+
+        runs.append(json.loads(result.stdout.splitlines()[-1]))
+
+    print(
+        f"runs: {args.runs}, telegram latency: {args.telegram_latency * 1000:.0f} ms, "
+        f"startup steps: {'sequential' if args.sequential else 'concurrent'}, "
+        f"collector during imports: {'on' if args.gc else 'off'}\n"
+    )
+    print(f"{'phase':<24}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+    for key, name in PHASES:
+        values = [phases[key] for phases in runs]
+        print(
+            f"{name:<24}{statistics.median(values) * 1000:>12.1f}"
+            f"{min(values) * 1000:>10.1f}{max(values) * 1000:>10.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--telegram-latency", type=float, default=0.1)
+    parser.add_argument(
+        "--sequential", action="store_true", help="run the startup steps one by one"
+    )
+    parser.add_argument(
+        "--gc", action="store_true", help="keep the collector on during the imports"
+    )
+    # the same as in the load test, which is not imported before the measuring
+    parser.add_argument("--redis-url", help="dedicated Redis database, it is flushed")
+    parser.add_argument(
+        "--postgres-dsn", help="dedicated Postgres database, its tables are recreated"
+    )
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--spawned", type=float, help=argparse.SUPPRESS)
+    parser.add_argument(
+        "--user-id", type=int, default=1_000_000, help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Benchmark of one daily forecast delivery round.
+
+Seeds subscribers spread over a number of cities, runs a single scheduler
+tick at their delivery time and reports how many upstream requests and
+Telegram messages it took. The same local stand-ins as in the load test
+are used.
+
+    python -m benchmarks.subscriptions --subscribers 50000 --cities 300
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+import pytz
+from aiogram import Bot
+
+from benchmarks.fakes import RecordingSession, StubWeatherAPI
+from benchmarks.load_test import (
+    add_service_arguments,
+    create_redis,
+    create_sessionmaker,
+)
+
+TIMEZONE = "Europe/London"
+DELIVERY_TIME = "07:00"
+
+
+async def seed(sessionmaker, subscribers: int, cities: int, chunk: int = 5000) -> None:
+    import sqlalchemy as sa
+
+    from src.database import Subscription, User
+
+    locations = [
+        (random.uniform(50.0, 58.0), random.uniform(-5.0, 1.5)) for _ in range(cities)
+    ]
+    delivery_time = datetime.strptime(DELIVERY_TIME, "%H:%M").time()
+
+    for start in range(0, subscribers, chunk):
+        users, subscriptions = [], []
+
+        for user_id in range(start, min(start + chunk, subscribers)):
+            latitude, longitude = random.choice(locations)
+            users.append(
+                {
+                    "user_id": user_id,
+                    "language": random.choice(["RU", "EN"]),
+                    "latitude": latitude + random.uniform(-0.002, 0.002),
+                    "longitude": longitude + random.uniform(-0.002, 0.002),
+                    "temp_unit": random.choice(["celsius", "fahrenheit"]),
+                    "wind_unit": random.choice(["kmph", "mps"]),
+                    "timezone": TIMEZONE,
+                }
+            )
+            subscriptions.append({"user_id": user_id, "delivery_time": delivery_time})
+
+        async with sessionmaker() as session:
+            async with session.begin():
+                await session.execute(sa.insert(User), users)
+                await session.execute(sa.insert(Subscription), subscriptions)
+
+
+async def run(args: argparse.Namespace) -> None:
+    from bot import setup_dispatcher
+    from src.config import load_config
+    from src.database import dispose_sessionmaker
+    from src.services import SubscriptionScheduler
+    from src.states import PipelinedRedisStorage
+
+    stub = StubWeatherAPI(latency=args.upstream_latency)
+    await stub.start()
+
+    config = load_config()
+    config.weather_api.base_url = stub.url
+    config.metrics.enabled = False
+    config.subscriptions.enabled = False
+    config.warmer.enabled = False
+    config.subscriptions.global_rate = args.global_rate
+    config.subscriptions.concurrency = args.concurrency
+
+    redis = await create_redis(args.redis_url)
+    sessionmaker = await create_sessionmaker(args.postgres_dsn)
+    await seed(sessionmaker, args.subscribers, args.cities)
+
+    # the dispatcher owns the weather client and its caches
+    disp, data = setup_dispatcher(
+        config=config,
+        redis=redis,
+        storage=PipelinedRedisStorage(
+            redis=redis,
+            state_ttl=config.fsm.state_ttl or None,
+            data_ttl=config.fsm.data_ttl or None,
+        ),
+        sessionmaker=sessionmaker,
+    )
+    session = RecordingSession(latency=args.telegram_latency)
+    bot = Bot(token=config.bot.token, session=session)
+    await disp.emit_startup(bot=bot, dispatcher=disp, **data)
+
+    scheduler = SubscriptionScheduler(
+        redis=redis,
+        config=config.subscriptions,
+        sessionmaker=sessionmaker,
+        weather_client=data["weather_client"],
+    )
+    local = pytz.timezone(TIMEZONE).localize(
+        datetime.combine(
+            datetime.now(pytz.timezone(TIMEZONE)).date(),
+            datetime.strptime(DELIVERY_TIME, "%H:%M").time(),
+        )
+    )
+
+    started = time.perf_counter()
+    delivered = await scheduler.tick(bot, now=local + timedelta(seconds=30))
+    elapsed = time.perf_counter() - started
+
+    # the next tick must not deliver anything twice
+    repeated = await scheduler.tick(bot, now=local + timedelta(minutes=1))
+
+    await disp.emit_shutdown(bot=bot, dispatcher=disp, **data)
+    await stub.close()
+    await dispose_sessionmaker(sessionmaker)
+    await redis.aclose()
+
+    print(
+        f"subscribers: {args.subscribers}, cities: {args.cities}, "
+        f"upstream latency: {args.upstream_latency * 1000:.0f} ms, "
+        f"telegram latency: {args.telegram_latency * 1000:.0f} ms"
+    )
+    print(
+        f"delivered: {delivered}, repeated: {repeated}, elapsed: {elapsed:.2f} s, "
+        f"throughput: {delivered / elapsed:.1f} messages/s"
+    )
+    print(f"upstream requests: {dict(stub.requests)}")
+    print(f"telegram calls: {dict(session.calls)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--cities", type=int, default=100)
+    parser.add_argument("--upstream-latency", type=float, default=0.1)
+    parser.add_argument("--telegram-latency", type=float, default=0.0)
+    parser.add_argument(
+        "--global-rate", type=float, default=0, help="messages per second, 0 is off"
+    )
+    parser.add_argument("--concurrency", type=int, default=50)
+    add_service_arguments(parser)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
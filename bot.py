@@ -1,19 +1,179 @@
+import gc
+
+# the imports create lots of objects which live until the exit, so the
+# collections on the way only slow the start down, see main()
+if __name__ == "__main__":
+    gc.disable()
+
 import asyncio
 import logging
+from typing import Any
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
-from aiogram.fsm.storage.redis import RedisStorage
+from aiogram.fsm.storage.base import BaseStorage
 from redis.asyncio.client import Redis
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from src.config import load_config
-from src.database import get_sessionmaker
+from src.cache import (
+    ForecastCache,
+    ForecastModelCache,
+    PlotCache,
+    ProfileCache,
+    SingleFlight,
+    TextCache,
+)
+from src.config import Config, load_config
+from src.database import (
+    connect_sessionmaker,
+    dispose_sessionmaker,
+    get_sessionmaker,
+)
+from src.external_services import WeatherClient
 from src.handlers import router
 from src.keyboards import set_main_menu
+from src.middlewares import (
+    HandlerMetricsMiddleware,
+    ThrottlingMiddleware,
+    UserProfileMiddleware,
+)
+from src.server import MetricsServer, run_webhook
+from src.services import (
+    CacheWarmer,
+    PlotRenderer,
+    Preloader,
+    SubscriptionScheduler,
+    get_finder,
+)
+from src.states import PipelinedRedisStorage
 
 logger = logging.getLogger(__name__)
 
 
+def setup_dispatcher(
+    config: Config,
+    redis: Redis,
+    storage: BaseStorage,
+    sessionmaker: async_sessionmaker[AsyncSession],
+) -> tuple[Dispatcher, dict[str, Any]]:
+    """
+    Build the dispatcher with its middlewares, lifecycle hooks and the data
+    passed to the handlers.
+    """
+
+    forecast_cache = ForecastCache(redis=redis, config=config.cache)
+    weather_client = WeatherClient(
+        token=config.bot.wthr_token,
+        config=config.weather_api,
+        cache=forecast_cache,
+        single_flight=SingleFlight(redis=redis, config=config.cache),
+        models=ForecastModelCache(config=config.cache),
+    )
+
+    plot_renderer = PlotRenderer(config=config.plot)
+
+    # the pipelined storage reads and writes the FSM once per update
+    disp = Dispatcher(
+        storage=storage,
+        events_isolation=storage.create_isolation()
+        if isinstance(storage, PipelinedRedisStorage)
+        else None,
+    )
+    disp.include_router(router)
+
+    throttling = ThrottlingMiddleware(redis=redis, config=config.throttling)
+    disp.message.outer_middleware(throttling)
+    disp.callback_query.outer_middleware(throttling)
+
+    metrics_middleware = HandlerMetricsMiddleware()
+    router.message.middleware(metrics_middleware)
+    router.callback_query.middleware(metrics_middleware)
+
+    profile_cache = ProfileCache(config=config.cache, redis=redis)
+    profile_middleware = UserProfileMiddleware(profile_cache)
+    router.message.middleware(profile_middleware)
+    router.callback_query.middleware(profile_middleware)
+
+    disp.startup.register(weather_client.start)
+    disp.shutdown.register(weather_client.close)
+    disp.startup.register(plot_renderer.start)
+    disp.shutdown.register(plot_renderer.close)
+    disp.startup.register(profile_cache.start)
+    disp.shutdown.register(profile_cache.close)
+
+    preloader = Preloader(get_finder)
+    disp.startup.register(preloader.start)
+    disp.shutdown.register(preloader.close)
+
+    if config.metrics.enabled:
+        metrics_server = MetricsServer(config=config.metrics)
+        disp.startup.register(metrics_server.start)
+        disp.shutdown.register(metrics_server.close)
+
+    if config.subscriptions.enabled:
+        scheduler = SubscriptionScheduler(
+            redis=redis,
+            config=config.subscriptions,
+            sessionmaker=sessionmaker,
+            weather_client=weather_client,
+        )
+        disp.startup.register(scheduler.start)
+        disp.shutdown.register(scheduler.close)
+
+    if config.warmer.enabled:
+        warmer = CacheWarmer(
+            redis=redis,
+            config=config.warmer,
+            cache=forecast_cache,
+            weather_client=weather_client,
+        )
+        disp.startup.register(warmer.start)
+        disp.shutdown.register(warmer.close)
+
+    data = {
+        "sessionmaker": sessionmaker,
+        "weather_client": weather_client,
+        "plot_renderer": plot_renderer,
+        "plot_cache": PlotCache(redis=redis, config=config.cache),
+        "text_cache": TextCache(redis=redis),
+    }
+    return disp, data
+
+
+async def connect(redis: Redis, sessionmaker: async_sessionmaker[AsyncSession]) -> None:
+    """
+    Open the first connections, so that the first update does not wait for them.
+    """
+
+    results = await asyncio.gather(
+        redis.ping(), connect_sessionmaker(sessionmaker), return_exceptions=True
+    )
+
+    # the bot still starts, the connections are retried on the updates
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning("Can not connect on startup: %s", result)
+
+
+async def prepare(
+    bot: Bot,
+    config: Config,
+    redis: Redis,
+    sessionmaker: async_sessionmaker[AsyncSession],
+) -> None:
+    """
+    Run the independent startup steps concurrently.
+    """
+
+    steps = [set_main_menu(bot), connect(redis, sessionmaker)]
+
+    # the webhook mode sets the webhook itself
+    if not config.webhook.enabled:
+        steps.append(bot.delete_webhook(drop_pending_updates=True))
+
+    await asyncio.gather(*steps)
+
+
 async def main():
     logging.basicConfig(
         level=logging.INFO,
@@ -24,17 +184,36 @@ async def main():
 
     config = load_config()
     properties = DefaultBotProperties(parse_mode="HTML")
-    storage: RedisStorage = RedisStorage(
-        redis=Redis(host=config.redis.host, port=config.redis.port)
-    )
+    redis = Redis(host=config.redis.host, port=config.redis.port)
+
+    sessionmaker = get_sessionmaker(config.postgres)
 
     bot = Bot(token=config.bot.token, default=properties)
-    disp = Dispatcher(storage=storage)
-    disp.include_router(router)
+    disp, data = setup_dispatcher(
+        config=config,
+        redis=redis,
+        storage=PipelinedRedisStorage(
+            redis=redis,
+            state_ttl=config.fsm.state_ttl or None,
+            data_ttl=config.fsm.data_ttl or None,
+        ),
+        sessionmaker=sessionmaker,
+    )
+
+    await prepare(bot, config, redis, sessionmaker)
 
-    await set_main_menu(bot)
-    await bot.delete_webhook(drop_pending_updates=True)
-    await disp.start_polling(bot, sessionmaker=get_sessionmaker())
+    # the objects created so far live until the exit, the collector
+    # does not need to go through them again
+    gc.freeze()
+    gc.enable()
+
+    try:
+        if config.webhook.enabled:
+            await run_webhook(disp, bot, config.webhook, **data)
+        else:
+            await disp.start_polling(bot, **data)
+    finally:
+        await dispose_sessionmaker(sessionmaker)
 
 
 if __name__ == "__main__":
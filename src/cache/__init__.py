@@ -0,0 +1,5 @@
+from .forecast import *  # noqa: F403
+from .plots import *  # noqa: F403
+from .profile import *  # noqa: F403
+from .single_flight import *  # noqa: F403
+from .texts import *  # noqa: F403
@@ -0,0 +1,238 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any
+
+from redis.asyncio.client import Redis
+from redis.exceptions import RedisError
+
+from src.config import CacheConfig
+from src.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+
+def location_cell(
+    latitude: float, longitude: float, precision: int
+) -> tuple[float, float]:
+    """
+    Round the location to the cache cell.
+    """
+
+    return round(float(latitude), precision), round(float(longitude), precision)
+
+
+class ForecastCache:
+    """
+    Shared cache of the weather API responses stored in Redis.
+    """
+
+    prefix = "forecast"
+    stale_prefix = "stale"
+    popularity_key = "popularity:forecast"
+
+    def __init__(self, redis: Redis, config: CacheConfig) -> None:
+        self._redis = redis
+        self._config = config
+        self.hits = 0
+        self.misses = 0
+
+    def cell(self, latitude: float, longitude: float) -> tuple[float, float]:
+        """
+        Round the location to the cache cell.
+        """
+
+        return location_cell(latitude, longitude, self._config.precision)
+
+    def key(
+        self, endpoint: str, cell: tuple[float, float], lang: str, days: int
+    ) -> str:
+        """
+        Build the cache key of the weather API response.
+        """
+
+        return f"{self.prefix}:{endpoint}:{cell[0]}:{cell[1]}:{lang}:{days}"
+
+    def ttl(self, payload: dict) -> int:
+        """
+        Get the cache entry TTL using the time of the last weather update.
+        """
+
+        return self.ttl_since(payload.get("current", {}).get("last_updated_epoch"))
+
+    def ttl_since(self, last_updated: int | None) -> int:
+        """
+        Get the cache entry TTL using the epoch of the last weather update.
+        """
+
+        if last_updated is None:
+            return self._config.min_ttl
+
+        ttl = int(last_updated) + self._config.refresh_interval - int(time.time())
+        return max(self._config.min_ttl, min(ttl, self._config.max_ttl))
+
+    async def get(self, key: str) -> dict | None:
+        """
+        Get the cached weather API response.
+        """
+
+        try:
+            raw = await self._redis.get(key)
+        except RedisError as e:
+            logger.warning("Forecast cache is unavailable: %s", e)
+            raw = None
+
+        res = None if raw is None else json.loads(raw)
+
+        if res is None:
+            self.misses += 1
+            CACHE_REQUESTS.labels(cache="forecast", result="miss").inc()
+        else:
+            self.hits += 1
+            CACHE_REQUESTS.labels(cache="forecast", result="hit").inc()
+
+        return res
+
+    async def track(self, key: str) -> None:
+        """
+        Count a request of the response for the popularity ranking.
+        """
+
+        try:
+            await self._redis.zincrby(self.popularity_key, 1, key)
+        except RedisError as e:
+            logger.warning("Forecast cache is unavailable: %s", e)
+
+    async def peek(self, key: str) -> dict | None:
+        """
+        Get the cached weather API response without counting a hit or a miss.
+        """
+
+        try:
+            raw = await self._redis.get(key)
+        except RedisError as e:
+            logger.warning("Forecast cache is unavailable: %s", e)
+            return None
+
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key: str, payload: dict) -> None:
+        """
+        Put the weather API response to the cache.
+        """
+
+        raw = json.dumps(payload)
+
+        try:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.set(key, raw, ex=self.ttl(payload))
+                # the last known response outlives the fresh one for the outages
+                pipe.set(f"{self.stale_prefix}:{key}", raw, ex=self._config.stale_ttl)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning("Forecast cache is unavailable: %s", e)
+
+    async def stale(self, key: str) -> dict | None:
+        """
+        Get the last known weather API response even if it has expired.
+        """
+
+        try:
+            raw = await self._redis.get(f"{self.stale_prefix}:{key}")
+        except RedisError as e:
+            logger.warning("Forecast cache is unavailable: %s", e)
+            return None
+
+        CACHE_REQUESTS.labels(
+            cache="forecast_stale", result="miss" if raw is None else "hit"
+        ).inc()
+        return None if raw is None else json.loads(raw)
+
+    def parse_key(self, key: str) -> tuple[str, tuple[float, float], str, int]:
+        """
+        Get the endpoint, the cell, the language and the days from the cache key.
+        """
+
+        _, endpoint, latitude, longitude, lang, days = key.split(":")
+        return endpoint, (float(latitude), float(longitude)), lang, int(days)
+
+    async def popular(self, count: int) -> list[str]:
+        """
+        Get the keys of the most requested responses.
+        """
+
+        keys = await self._redis.zrevrange(self.popularity_key, 0, count - 1)
+        return [key.decode() for key in keys]
+
+    async def decay_popularity(self, factor: float, min_score: float) -> None:
+        """
+        Scale down all the popularity scores and forget the rarely requested keys.
+        """
+
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.zunionstore(
+                self.popularity_key, {self.popularity_key: factor}, aggregate="SUM"
+            )
+            pipe.zremrangebyscore(self.popularity_key, "-inf", f"({min_score}")
+            await pipe.execute()
+
+    async def ttls(self, keys: list[str]) -> list[float]:
+        """
+        Get the remaining lifetime of the cached responses in seconds, 0 if missing.
+        """
+
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.pttl(key)
+            res = await pipe.execute()
+
+        return [max(0, ttl) / 1000 for ttl in res]
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """
+        Get the cache hit/miss counters of the current process.
+        """
+
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class ForecastModelCache:
+    """
+    In-process cache of the parsed weather API responses.
+    """
+
+    def __init__(self, config: CacheConfig) -> None:
+        self._config = config
+        self._models: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Any | None:
+        """
+        Get the parsed response if the Redis entry has not expired yet.
+        """
+
+        entry = self._models.get(key)
+
+        if entry is not None and entry[0] < time.monotonic():
+            del self._models[key]
+            entry = None
+
+        if entry is None:
+            CACHE_REQUESTS.labels(cache="forecast_model", result="miss").inc()
+            return None
+
+        CACHE_REQUESTS.labels(cache="forecast_model", result="hit").inc()
+        self._models.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, model: Any, ttl: float) -> None:
+        """
+        Put the parsed response to the cache evicting the least recently used one.
+        """
+
+        self._models[key] = (time.monotonic() + ttl, model)
+        self._models.move_to_end(key)
+
+        while len(self._models) > self._config.model_size:
+            self._models.popitem(last=False)
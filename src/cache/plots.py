@@ -0,0 +1,98 @@
+import logging
+from dataclasses import dataclass
+
+from redis.asyncio.client import Redis
+from redis.exceptions import RedisError
+
+from src.config import CacheConfig
+from src.metrics import CACHE_REQUESTS
+
+from .forecast import location_cell
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class CachedPlot:
+    """
+    Rendered plot and its Telegram file_id after the first upload.
+    """
+
+    key: str
+    file_id: str | None = None
+    png: bytes | None = None
+
+
+class PlotCache:
+    """
+    Shared cache of the rendered plots stored in Redis.
+    """
+
+    prefix = "plot"
+
+    def __init__(self, redis: Redis, config: CacheConfig) -> None:
+        self._redis = redis
+        self._config = config
+
+    def key(
+        self,
+        latitude: float,
+        longitude: float,
+        lang: str,
+        unit: str,
+        days: tuple[str, ...],
+        plot_type: str,
+        version: int,
+    ) -> str:
+        """
+        Build the cache key of the plot,
+        the version changes with every forecast update.
+        """
+
+        cell = location_cell(latitude, longitude, self._config.precision)
+        return (
+            f"{self.prefix}:{cell[0]}:{cell[1]}:{lang}:{unit}:"
+            f"{'-'.join(days)}:{plot_type}:{version}"
+        )
+
+    async def get(self, key: str) -> CachedPlot:
+        """
+        Get the cached plot.
+        """
+
+        try:
+            file_id, png = await self._redis.hmget(key, "file_id", "png")
+        except RedisError as e:
+            logger.warning("Plot cache is unavailable: %s", e)
+            return CachedPlot(key=key)
+
+        CACHE_REQUESTS.labels(
+            cache="plot", result="miss" if file_id is None and png is None else "hit"
+        ).inc()
+
+        return CachedPlot(
+            key=key, file_id=None if file_id is None else file_id.decode(), png=png
+        )
+
+    async def set_png(self, key: str, png: bytes) -> None:
+        """
+        Put the rendered plot to the cache.
+        """
+
+        await self._set(key, "png", png)
+
+    async def set_file_id(self, key: str, file_id: str) -> None:
+        """
+        Put the Telegram file_id of the uploaded plot to the cache.
+        """
+
+        await self._set(key, "file_id", file_id)
+
+    async def _set(self, key: str, field: str, value: str | bytes) -> None:
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.hset(key, field, value)
+                pipe.expire(key, self._config.max_ttl)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning("Plot cache is unavailable: %s", e)
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from redis.asyncio.client import Redis
+from redis.exceptions import RedisError
+
+from src.config import CacheConfig
+from src.database import UserProfile
+from src.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileCache:
+    """
+    Short-lived in-process cache of the user profiles.
+
+    The invalidations are broadcast over Redis, so the other bot processes
+    drop their copies of a changed profile as well.
+    """
+
+    channel = "profile:invalidate"
+
+    def __init__(self, config: CacheConfig, redis: Redis | None = None) -> None:
+        self._config = config
+        self._redis = redis
+        self._profiles: OrderedDict[int, tuple[float, UserProfile]] = OrderedDict()
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """
+        Start receiving the invalidations, called on the dispatcher startup.
+        """
+
+        if self._redis is not None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        """
+        Stop receiving the invalidations, called on the dispatcher shutdown.
+        """
+
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def get(self, user_id: int) -> UserProfile | None:
+        """
+        Get the cached profile if it has not expired yet.
+        """
+
+        entry = self._profiles.get(user_id)
+
+        if entry is not None and entry[0] < time.monotonic():
+            del self._profiles[user_id]
+            entry = None
+
+        if entry is None:
+            CACHE_REQUESTS.labels(cache="profile", result="miss").inc()
+            return None
+
+        CACHE_REQUESTS.labels(cache="profile", result="hit").inc()
+        self._profiles.move_to_end(user_id)
+        return entry[1]
+
+    def set(self, profile: UserProfile) -> None:
+        """
+        Put the profile to the cache evicting the least recently used one.
+        """
+
+        self._profiles[profile.user_id] = (
+            time.monotonic() + self._config.profile_ttl,
+            profile,
+        )
+        self._profiles.move_to_end(profile.user_id)
+
+        while len(self._profiles) > self._config.profile_size:
+            self._profiles.popitem(last=False)
+
+    async def invalidate(self, user_id: int) -> None:
+        """
+        Drop the cached profile in all the bot processes after the user change.
+        """
+
+        self._profiles.pop(user_id, None)
+
+        if self._redis is None:
+            return
+
+        try:
+            await self._redis.publish(self.channel, user_id)
+        except RedisError as e:
+            logger.warning("Profile invalidation is not broadcast: %s", e)
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self._redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+
+                    # the invalidations sent while not subscribed are lost
+                    self._profiles.clear()
+
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._profiles.pop(int(message["data"]), None)
+            except RedisError as e:
+                logger.warning("Profile invalidations are not received: %s", e)
+                self._profiles.clear()
+                await asyncio.sleep(1)
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable
+
+from redis.asyncio.client import Redis
+from redis.exceptions import RedisError
+
+from src.config import CacheConfig
+
+logger = logging.getLogger(__name__)
+
+# delete the lock only if it is still held by the same owner
+RELEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical fetches inside the process
+    and across the bot replicas.
+    """
+
+    prefix = "lock"
+
+    def __init__(self, redis: Redis, config: CacheConfig) -> None:
+        self._redis = redis
+        self._config = config
+        self._calls: dict[str, asyncio.Task] = {}
+        self._release = redis.register_script(RELEASE_SCRIPT)
+
+    async def do(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        lookup: Callable[[], Awaitable[Any | None]],
+    ) -> Any:
+        """
+        Run the fetch once for all concurrent callers with the same key.
+        """
+
+        task = self._calls.get(key)
+
+        if task is None:
+            task = asyncio.create_task(self._run(key, fetch, lookup))
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+
+        # one cancelled caller must not cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        self._calls.pop(key, None)
+
+        if not task.cancelled():
+            # mark the exception as retrieved if all callers have gone
+            task.exception()
+
+    async def _run(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        lookup: Callable[[], Awaitable[Any | None]],
+    ) -> Any:
+        lock_key = f"{self.prefix}:{key}"
+        token = uuid.uuid4().hex
+
+        try:
+            acquired = await self._redis.set(
+                lock_key, token, nx=True, px=int(self._config.lock_ttl * 1000)
+            )
+        except RedisError as e:
+            logger.warning("Single-flight lock is unavailable: %s", e)
+            return await fetch()
+
+        if acquired:
+            try:
+                # the previous holder may have stored the value just before
+                # releasing the lock
+                res = await lookup()
+                if res is not None:
+                    return res
+
+                return await fetch()
+            finally:
+                try:
+                    await self._release(keys=[lock_key], args=[token])
+                except RedisError as e:
+                    logger.warning("Single-flight lock is unavailable: %s", e)
+
+        # another replica is fetching, wait for its result
+        deadline = time.monotonic() + self._config.lock_ttl
+
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self._config.lock_poll_interval)
+
+            res = await lookup()
+            if res is not None:
+                return res
+
+        return await fetch()
@@ -0,0 +1,70 @@
+import logging
+
+from redis.asyncio.client import Redis
+from redis.exceptions import RedisError
+
+from src.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+
+class TextCache:
+    """
+    Shared cache of the rendered forecast messages stored in Redis.
+
+    The messages of a forecast version are kept in one hash, so a process
+    which still holds the previous forecast never fills the hash of the new one.
+    """
+
+    prefix = "text"
+
+    def __init__(self, redis: Redis) -> None:
+        self._redis = redis
+
+    @classmethod
+    def key(cls, forecast_key: str, version: int | None) -> str:
+        """
+        Build the cache key of the messages rendered from the forecast,
+        the version changes with every forecast update.
+        """
+
+        return f"{cls.prefix}:{forecast_key}:{version}"
+
+    @staticmethod
+    def field(temp_unit: str, wind_unit: str, day: str) -> str:
+        """
+        Build the hash field of the message rendered for the units and the day.
+        """
+
+        return f"{temp_unit}:{wind_unit}:{day}"
+
+    async def get(self, key: str, field: str) -> str | None:
+        """
+        Get the rendered message.
+        """
+
+        try:
+            raw = await self._redis.hget(key, field)
+        except RedisError as e:
+            logger.warning("Text cache is unavailable: %s", e)
+            raw = None
+
+        if raw is None:
+            CACHE_REQUESTS.labels(cache="text", result="miss").inc()
+            return None
+
+        CACHE_REQUESTS.labels(cache="text", result="hit").inc()
+        return raw.decode()
+
+    async def set(self, key: str, field: str, text: str, ttl: int) -> None:
+        """
+        Put the rendered message to the cache for the lifetime of the forecast.
+        """
+
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.hset(key, field, text)
+                pipe.expire(key, ttl)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning("Text cache is unavailable: %s", e)
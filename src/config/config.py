@@ -2,7 +2,21 @@ from dataclasses import dataclass
 
 from environs import Env
 
-__all__ = ["Config", "load_config"]
+__all__ = [
+    "CacheConfig",
+    "Config",
+    "FSMConfig",
+    "MetricsConfig",
+    "PlotConfig",
+    "PostgresConfig",
+    "SubscriptionConfig",
+    "SupervisorConfig",
+    "ThrottlingConfig",
+    "WeatherAPIConfig",
+    "WarmerConfig",
+    "WebhookConfig",
+    "load_config",
+]
 
 
 @dataclass(slots=True)
@@ -19,6 +33,15 @@ class PostgresConfig:
     host: str
     port: int
     database: str
+    pool_size: int
+    max_overflow: int
+    pool_timeout: float
+    pool_recycle: int
+    pre_ping: bool
+    statement_timeout: int
+    prepared_statement_cache_size: int
+    replica_host: str | None
+    replica_port: int
 
 
 @dataclass(slots=True)
@@ -27,6 +50,120 @@ class RedisConfig:
     port: int
 
 
+@dataclass(slots=True)
+class WeatherAPIConfig:
+    base_url: str
+    limit: int
+    limit_per_host: int
+    keepalive_timeout: float
+    dns_cache_ttl: int
+    connect_timeout: float
+    total_timeout: float
+    budget: float
+    retries: int
+    retry_base_delay: float
+    retry_max_delay: float
+    breaker_threshold: int
+    breaker_reset_timeout: float
+    batch_window: float
+    batch_size: int
+
+
+@dataclass(slots=True)
+class FSMConfig:
+    state_ttl: int
+    data_ttl: int
+
+    def __post_init__(self) -> None:
+        # 0 keeps the keys forever, the data must not expire before its state,
+        # otherwise the setup goes on without the answers given so far
+        if self.data_ttl and (not self.state_ttl or self.data_ttl < self.state_ttl):
+            raise ValueError("FSM_DATA_TTL must not be shorter than FSM_STATE_TTL")
+
+
+@dataclass(slots=True)
+class CacheConfig:
+    precision: int
+    refresh_interval: int
+    min_ttl: int
+    max_ttl: int
+    lock_ttl: float
+    lock_poll_interval: float
+    profile_ttl: float
+    profile_size: int
+    model_size: int
+    stale_ttl: int
+
+
+@dataclass(slots=True)
+class PlotConfig:
+    workers: int
+    backend: str
+    font: str
+
+
+@dataclass(slots=True)
+class ThrottlingConfig:
+    user_message_rate: float
+    user_message_burst: int
+    user_callback_rate: float
+    user_callback_burst: int
+    global_message_rate: float
+    global_message_burst: int
+    global_callback_rate: float
+    global_callback_burst: int
+
+
+@dataclass(slots=True)
+class WebhookConfig:
+    enabled: bool
+    url: str
+    path: str
+    secret: str
+    host: str
+    port: int
+    max_concurrent_updates: int
+
+
+@dataclass(slots=True)
+class MetricsConfig:
+    enabled: bool
+    host: str
+    port: int
+    path: str
+
+
+@dataclass(slots=True)
+class SubscriptionConfig:
+    enabled: bool
+    interval: float
+    global_rate: float
+    global_burst: int
+    chat_rate: float
+    chat_burst: int
+    concurrency: int
+
+
+@dataclass(slots=True)
+class WarmerConfig:
+    enabled: bool
+    interval: float
+    top: int
+    refresh_ahead: float
+    budget: int
+    half_life: float
+
+
+@dataclass(slots=True)
+class SupervisorConfig:
+    workers: int
+    host: str
+    port: int
+    heartbeat_timeout: float
+    shutdown_timeout: float
+    max_concurrent_updates: int
+
+
 @dataclass(slots=True)
 class Config:
     _instance = None
@@ -39,6 +176,16 @@ class Config:
     bot: Bot
     postgres: PostgresConfig
     redis: RedisConfig
+    fsm: FSMConfig
+    weather_api: WeatherAPIConfig
+    cache: CacheConfig
+    plot: PlotConfig
+    throttling: ThrottlingConfig
+    webhook: WebhookConfig
+    metrics: MetricsConfig
+    subscriptions: SubscriptionConfig
+    warmer: WarmerConfig
+    supervisor: SupervisorConfig
 
 
 def load_config():
@@ -54,6 +201,105 @@ def load_config():
             host=env("POSTGRES_HOST"),
             port=int(env("POSTGRES_PORT")),
             database=env("POSTGRES_DB"),
+            pool_size=env.int("POSTGRES_POOL_SIZE", 20),
+            max_overflow=env.int("POSTGRES_MAX_OVERFLOW", 10),
+            pool_timeout=env.float("POSTGRES_POOL_TIMEOUT", 10.0),
+            pool_recycle=env.int("POSTGRES_POOL_RECYCLE", 1800),
+            pre_ping=env.bool("POSTGRES_PRE_PING", False),
+            statement_timeout=env.int("POSTGRES_STATEMENT_TIMEOUT", 5000),
+            prepared_statement_cache_size=env.int(
+                "POSTGRES_PREPARED_STATEMENT_CACHE_SIZE", 500
+            ),
+            replica_host=env("POSTGRES_REPLICA_HOST", "") or None,
+            replica_port=env.int("POSTGRES_REPLICA_PORT", int(env("POSTGRES_PORT"))),
         ),
         redis=RedisConfig(host=env("REDIS_HOST"), port=int(env("REDIS_PORT"))),
+        fsm=FSMConfig(
+            state_ttl=env.int("FSM_STATE_TTL", 86400),
+            data_ttl=env.int("FSM_DATA_TTL", 86400),
+        ),
+        weather_api=WeatherAPIConfig(
+            base_url=env("WEATHER_API_URL", "http://api.weatherapi.com/v1"),
+            limit=env.int("WEATHER_API_LIMIT", 100),
+            limit_per_host=env.int("WEATHER_API_LIMIT_PER_HOST", 100),
+            keepalive_timeout=env.float("WEATHER_API_KEEPALIVE_TIMEOUT", 30.0),
+            dns_cache_ttl=env.int("WEATHER_API_DNS_CACHE_TTL", 300),
+            connect_timeout=env.float("WEATHER_API_CONNECT_TIMEOUT", 3.0),
+            total_timeout=env.float("WEATHER_API_TOTAL_TIMEOUT", 10.0),
+            budget=env.float("WEATHER_API_BUDGET", 8.0),
+            retries=env.int("WEATHER_API_RETRIES", 2),
+            retry_base_delay=env.float("WEATHER_API_RETRY_BASE_DELAY", 0.2),
+            retry_max_delay=env.float("WEATHER_API_RETRY_MAX_DELAY", 2.0),
+            breaker_threshold=env.int("WEATHER_API_BREAKER_THRESHOLD", 5),
+            breaker_reset_timeout=env.float("WEATHER_API_BREAKER_RESET_TIMEOUT", 30.0),
+            batch_window=env.float("WEATHER_API_BATCH_WINDOW", 0.0),
+            batch_size=env.int("WEATHER_API_BATCH_SIZE", 50),
+        ),
+        cache=CacheConfig(
+            precision=env.int("CACHE_PRECISION", 2),
+            refresh_interval=env.int("CACHE_REFRESH_INTERVAL", 900),
+            min_ttl=env.int("CACHE_MIN_TTL", 60),
+            max_ttl=env.int("CACHE_MAX_TTL", 1800),
+            lock_ttl=env.float("CACHE_LOCK_TTL", 10.0),
+            lock_poll_interval=env.float("CACHE_LOCK_POLL_INTERVAL", 0.05),
+            profile_ttl=env.float("CACHE_PROFILE_TTL", 30.0),
+            profile_size=env.int("CACHE_PROFILE_SIZE", 10000),
+            model_size=env.int("CACHE_MODEL_SIZE", 1000),
+            stale_ttl=env.int("CACHE_STALE_TTL", 21600),
+        ),
+        plot=PlotConfig(
+            workers=env.int("PLOT_WORKERS", 2),
+            backend=env("PLOT_BACKEND", "matplotlib"),
+            font=env("PLOT_FONT", "DejaVuSans.ttf"),
+        ),
+        throttling=ThrottlingConfig(
+            user_message_rate=env.float("THROTTLING_USER_MESSAGE_RATE", 2.0),
+            user_message_burst=env.int("THROTTLING_USER_MESSAGE_BURST", 3),
+            user_callback_rate=env.float("THROTTLING_USER_CALLBACK_RATE", 2.0),
+            user_callback_burst=env.int("THROTTLING_USER_CALLBACK_BURST", 5),
+            global_message_rate=env.float("THROTTLING_GLOBAL_MESSAGE_RATE", 0.0),
+            global_message_burst=env.int("THROTTLING_GLOBAL_MESSAGE_BURST", 0),
+            global_callback_rate=env.float("THROTTLING_GLOBAL_CALLBACK_RATE", 0.0),
+            global_callback_burst=env.int("THROTTLING_GLOBAL_CALLBACK_BURST", 0),
+        ),
+        webhook=WebhookConfig(
+            enabled=env.bool("WEBHOOK_ENABLED", False),
+            url=env("WEBHOOK_URL", ""),
+            path=env("WEBHOOK_PATH", "/webhook"),
+            secret=env("WEBHOOK_SECRET", ""),
+            host=env("WEBHOOK_HOST", "0.0.0.0"),
+            port=env.int("WEBHOOK_PORT", 8080),
+            max_concurrent_updates=env.int("WEBHOOK_MAX_CONCURRENT_UPDATES", 100),
+        ),
+        metrics=MetricsConfig(
+            enabled=env.bool("METRICS_ENABLED", True),
+            host=env("METRICS_HOST", "0.0.0.0"),
+            port=env.int("METRICS_PORT", 9000),
+            path=env("METRICS_PATH", "/metrics"),
+        ),
+        subscriptions=SubscriptionConfig(
+            enabled=env.bool("SUBSCRIPTIONS_ENABLED", True),
+            interval=env.float("SUBSCRIPTIONS_INTERVAL", 60.0),
+            global_rate=env.float("SUBSCRIPTIONS_GLOBAL_RATE", 25.0),
+            global_burst=env.int("SUBSCRIPTIONS_GLOBAL_BURST", 25),
+            chat_rate=env.float("SUBSCRIPTIONS_CHAT_RATE", 1.0),
+            chat_burst=env.int("SUBSCRIPTIONS_CHAT_BURST", 1),
+            concurrency=env.int("SUBSCRIPTIONS_CONCURRENCY", 10),
+        ),
+        warmer=WarmerConfig(
+            enabled=env.bool("WARMER_ENABLED", True),
+            interval=env.float("WARMER_INTERVAL", 30.0),
+            top=env.int("WARMER_TOP", 100),
+            refresh_ahead=env.float("WARMER_REFRESH_AHEAD", 90.0),
+            budget=env.int("WARMER_BUDGET", 20),
+            half_life=env.float("WARMER_HALF_LIFE", 3600.0),
+        ),
+        supervisor=SupervisorConfig(
+            workers=env.int("SUPERVISOR_WORKERS", 0),
+            host=env("SUPERVISOR_HOST", "0.0.0.0"),
+            port=env.int("SUPERVISOR_PORT", 9100),
+            heartbeat_timeout=env.float("SUPERVISOR_HEARTBEAT_TIMEOUT", 10.0),
+            shutdown_timeout=env.float("SUPERVISOR_SHUTDOWN_TIMEOUT", 30.0),
+            max_concurrent_updates=env.int("SUPERVISOR_MAX_CONCURRENT_UPDATES", 100),
+        ),
     )
@@ -1,8 +1,78 @@
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from contextlib import asynccontextmanager
+from datetime import date, time, timedelta
+from time import perf_counter
+from typing import AsyncIterator
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, async_sessionmaker
 
 from src.errors import DatabaseError
+from src.metrics import DB_CHECKOUT_WAIT
+
+from .models import Subscription, User, UserProfile
+
+PROFILE_COLUMNS = (
+    User.user_id,
+    User.language,
+    User.latitude,
+    User.longitude,
+    User.temp_unit,
+    User.wind_unit,
+    User.timezone,
+)
+
+
+@asynccontextmanager
+async def _connect(
+    sessionmaker: async_sessionmaker[AsyncSession], readonly: bool = False
+) -> AsyncIterator[AsyncConnection]:
+    # the reads which tolerate the replica lag go to the replica, if there
+    # is one, the user reads their own writes from the primary
+    engine = sessionmaker.kw["bind"]
 
-from .models import User
+    if readonly:
+        engine = sessionmaker.kw.get("info", {}).get("replica", engine)
+
+    # every query is a single statement, so it commits by itself
+    # without the BEGIN and COMMIT/ROLLBACK round trips
+    started = perf_counter()
+
+    try:
+        async with engine.connect() as conn:
+            # the wait grows when the pool is exhausted
+            DB_CHECKOUT_WAIT.observe(perf_counter() - started)
+            yield await conn.execution_options(isolation_level="AUTOCOMMIT")
+    except sa.exc.TimeoutError as e:
+        DB_CHECKOUT_WAIT.observe(perf_counter() - started)
+        raise DatabaseError from e
+    except Exception as e:
+        raise DatabaseError from e
+
+
+def _upsert(table: sa.Table, values: dict, key: str) -> sa.Insert:
+    """
+    Build INSERT ... ON CONFLICT DO UPDATE on the key column.
+    """
+
+    stmt = postgresql.insert(table).values(**values)
+
+    return stmt.on_conflict_do_update(
+        index_elements=[key],
+        set_={column: stmt.excluded[column] for column in values if column != key},
+    )
+
+
+def _to_profile(row: sa.Row) -> UserProfile:
+    return UserProfile(
+        user_id=row.user_id,
+        language=row.language,
+        latitude=None if row.latitude is None else float(row.latitude),
+        longitude=None if row.longitude is None else float(row.longitude),
+        temp_unit=row.temp_unit,
+        wind_unit=row.wind_unit,
+        timezone=row.timezone,
+    )
 
 
 async def post_lang(
@@ -12,74 +82,73 @@ async def post_lang(
     Post info about the user language to the db.
     """
 
-    async with sessionmaker() as session:
-        async with session.begin():
-            try:
-                user = await session.get(User, data[0])
-
-                if user:
-                    # update language info about the existing user
-                    user.language = data[1]
-                else:
-                    # insert language info about the new user
-                    user = User(user_id=data[0], language=data[1])
-                    session.add(user)
-
-            except Exception as e:
-                await session.rollback()
-                raise DatabaseError from e
+    async with _connect(sessionmaker) as conn:
+        # insert the new user or update the language of the existing one
+        await conn.execute(
+            _upsert(
+                User.__table__,
+                {"user_id": data[0], "language": data[1]},
+                key="user_id",
+            )
+        )
 
 
 async def get_data(
     user_id: int, sessionmaker: async_sessionmaker[AsyncSession]
-) -> dict[str, str | float]:
+) -> dict[str, str | float | None]:
     """
     Get all info about the user from the db.
     """
 
-    async with sessionmaker() as session:
-        async with session.begin():
-            try:
-                user = await session.get(User, user_id)
-                if user:
-                    user_info = {
-                        "language": user.language,
-                        "latitude": user.latitude,
-                        "longitude": user.longitude,
-                        "temp_unit": user.temp_unit,
-                        "wind_unit": user.wind_unit,
-                    }
-                    return user_info
-                else:
-                    raise DatabaseError
+    async with _connect(sessionmaker) as conn:
+        row = (
+            await conn.execute(
+                sa.select(*PROFILE_COLUMNS[1:]).where(User.user_id == user_id)
+            )
+        ).first()
 
-            except Exception as e:
-                raise DatabaseError from e
+    if row is None:
+        raise DatabaseError
+
+    return row._asdict()
 
 
 async def update_data(
-    data: tuple[int, dict[str, str | float]],
+    data: tuple[int, dict[str, str | float | None]],
     sessionmaker: async_sessionmaker[AsyncSession],
 ) -> None:
     """
     Update certain info about the user in the db.
     """
 
-    async with sessionmaker() as session:
-        async with session.begin():
-            try:
-                user = await session.get(User, data[0])
-                if user:
-                    user.latitude = data[1]["latitude"]
-                    user.longitude = data[1]["longitude"]
-                    user.temp_unit = data[1]["temp_unit"]
-                    user.wind_unit = data[1]["wind_unit"]
-                else:
-                    raise DatabaseError
+    async with _connect(sessionmaker) as conn:
+        res = await conn.execute(
+            sa.update(User)
+            .where(User.user_id == data[0])
+            .values(
+                latitude=data[1]["latitude"],
+                longitude=data[1]["longitude"],
+                temp_unit=data[1]["temp_unit"],
+                wind_unit=data[1]["wind_unit"],
+                timezone=data[1].get("timezone"),
+            )
+        )
+
+    if res.rowcount == 0:
+        raise DatabaseError
 
-            except Exception as e:
-                await session.rollback()
-                raise DatabaseError from e
+
+async def set_timezone(
+    user_id: int, timezone: str, sessionmaker: async_sessionmaker[AsyncSession]
+) -> None:
+    """
+    Save the timezone of the user resolved from the location.
+    """
+
+    async with _connect(sessionmaker) as conn:
+        await conn.execute(
+            sa.update(User).where(User.user_id == user_id).values(timezone=timezone)
+        )
 
 
 async def get_language(
@@ -89,15 +158,167 @@ async def get_language(
     Get info about the user language from the db.
     """
 
-    async with sessionmaker() as session:
-        async with session.begin():
-            try:
-                user = await session.get(User, user_id)
+    async with _connect(sessionmaker) as conn:
+        row = (
+            await conn.execute(sa.select(User.language).where(User.user_id == user_id))
+        ).first()
+
+    if row is None:
+        raise DatabaseError
+
+    return row.language
+
+
+async def get_profile(
+    user_id: int, sessionmaker: async_sessionmaker[AsyncSession]
+) -> UserProfile | None:
+    """
+    Get the read-only profile of the user from the db.
+    """
+
+    async with _connect(sessionmaker) as conn:
+        row = (
+            await conn.execute(
+                sa.select(*PROFILE_COLUMNS).where(User.user_id == user_id)
+            )
+        ).first()
+
+    return None if row is None else _to_profile(row)
+
+
+async def subscribe(
+    data: tuple[int, time, date | None],
+    sessionmaker: async_sessionmaker[AsyncSession],
+) -> None:
+    """
+    Subscribe the user to the daily forecast or change the delivery time.
+    """
+
+    user_id, delivery_time, last_sent_on = data
+
+    async with _connect(sessionmaker) as conn:
+        await conn.execute(
+            _upsert(
+                Subscription.__table__,
+                {
+                    "user_id": user_id,
+                    "delivery_time": delivery_time,
+                    "last_sent_on": last_sent_on,
+                },
+                key="user_id",
+            )
+        )
+
+
+async def unsubscribe(
+    user_id: int, sessionmaker: async_sessionmaker[AsyncSession]
+) -> bool:
+    """
+    Unsubscribe the user from the daily forecast.
+    """
+
+    async with _connect(sessionmaker) as conn:
+        res = await conn.execute(
+            sa.delete(Subscription).where(Subscription.user_id == user_id)
+        )
+
+    return res.rowcount > 0
+
+
+async def get_subscription(
+    user_id: int, sessionmaker: async_sessionmaker[AsyncSession]
+) -> time | None:
+    """
+    Get the daily forecast delivery time of the user.
+    """
+
+    async with _connect(sessionmaker) as conn:
+        return await conn.scalar(
+            sa.select(Subscription.delivery_time).where(Subscription.user_id == user_id)
+        )
+
+
+async def get_subscription_timezones(
+    sessionmaker: async_sessionmaker[AsyncSession],
+) -> list[str | None]:
+    """
+    Get the timezones of all the subscribed users.
+    """
+
+    async with _connect(sessionmaker, readonly=True) as conn:
+        res = await conn.scalars(
+            sa.select(User.timezone)
+            .join(Subscription, Subscription.user_id == User.user_id)
+            .distinct()
+        )
+        return list(res)
+
+
+async def release_subscriptions(
+    user_ids: list[int],
+    local_date: date,
+    sessionmaker: async_sessionmaker[AsyncSession],
+) -> None:
+    """
+    Make the claimed but not delivered subscriptions due again.
+    """
+
+    # the day before makes the subscription due today again
+    async with _connect(sessionmaker) as conn:
+        await conn.execute(
+            sa.update(Subscription)
+            .where(
+                Subscription.user_id.in_(user_ids),
+                Subscription.last_sent_on == local_date,
+            )
+            .values(last_sent_on=local_date - timedelta(days=1))
+        )
+
+
+async def claim_due_subscriptions(
+    timezone: str | None,
+    local_date: date,
+    local_time: time,
+    sessionmaker: async_sessionmaker[AsyncSession],
+    chunk_size: int = 1000,
+) -> list[UserProfile]:
+    """
+    Mark the due subscriptions of the timezone as sent today and get their users.
+    """
+
+    # the update claims the rows atomically, so several bot replicas
+    # never deliver the same forecast twice
+    users = sa.select(User.user_id).where(
+        User.timezone.is_(None) if timezone is None else User.timezone == timezone,
+        User.latitude.is_not(None),
+        User.longitude.is_not(None),
+    )
+
+    async with _connect(sessionmaker) as conn:
+        user_ids = list(
+            await conn.scalars(
+                sa.update(Subscription)
+                .where(
+                    Subscription.delivery_time <= local_time,
+                    sa.or_(
+                        Subscription.last_sent_on.is_(None),
+                        Subscription.last_sent_on < local_date,
+                    ),
+                    Subscription.user_id.in_(users),
+                )
+                .values(last_sent_on=local_date)
+                .returning(Subscription.user_id)
+            )
+        )
+
+        profiles = []
 
-                if user:
-                    return user.language
-                else:
-                    raise DatabaseError
+        for i in range(0, len(user_ids), chunk_size):
+            res = await conn.execute(
+                sa.select(*PROFILE_COLUMNS).where(
+                    User.user_id.in_(user_ids[i : i + chunk_size])
+                )
+            )
+            profiles.extend(_to_profile(row) for row in res)
 
-            except Exception as e:
-                raise DatabaseError from e
+    return profiles
@@ -1,20 +1,95 @@
+import asyncio
+
 from sqlalchemy.engine import URL
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from src.config import PostgresConfig
+from src.metrics import instrument_engine
+
 
-from src.config import load_config
+def _create_engine(config: PostgresConfig, host: str, port: int) -> AsyncEngine:
+    query = {}
+    connect_args = {}
 
+    if config.driver.endswith("asyncpg"):
+        query["prepared_statement_cache_size"] = str(
+            config.prepared_statement_cache_size
+        )
+        connect_args["server_settings"] = {
+            "statement_timeout": str(config.statement_timeout)
+        }
 
-def get_sessionmaker() -> async_sessionmaker[AsyncSession]:
-    config = load_config()
     postgres_url = URL.create(
-        drivername=config.postgres.driver,
-        username=config.postgres.user,
-        password=config.postgres.password,
-        host=config.postgres.host,
-        port=config.postgres.port,
-        database=config.postgres.database,
+        drivername=config.driver,
+        username=config.user,
+        password=config.password,
+        host=host,
+        port=port,
+        database=config.database,
+        query=query,
+    )
+
+    # the recycling replaces the connections closed by the server, so there is
+    # no need to ping the db on every checkout unless asked
+    async_engine = create_async_engine(
+        url=postgres_url,
+        pool_size=config.pool_size,
+        max_overflow=config.max_overflow,
+        pool_timeout=config.pool_timeout,
+        pool_recycle=config.pool_recycle,
+        pool_pre_ping=config.pre_ping,
+        connect_args=connect_args,
     )
+    instrument_engine(async_engine.sync_engine)
+    return async_engine
 
-    async_engine = create_async_engine(url=postgres_url, pool_pre_ping=True)
-    sessionmaker = async_sessionmaker(bind=async_engine, class_=AsyncSession)
+
+def get_sessionmaker(config: PostgresConfig) -> async_sessionmaker[AsyncSession]:
+    """
+    Create the sessionmaker of the primary db with the engine of the replica, if any.
+    """
+
+    async_engine = _create_engine(config, config.host, config.port)
+    info = {}
+
+    if config.replica_host:
+        info["replica"] = _create_engine(
+            config, config.replica_host, config.replica_port
+        )
+
+    sessionmaker = async_sessionmaker(bind=async_engine, class_=AsyncSession, info=info)
     return sessionmaker
+
+
+async def dispose_sessionmaker(sessionmaker: async_sessionmaker[AsyncSession]) -> None:
+    """
+    Close the connections of the primary and the replica engines.
+    """
+
+    await sessionmaker.kw["bind"].dispose()
+
+    if (replica := sessionmaker.kw.get("info", {}).get("replica")) is not None:
+        await replica.dispose()
+
+
+async def connect_sessionmaker(sessionmaker: async_sessionmaker[AsyncSession]) -> None:
+    """
+    Open the first connections of the primary and the replica engines.
+    """
+
+    async def connect(engine: AsyncEngine) -> None:
+        # the connection goes back to the pool for the first query
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql("SELECT 1")
+
+    engines = [sessionmaker.kw["bind"]]
+
+    if (replica := sessionmaker.kw.get("info", {}).get("replica")) is not None:
+        engines.append(replica)
+
+    await asyncio.gather(*(connect(engine) for engine in engines))
@@ -0,0 +1,64 @@
+"""backfill user timezone
+
+Revision ID: 8a6d3e51b2c4
+Revises: 5d2e8f1c0a97
+Create Date: 2026-10-19 09:41:27.604318
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8a6d3e51b2c4"
+down_revision = "5d2e8f1c0a97"
+branch_labels = None
+depends_on = None
+
+users = sa.table(
+    "users",
+    sa.column("user_id", sa.BIGINT),
+    sa.column("latitude", sa.DECIMAL),
+    sa.column("longitude", sa.DECIMAL),
+    sa.column("timezone", sa.VARCHAR),
+)
+
+
+def upgrade() -> None:
+    # the users saved before the timezone column get it from their location
+    from timezonefinder import TimezoneFinder
+
+    finder = TimezoneFinder()
+    conn = op.get_bind()
+
+    rows = conn.execute(
+        sa.select(users.c.user_id, users.c.latitude, users.c.longitude).where(
+            users.c.timezone.is_(None),
+            users.c.latitude.is_not(None),
+            users.c.longitude.is_not(None),
+        )
+    ).all()
+
+    values = [
+        {"id": row.user_id, "tz": timezone}
+        for row in rows
+        if (
+            timezone := finder.certain_timezone_at(
+                lat=float(row.latitude), lng=float(row.longitude)
+            )
+        )
+        is not None
+    ]
+
+    if values:
+        conn.execute(
+            sa.update(users)
+            .where(users.c.user_id == sa.bindparam("id"))
+            .values(timezone=sa.bindparam("tz")),
+            values,
+        )
+
+
+def downgrade() -> None:
+    # the resolved timezones are kept, the column is dropped by the previous revision
+    pass
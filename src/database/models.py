@@ -1,3 +1,5 @@
+from dataclasses import dataclass
+
 import sqlalchemy as sa
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -13,6 +15,38 @@ class User(Base):
     longitude = sa.Column(sa.DECIMAL, nullable=True)
     temp_unit = sa.Column(sa.VARCHAR, nullable=True)
     wind_unit = sa.Column(sa.VARCHAR, nullable=True)
+    timezone = sa.Column(sa.VARCHAR, nullable=True)
 
     def __str__(self) -> str:
         return f"<User:{self.user_id}>"
+
+
+class Subscription(Base):
+    __tablename__ = "subscriptions"
+
+    user_id = sa.Column(
+        sa.BIGINT,
+        sa.ForeignKey("users.user_id", ondelete="CASCADE"),
+        nullable=False,
+        primary_key=True,
+    )
+    delivery_time = sa.Column(sa.TIME, nullable=False, index=True)
+    last_sent_on = sa.Column(sa.DATE, nullable=True)
+
+    def __str__(self) -> str:
+        return f"<Subscription:{self.user_id}>"
+
+
+@dataclass(frozen=True, slots=True)
+class UserProfile:
+    """
+    Read-only snapshot of the user row shared by the handlers and services.
+    """
+
+    user_id: int
+    language: str | None = None
+    latitude: float | None = None
+    longitude: float | None = None
+    temp_unit: str | None = None
+    wind_unit: str | None = None
+    timezone: str | None = None
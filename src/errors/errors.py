@@ -6,3 +6,8 @@ class DatabaseError(BaseException):
 class GetWeatherError(BaseException):
     def __init__(self) -> None:
         super().__init__("Can not get weather data")
+
+
+class SetupRequiredError(BaseException):
+    def __init__(self) -> None:
+        super().__init__("User setup is not completed")
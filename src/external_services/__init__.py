@@ -1 +1,5 @@
+from .batcher import *  # noqa: F403
+from .breaker import *  # noqa: F403
+from .models import *  # noqa: F403
+from .series import *  # noqa: F403
 from .weather_api import *  # noqa: F403
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from src.errors import GetWeatherError
+
+logger = logging.getLogger(__name__)
+
+BatchKey = tuple[str, tuple[tuple[str, str], ...]]
+SendBatch = Callable[[str, dict[str, str], list[str]], Awaitable[list[dict | None]]]
+
+
+class _Batch:
+    __slots__ = ("endpoint", "params", "futures", "timer")
+
+    def __init__(self, endpoint: str, params: dict[str, str]) -> None:
+        self.endpoint = endpoint
+        self.params = params
+        self.futures: dict[str, asyncio.Future] = {}
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class RequestBatcher:
+    """
+    Collect the location lookups arriving within a short window and send them
+    to the upstream together.
+
+    The lookups of one endpoint with the same parameters go to one batch, the
+    same location is looked up once per batch. A batch is sent when the
+    window passes or when it is full, the results are passed back to the
+    waiting callers.
+    """
+
+    def __init__(self, send: SendBatch, window: float, max_size: int) -> None:
+        self._send = send
+        self._window = window
+        self._max_size = max_size
+        self._batches: dict[BatchKey, _Batch] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def lookup(self, endpoint: str, q: str, params: dict[str, str]) -> dict:
+        """
+        Get the response for one location as a part of a batch.
+        """
+
+        key = (endpoint, tuple(sorted(params.items())))
+
+        if (batch := self._batches.get(key)) is None:
+            batch = self._batches[key] = _Batch(endpoint, params)
+            batch.timer = asyncio.get_running_loop().call_later(
+                self._window, self._flush, key
+            )
+
+        if (future := batch.futures.get(q)) is None:
+            future = batch.futures[q] = asyncio.get_running_loop().create_future()
+
+            if len(batch.futures) >= self._max_size:
+                self._flush(key)
+
+        # the other callers still wait for the result if this one is cancelled
+        return await asyncio.shield(future)
+
+    async def close(self) -> None:
+        """
+        Fail the waiting lookups and stop the batches in flight.
+        """
+
+        for batch in self._batches.values():
+            batch.timer.cancel()
+            self._resolve(batch, [None] * len(batch.futures))
+
+        self._batches.clear()
+
+        for task in self._tasks:
+            task.cancel()
+
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _flush(self, key: BatchKey) -> None:
+        if (batch := self._batches.pop(key, None)) is None:
+            return
+
+        batch.timer.cancel()
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: _Batch) -> None:
+        queries = list(batch.futures)
+        results: list[dict | None] = [None] * len(queries)
+
+        try:
+            results = await self._send(batch.endpoint, batch.params, queries)
+        except GetWeatherError:
+            pass
+        except Exception:
+            logger.exception("Batch of %s lookups has failed", len(queries))
+        finally:
+            # a cancelled batch fails its callers instead of leaving them waiting
+            self._resolve(batch, results)
+
+    @staticmethod
+    def _resolve(batch: _Batch, results: list[dict | None]) -> None:
+        for future, result in zip(batch.futures.values(), results):
+            if future.done():
+                continue
+
+            if result is None:
+                future.set_exception(GetWeatherError())
+            else:
+                future.set_result(result)
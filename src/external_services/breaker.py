@@ -0,0 +1,85 @@
+import time
+
+from src.metrics import UPSTREAM_BREAKER_STATE
+
+
+class CircuitBreaker:
+    """
+    Fail fast while the upstream is unhealthy.
+
+    The breaker opens after the given number of consecutive failures and
+    rejects the calls until the reset timeout passes. Then a single probe
+    is let through, its success closes the breaker and its failure opens
+    it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold: int, reset_timeout: float, name: str) -> None:
+        self._threshold = threshold
+        self._reset_timeout = reset_timeout
+        self._name = name
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._set_state(self.CLOSED)
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        """
+        Check if a call may go to the upstream now.
+        """
+
+        if self._state == self.CLOSED:
+            return True
+
+        if self._state == self.OPEN:
+            if time.monotonic() - self._opened_at < self._reset_timeout:
+                return False
+            self._set_state(self.HALF_OPEN)
+
+        # only one call probes the upstream at a time
+        if self._probing:
+            return False
+
+        self._probing = True
+        return True
+
+    def success(self) -> None:
+        """
+        Record a successful call.
+        """
+
+        self._failures = 0
+        self._probing = False
+
+        if self._state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def failure(self) -> None:
+        """
+        Record a failed call.
+        """
+
+        self._failures += 1
+        self._probing = False
+
+        if self._state == self.HALF_OPEN or self._failures >= self._threshold:
+            self._opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+    def release(self) -> None:
+        """
+        Let another call probe the upstream, a no-op if the probe has ended.
+        """
+
+        self._probing = False
+
+    def _set_state(self, state: str) -> None:
+        self._state = state
+        UPSTREAM_BREAKER_STATE.labels(name=self._name).set(
+            (self.CLOSED, self.HALF_OPEN, self.OPEN).index(state)
+        )
@@ -0,0 +1,152 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class CurrentWeather:
+    """
+    Current weather conditions.
+    """
+
+    last_updated_epoch: int | None
+    condition: str
+    temp_c: float
+    temp_f: float
+    feelslike_c: float
+    feelslike_f: float
+    wind_kph: float
+    wind_dir: str
+    pressure_mb: float
+    precip_mm: float
+    humidity: int
+    cloud: int
+
+
+@dataclass(frozen=True, slots=True)
+class HourForecast:
+    """
+    Weather forecast for an hour.
+    """
+
+    time_epoch: int
+    temp_c: float
+    temp_f: float
+    wind_kph: float
+    precip_mm: float
+    humidity: int
+
+
+@dataclass(frozen=True, slots=True)
+class DayForecast:
+    """
+    Weather forecast for a day.
+    """
+
+    date: str
+    condition: str
+    maxtemp_c: float
+    maxtemp_f: float
+    mintemp_c: float
+    mintemp_f: float
+    avgtemp_c: float
+    avgtemp_f: float
+    maxwind_kph: float
+    totalprecip_mm: float
+    avghumidity: int
+    hours: tuple[HourForecast, ...]
+
+    @property
+    def day(self) -> str:
+        """
+        Get the day of the month in the "%d" format.
+        """
+
+        return self.date[-2:]
+
+
+@dataclass(frozen=True, slots=True)
+class Forecast:
+    """
+    Weather API response parsed once and shared by all the handlers.
+    """
+
+    current: CurrentWeather
+    days: tuple[DayForecast, ...] = ()
+    stale: bool = False
+
+    @property
+    def version(self) -> int | None:
+        """
+        Get the time of the last weather update.
+        """
+
+        return self.current.last_updated_epoch
+
+    def get_day(self, day: str) -> DayForecast | None:
+        """
+        Get the forecast for the day of the month.
+        """
+
+        for forecast_day in self.days:
+            if forecast_day.day == day:
+                return forecast_day
+
+        return None
+
+
+def _parse_hour(hour: dict) -> HourForecast:
+    return HourForecast(
+        time_epoch=hour["time_epoch"],
+        temp_c=hour["temp_c"],
+        temp_f=hour["temp_f"],
+        wind_kph=hour["wind_kph"],
+        precip_mm=hour["precip_mm"],
+        humidity=hour["humidity"],
+    )
+
+
+def _parse_day(forecast_day: dict) -> DayForecast:
+    day = forecast_day["day"]
+
+    return DayForecast(
+        date=forecast_day["date"],
+        condition=str(day["condition"]["text"]),
+        maxtemp_c=day["maxtemp_c"],
+        maxtemp_f=day["maxtemp_f"],
+        mintemp_c=day["mintemp_c"],
+        mintemp_f=day["mintemp_f"],
+        avgtemp_c=day["avgtemp_c"],
+        avgtemp_f=day["avgtemp_f"],
+        maxwind_kph=day["maxwind_kph"],
+        totalprecip_mm=day["totalprecip_mm"],
+        avghumidity=day["avghumidity"],
+        hours=tuple(_parse_hour(hour) for hour in forecast_day.get("hour", ())),
+    )
+
+
+def parse_forecast(payload: dict) -> Forecast:
+    """
+    Convert the weather API response to the typed model.
+    """
+
+    current = payload["current"]
+
+    return Forecast(
+        current=CurrentWeather(
+            last_updated_epoch=current.get("last_updated_epoch"),
+            condition=str(current["condition"]["text"]),
+            temp_c=current["temp_c"],
+            temp_f=current["temp_f"],
+            feelslike_c=current["feelslike_c"],
+            feelslike_f=current["feelslike_f"],
+            wind_kph=current["wind_kph"],
+            wind_dir=current["wind_dir"],
+            pressure_mb=current["pressure_mb"],
+            precip_mm=current["precip_mm"],
+            humidity=current["humidity"],
+            cloud=current["cloud"],
+        ),
+        days=tuple(
+            _parse_day(day)
+            for day in payload.get("forecast", {}).get("forecastday", ())
+        ),
+    )
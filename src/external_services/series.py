@@ -0,0 +1,70 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+from .models import Forecast
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# the columns of the extracted table
+_COLUMNS = ("time_epoch", "temp_c", "wind_kph", "precip_mm", "humidity")
+
+
+@dataclass(frozen=True, slots=True)
+class ForecastSeries:
+    """
+    Forecast values as arrays, one item per day or per hour.
+    """
+
+    time_epoch: "np.ndarray"
+    temp_c: "np.ndarray"
+    wind_kph: "np.ndarray"
+    precip_mm: "np.ndarray"
+    humidity: "np.ndarray"
+
+
+def _to_series(rows: list[tuple[float, ...]]) -> ForecastSeries:
+    # numpy is loaded on the first plot, not on the start of the bot
+    import numpy as np
+
+    table = np.array(rows, dtype=np.float64).reshape(-1, len(_COLUMNS))
+    columns = dict(zip(_COLUMNS, table.T))
+    columns["time_epoch"] = columns["time_epoch"].astype(np.int64)
+    return ForecastSeries(**columns)
+
+
+def hourly_series(forecast: Forecast) -> ForecastSeries:
+    """
+    Extract the hourly values of all the forecast days in one pass.
+    """
+
+    return _to_series(
+        [
+            (hour.time_epoch, hour.temp_c, hour.wind_kph, hour.precip_mm, hour.humidity)
+            for day in forecast.days
+            for hour in day.hours
+        ]
+    )
+
+
+def daily_series(forecast: Forecast) -> ForecastSeries:
+    """
+    Extract the daily aggregates of the forecast,
+    the time is the start of the day in UTC.
+    """
+
+    return _to_series(
+        [
+            (
+                datetime.fromisoformat(day.date)
+                .replace(tzinfo=timezone.utc)
+                .timestamp(),
+                day.avgtemp_c,
+                day.maxwind_kph,
+                day.totalprecip_mm,
+                day.avghumidity,
+            )
+            for day in forecast.days
+        ]
+    )
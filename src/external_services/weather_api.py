@@ -1,32 +1,414 @@
-from aiohttp import ClientSession
+import asyncio
+import random
+import time
+from dataclasses import replace
+from typing import Awaitable, Callable
 
-from src.config import load_config
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+from src.cache import ForecastCache, ForecastModelCache, SingleFlight
+from src.config import WeatherAPIConfig
 from src.errors import GetWeatherError
+from src.metrics import (
+    UPSTREAM_BATCH_SIZE,
+    UPSTREAM_ERRORS,
+    UPSTREAM_LATENCY,
+    UPSTREAM_RETRIES,
+)
+
+from .batcher import RequestBatcher
+from .breaker import CircuitBreaker
+from .models import Forecast, parse_forecast
+from .series import ForecastSeries, daily_series, hourly_series
+
 
-config = load_config()
+class _TransientError(Exception):
+    """
+    The upstream has failed in a way worth retrying.
+    """
 
 
-async def get_weather(today: bool, **commands: str):
+class WeatherClient:
     """
-    Get weather info for today or for the following days.
+    Long-lived pooled HTTP client for the weather API.
     """
 
-    TOKEN = config.bot.wthr_token
+    def __init__(
+        self,
+        token: str,
+        config: WeatherAPIConfig,
+        cache: ForecastCache | None = None,
+        single_flight: SingleFlight | None = None,
+        models: ForecastModelCache | None = None,
+    ) -> None:
+        self._token = token
+        self._config = config
+        self._cache = cache
+        self._single_flight = single_flight
+        self._models = models
+        self._breaker = CircuitBreaker(
+            threshold=config.breaker_threshold,
+            reset_timeout=config.breaker_reset_timeout,
+            name="weather_api",
+        )
+        self._batcher = (
+            RequestBatcher(
+                send=self._request_batch,
+                window=config.batch_window,
+                max_size=config.batch_size,
+            )
+            if config.batch_window > 0
+            else None
+        )
+        self._session: ClientSession | None = None
+
+    async def start(self) -> None:
+        """
+        Open the connection pool, called on the dispatcher startup.
+        """
+
+        connector = TCPConnector(
+            limit=self._config.limit,
+            limit_per_host=self._config.limit_per_host,
+            keepalive_timeout=self._config.keepalive_timeout,
+            ttl_dns_cache=self._config.dns_cache_ttl,
+        )
+        timeout = ClientTimeout(
+            total=self._config.total_timeout, connect=self._config.connect_timeout
+        )
+        self._session = ClientSession(connector=connector, timeout=timeout)
+
+    async def close(self) -> None:
+        """
+        Close the connection pool, called on the dispatcher shutdown.
+        """
+
+        if self._batcher is not None:
+            await self._batcher.close()
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get_weather(
+        self, today: bool, latitude: float, longitude: float, lang: str, days: int = 3
+    ) -> dict:
+        """
+        Get weather info for today or for the following days.
+        """
+
+        # current weather for today or forecast for the following days
+        endpoint = "current.json" if today else "forecast.json"
+        params = self._params(endpoint, lang, days)
+
+        if self._cache is None:
+            return await self._request(
+                endpoint, q=f"{float(latitude)},{float(longitude)}", **params
+            )
+
+        cell = self._cache.cell(latitude, longitude)
+        key = self.cache_key(today, latitude, longitude, lang, days)
+
+        res = await self._cache.get(key)
+
+        if res is not None:
+            return res
+
+        return await self._fetch(key, endpoint, cell, params)
+
+    async def refresh(self, key: str) -> dict:
+        """
+        Fetch the cached response again before it expires.
+        """
+
+        if self._cache is None:
+            raise RuntimeError("WeatherClient has no cache to refresh")
+
+        endpoint, cell, lang, days = self._cache.parse_key(key)
+        return await self._fetch(
+            key, endpoint, cell, self._params(endpoint, lang, days)
+        )
+
+    @staticmethod
+    def _params(endpoint: str, lang: str, days: int) -> dict[str, str]:
+        params = {"aqi": "no", "lang": lang}
+
+        if endpoint == "forecast.json":
+            params.update(days=str(days), alerts="no")
+
+        return params
+
+    async def _fetch(
+        self, key: str, endpoint: str, cell: tuple[float, float], params: dict
+    ) -> dict:
+        async def fetch() -> dict:
+            # all users in the cell share the forecast for the cell center
+            res = await self._request(endpoint, q=f"{cell[0]},{cell[1]}", **params)
+            await self._cache.set(key, res)
+            return res
+
+        if self._single_flight is None:
+            return await fetch()
+
+        return await self._single_flight.do(
+            key, fetch=fetch, lookup=lambda: self._cache.peek(key)
+        )
+
+    async def get_forecast(
+        self,
+        today: bool,
+        latitude: float,
+        longitude: float,
+        lang: str,
+        days: int = 3,
+    ) -> Forecast:
+        """
+        Get weather info parsed to the typed model, parsing it once per location.
+        """
+
+        if self._cache is None:
+            return parse_forecast(
+                await self.get_weather(today, latitude, longitude, lang, days)
+            )
+
+        key = self.cache_key(today, latitude, longitude, lang, days)
+
+        # every request counts, also the ones served from the process memory
+        await self._cache.track(key)
+
+        forecast = None if self._models is None else self._models.get(key)
+
+        if forecast is None:
+            try:
+                payload = await self.get_weather(today, latitude, longitude, lang, days)
+            except GetWeatherError:
+                # serve the last known forecast while the upstream is down
+                payload = await self._cache.stale(key)
+
+                if payload is None:
+                    raise
+
+                return replace(parse_forecast(payload), stale=True)
+
+            forecast = parse_forecast(payload)
+
+            if self._models is not None:
+                # keep the model no longer than the response itself lives in Redis
+                self._models.set(key, forecast, ttl=self._cache.ttl(payload))
+
+        return forecast
+
+    def get_series(
+        self, forecast: Forecast, latitude: float, longitude: float, hourly: bool
+    ) -> ForecastSeries:
+        """
+        Get the forecast values as arrays, extracting them once per location.
+        """
+
+        extract = hourly_series if hourly else daily_series
+
+        if self._cache is None or self._models is None or forecast.version is None:
+            return extract(forecast)
+
+        cell = self._cache.cell(latitude, longitude)
+        key = (
+            f"series:{'hourly' if hourly else 'daily'}:"
+            f"{cell[0]}:{cell[1]}:{forecast.version}"
+        )
+        series = self._models.get(key)
+
+        if series is None:
+            series = extract(forecast)
+            self._models.set(key, series, ttl=self.cache_ttl(forecast))
+
+        return series
+
+    def cache_key(
+        self, today: bool, latitude: float, longitude: float, lang: str, days: int = 3
+    ) -> str | None:
+        """
+        Get the forecast cache key of the request or None if caching is off.
+        """
+
+        if self._cache is None:
+            return None
+
+        endpoint = "current.json" if today else "forecast.json"
+        cell = self._cache.cell(latitude, longitude)
+        return self._cache.key(endpoint, cell, lang, 0 if today else days)
+
+    def cache_ttl(self, forecast: Forecast) -> int:
+        """
+        Get the remaining lifetime of the cached forecast.
+        """
+
+        if self._cache is None:
+            return 0
+
+        return self._cache.ttl_since(forecast.version)
+
+    async def _request(self, endpoint: str, **commands: str) -> dict:
+        """
+        Send a request to the weather API, batched with the other lookups if enabled.
+        """
+
+        if self._batcher is not None and "q" in commands:
+            q = commands.pop("q")
+            return await self._batcher.lookup(endpoint, q, commands)
+
+        UPSTREAM_BATCH_SIZE.labels(endpoint=endpoint).observe(1)
+        return await self._retry(
+            endpoint, lambda timeout: self._send(endpoint, commands, timeout)
+        )
+
+    async def _request_batch(
+        self, endpoint: str, params: dict[str, str], queries: list[str]
+    ) -> list[dict | None]:
+        """
+        Look up many locations with one bulk request, None for the failed ones.
+        """
+
+        UPSTREAM_BATCH_SIZE.labels(endpoint=endpoint).observe(len(queries))
+
+        # a single lookup does not need the bulk format
+        if len(queries) == 1:
+            commands = {"q": queries[0], **params}
+            return [
+                await self._retry(
+                    endpoint, lambda timeout: self._send(endpoint, commands, timeout)
+                )
+            ]
+
+        body = {
+            "locations": [
+                {"q": q, "custom_id": str(index)} for index, q in enumerate(queries)
+            ]
+        }
+        res = await self._retry(
+            endpoint,
+            lambda timeout: self._send(
+                endpoint, {"q": "bulk", **params}, timeout, body=body
+            ),
+        )
+
+        results: list[dict | None] = [None] * len(queries)
+
+        for item in res.get("bulk", []):
+            query = dict(item.get("query", {})) if isinstance(item, dict) else {}
+            index = str(query.pop("custom_id", ""))
+            index = int(index) if index.isdigit() else -1
+            query.pop("q", None)
+
+            if "error" in query or not 0 <= index < len(queries):
+                UPSTREAM_ERRORS.labels(endpoint=endpoint).inc()
+                continue
+
+            results[index] = query
+
+        return results
+
+    async def _retry(
+        self, endpoint: str, send: Callable[[float], Awaitable[dict]]
+    ) -> dict:
+        """
+        Send a request to the weather API retrying the transient failures.
+        """
+
+        if self._session is None:
+            raise RuntimeError("WeatherClient is not started")
+
+        if not self._breaker.allow():
+            raise GetWeatherError
+
+        # the call let through a half-open breaker is its probe
+        probe = self._breaker.state == CircuitBreaker.HALF_OPEN
+
+        try:
+            return await self._attempt(endpoint, send)
+        finally:
+            # a probe which ended without an outcome, e.g. was cancelled,
+            # must not leave the breaker rejecting all the calls
+            if probe:
+                self._breaker.release()
+
+    async def _attempt(
+        self, endpoint: str, send: Callable[[float], Awaitable[dict]]
+    ) -> dict:
+        # the retries share the budget, so a caller never waits longer than it
+        deadline = time.monotonic() + self._config.budget
+
+        for attempt in range(self._config.retries + 1):
+            try:
+                res = await send(deadline - time.monotonic())
+            except _TransientError:
+                delay = random.uniform(
+                    0,
+                    min(
+                        self._config.retry_max_delay,
+                        self._config.retry_base_delay * 2**attempt,
+                    ),
+                )
+
+                if (
+                    attempt == self._config.retries
+                    or time.monotonic() + delay >= deadline
+                ):
+                    self._breaker.failure()
+                    raise GetWeatherError
+
+                UPSTREAM_RETRIES.labels(endpoint=endpoint).inc()
+                await asyncio.sleep(delay)
+            except GetWeatherError:
+                # the upstream is healthy, the request itself is wrong
+                self._breaker.success()
+                raise
+            else:
+                self._breaker.success()
+                return res
+
+    async def _send(
+        self, endpoint: str, commands: dict, timeout: float, body: dict | None = None
+    ) -> dict:
+        url = f"{self._config.base_url.rstrip('/')}/{endpoint}"
+        started = time.perf_counter()
+
+        try:
+            if timeout <= 0:
+                raise asyncio.TimeoutError
+
+            # the bulk lookups are posted, the single ones are plain queries
+            async with self._session.request(
+                "GET" if body is None else "POST",
+                url,
+                params={"key": self._token, **commands},
+                json=body,
+                timeout=ClientTimeout(
+                    total=min(self._config.total_timeout, timeout),
+                    connect=self._config.connect_timeout,
+                ),
+            ) as resp:
+                if resp.status >= 500 or resp.status == 429:
+                    raise _TransientError(f"status {resp.status}")
+
+                res = await resp.json(encoding="utf-8", content_type=None)
 
-    params = "&".join([f"{k}={v}" for k, v in commands.items()])
+                # a broken body of a successful response is a glitch as well
+                if not isinstance(res, dict):
+                    raise _TransientError(f"unexpected body {type(res).__name__}")
+        except Exception as e:
+            UPSTREAM_ERRORS.labels(endpoint=endpoint).inc()
 
-    if today:
-        # get weather forecast for today
-        url = f"http://api.weatherapi.com/v1/current.json?key={TOKEN}&{params}"
-    else:
-        # get weather forecast for the following days
-        url = f"http://api.weatherapi.com/v1/forecast.json?key={TOKEN}&{params}"
+            if isinstance(e, _TransientError):
+                raise
 
-    async with ClientSession() as session:
-        async with session.get(url) as resp:
-            res = await resp.json(encoding="utf-8")
+            raise _TransientError from e
+        finally:
+            UPSTREAM_LATENCY.labels(endpoint=endpoint).observe(
+                time.perf_counter() - started
+            )
 
-    if "error" in res.keys():
-        raise GetWeatherError
+        if "error" in res:
+            UPSTREAM_ERRORS.labels(endpoint=endpoint).inc()
+            raise GetWeatherError
 
-    return res
+        return res
@@ -1,25 +1,47 @@
 import logging
-import os
+from datetime import datetime
 
-import aiofiles.os as aos
 from aiogram import Bot, F, Router
-from aiogram.filters import Command, CommandStart, StateFilter
+from aiogram.filters import Command, CommandObject, CommandStart, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import default_state
-from aiogram.types import CallbackQuery, FSInputFile, Message, ReplyKeyboardRemove
+from aiogram.types import (
+    BufferedInputFile,
+    CallbackQuery,
+    Message,
+    ReplyKeyboardRemove,
+)
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 import src.keyboards as kb
 import src.services as sv
-from src.database import post_lang, update_data
-from src.errors import DatabaseError, GetWeatherError
+from src.cache import PlotCache, ProfileCache, TextCache
+from src.database import (
+    UserProfile,
+    get_subscription,
+    post_lang,
+    unsubscribe,
+    update_data,
+)
+from src.errors import DatabaseError, GetWeatherError, SetupRequiredError
+from src.external_services import WeatherClient
 from src.lexicon import ERROR_LEXICON_BOTH, LEXICON_BOTH
-from src.middlewares import AntiFloodMiddleware
 from src.states import FSMLanguage, FSMSettings
 
 logger = logging.getLogger()
 router = Router()
-router.message.middleware(AntiFloodMiddleware())
+
+
+async def _restart_setup(
+    message: Message, state: FSMContext, profile: UserProfile
+) -> None:
+    # the location or the units are missing, e.g. the user has left
+    # the setup and its state has expired, so the setup starts over
+    _, msg, _ = sv.create_message(profile=profile, msg_type="setup_required")
+    await message.answer(
+        f"{msg}\n\n{LEXICON_BOTH['/settings']}", reply_markup=kb.language_kb()
+    )
+    await state.set_state(FSMLanguage.set_language)
 
 
 @router.message(CommandStart(), StateFilter(default_state))
@@ -33,21 +55,17 @@ async def start_command(message: Message, state: FSMContext):
 
 
 @router.message(Command(commands=["help"]), StateFilter(default_state))
-async def help_command(
-    message: Message, sessionmaker: async_sessionmaker[AsyncSession]
-):
+async def help_command(message: Message, profile: UserProfile | None):
     """
     Send the help messasge.
     """
 
     try:
-        _, msg, _ = await sv.create_message(
-            user_id=message.from_user.id, msg_type="/help", sessionmaker=sessionmaker
-        )
+        _, msg, _ = sv.create_message(profile=profile, msg_type="/help")
         await message.answer(msg)
     except DatabaseError as e:
         logger.exception(e)
-        await message.answer(ERROR_LEXICON_BOTH["DatabaseError"])
+        await message.answer(ERROR_LEXICON_BOTH["DataError"])
 
 
 @router.message(Command(commands=["settings"]), StateFilter(default_state))
@@ -61,41 +79,35 @@ async def settings_command(message: Message, state: FSMContext):
 
 
 @router.message(Command(commands=["weather"]), StateFilter(default_state))
-async def weather_command(
-    message: Message, sessionmaker: async_sessionmaker[AsyncSession]
-):
+async def weather_command(message: Message, profile: UserProfile | None):
     """
     Send a message which allows the user to choose the weather forecast mode.
     """
 
     try:
-        lang, msg, _ = await sv.create_message(
-            user_id=message.from_user.id, msg_type="/weather", sessionmaker=sessionmaker
-        )
+        lang, msg, _ = sv.create_message(profile=profile, msg_type="/weather")
         await message.answer(msg, reply_markup=kb.weather_kb(lang))
     except DatabaseError as e:
         logger.exception(e)
-        await message.answer(ERROR_LEXICON_BOTH["DatabaseError"])
+        await message.answer(ERROR_LEXICON_BOTH["DataError"])
 
 
 @router.message(Command(commands=["profile"]), StateFilter(default_state))
-async def get_profile(message: Message, sessionmaker: async_sessionmaker[AsyncSession]):
+async def get_profile(message: Message, state: FSMContext, profile: UserProfile | None):
     """
     Send the user profile.
     """
 
     try:
-        lang, msg, _ = await sv.create_message(
-            user_id=message.from_user.id,
-            msg_type="your_profile",
-            sessionmaker=sessionmaker,
-        )
+        lang, msg, _ = sv.create_message(profile=profile, msg_type="your_profile")
         await message.answer(
-            f"{msg}\n\n{await sv.create_profile(user_id=message.from_user.id, lang=lang, sessionmaker=sessionmaker)}"
+            f"{msg}\n\n{sv.create_profile(profile=profile, lang=lang)}"
         )
     except DatabaseError as e:
         logger.exception(e)
-        await message.answer(ERROR_LEXICON_BOTH["DatabaseError"])
+        await message.answer(ERROR_LEXICON_BOTH["DataError"])
+    except SetupRequiredError:
+        await _restart_setup(message, state, profile)
 
 
 @router.callback_query(StateFilter(FSMLanguage.set_language))
@@ -103,6 +115,7 @@ async def language(
     callback: CallbackQuery,
     state: FSMContext,
     sessionmaker: async_sessionmaker[AsyncSession],
+    profile_cache: ProfileCache,
 ):
     """
     Set the user language and sends a message
@@ -117,31 +130,29 @@ async def language(
             data=(callback.from_user.id, (await state.get_data())["language"]),
             sessionmaker=sessionmaker,
         )
+        await profile_cache.invalidate(callback.from_user.id)
     except DatabaseError as e:
         logger.exception(e)
         await state.clear()
-        await callback.message.edit_text(ERROR_LEXICON_BOTH["DatabaseError"])
+        await callback.message.edit_text(ERROR_LEXICON_BOTH["DataError"])
 
     await state.clear()
 
     try:
-        lang, msg, _ = await sv.create_message(
-            user_id=callback.from_user.id,
+        lang, msg, _ = sv.create_message(
+            profile=UserProfile(user_id=callback.from_user.id, language=callback.data),
             msg_type="lang_success",
-            sessionmaker=sessionmaker,
         )
         await callback.message.answer(msg, reply_markup=kb.location_kb(lang))
     except DatabaseError as e:
         logger.exception(e)
-        await callback.message.edit_text(ERROR_LEXICON_BOTH["DatabaseError"])
+        await callback.message.edit_text(ERROR_LEXICON_BOTH["DataError"])
 
     await state.set_state(FSMSettings.set_location)
 
 
 @router.message(F.location, StateFilter(FSMSettings.set_location))
-async def location(
-    message: Message, state: FSMContext, sessionmaker: async_sessionmaker[AsyncSession]
-):
+async def location(message: Message, state: FSMContext, profile: UserProfile | None):
     """
     Set the user location and sends a message
     which allows the user to select temperature measurement units.
@@ -152,16 +163,12 @@ async def location(
     )
 
     try:
-        _, msg, _ = await sv.create_message(
-            user_id=message.from_user.id,
-            msg_type="loc_success",
-            sessionmaker=sessionmaker,
-        )
+        _, msg, _ = sv.create_message(profile=profile, msg_type="loc_success")
         await message.answer(msg, reply_markup=kb.temp_kb())
     except DatabaseError as e:
         logger.exception(e)
         await state.clear()
-        await message.answer(ERROR_LEXICON_BOTH["DatabaseError"])
+        await message.answer(ERROR_LEXICON_BOTH["DataError"])
 
     await state.set_state(FSMSettings.unit_of_temp)
 
@@ -170,9 +177,7 @@ async def location(
     StateFilter(FSMSettings.unit_of_temp), F.data.in_(["celsius", "fahrenheit"])
 )
 async def unit_of_temp(
-    callback: CallbackQuery,
-    state: FSMContext,
-    sessionmaker: async_sessionmaker[AsyncSession],
+    callback: CallbackQuery, state: FSMContext, profile: UserProfile | None
 ):
     """
     Set the user temperature measurement units and sends a message
@@ -183,16 +188,12 @@ async def unit_of_temp(
     await callback.answer()
 
     try:
-        lang, msg, _ = await sv.create_message(
-            user_id=callback.from_user.id,
-            msg_type="temp_success",
-            sessionmaker=sessionmaker,
-        )
+        lang, msg, _ = sv.create_message(profile=profile, msg_type="temp_success")
         await callback.message.edit_text(msg, reply_markup=kb.wind_kb(lang))
     except DatabaseError as e:
         logger.exception(e)
         await state.clear()
-        await callback.message.edit_text(ERROR_LEXICON_BOTH["DatabaseError"])
+        await callback.message.edit_text(ERROR_LEXICON_BOTH["DataError"])
 
     await state.set_state(FSMSettings.unit_of_wind)
 
@@ -204,6 +205,8 @@ async def unit_of_wind(
     callback: CallbackQuery,
     state: FSMContext,
     sessionmaker: async_sessionmaker[AsyncSession],
+    profile: UserProfile | None,
+    profile_cache: ProfileCache,
 ):
     """
     Set the user wind speed measurement units and sends a message
@@ -214,35 +217,40 @@ async def unit_of_wind(
     await callback.answer()
 
     try:
-        _, msg, _ = await sv.create_message(
-            user_id=callback.from_user.id,
-            msg_type="settings_completed",
-            sessionmaker=sessionmaker,
-        )
+        _, msg, _ = sv.create_message(profile=profile, msg_type="settings_completed")
         await callback.message.answer(
             msg, reply_markup=ReplyKeyboardRemove(remove_keyboard=True)
         )
     except DatabaseError as e:
         logger.exception(e)
         await state.clear()
-        await callback.message.edit_text(ERROR_LEXICON_BOTH["DatabaseError"])
+        await callback.message.edit_text(ERROR_LEXICON_BOTH["DataError"])
 
     try:
+        user_data = await state.get_data()
+        user_data["timezone"] = await sv.resolve_timezone(
+            latitude=user_data["latitude"], longitude=user_data["longitude"]
+        )
         await update_data(
-            data=(callback.from_user.id, await state.get_data()),
+            data=(callback.from_user.id, user_data),
             sessionmaker=sessionmaker,
         )
+        await profile_cache.invalidate(callback.from_user.id)
     except DatabaseError as e:
         logger.exception(e)
         await state.clear()
-        await callback.message.edit_text(ERROR_LEXICON_BOTH["DatabaseError"])
+        await callback.message.edit_text(ERROR_LEXICON_BOTH["DataError"])
 
     await state.clear()
 
 
 @router.callback_query(StateFilter(default_state), F.data.in_(["forecast_today"]))
 async def get_forecast_today(
-    callback: CallbackQuery, sessionmaker: async_sessionmaker[AsyncSession]
+    callback: CallbackQuery,
+    state: FSMContext,
+    profile: UserProfile | None,
+    weather_client: WeatherClient,
+    text_cache: TextCache,
 ):
     """
     Send weather forecast for today.
@@ -251,18 +259,21 @@ async def get_forecast_today(
     await callback.answer()
 
     try:
-        lang, msg, error_msg = await sv.create_message(
-            user_id=callback.from_user.id,
-            msg_type="weather_today",
-            sessionmaker=sessionmaker,
+        lang, msg, error_msg = sv.create_message(
+            profile=profile, msg_type="weather_today"
         )
         res = await sv.create_forecast_today(
-            user_id=callback.from_user.id, lang=lang, sessionmaker=sessionmaker
+            profile=profile,
+            lang=lang,
+            weather_client=weather_client,
+            text_cache=text_cache,
         )
         await callback.message.edit_text(f"{msg}{res}")
     except DatabaseError as e:
         logger.exception(e)
-        await callback.message.edit_text(ERROR_LEXICON_BOTH["DatabaseError"])
+        await callback.message.edit_text(ERROR_LEXICON_BOTH["DataError"])
+    except SetupRequiredError:
+        await _restart_setup(callback.message, state, profile)
     except GetWeatherError:
         await callback.message.edit_text(error_msg)
 
@@ -270,9 +281,7 @@ async def get_forecast_today(
 @router.callback_query(
     StateFilter(default_state), F.data.in_(["forecast_week", "back_ds"])
 )
-async def week_forecast_days(
-    callback: CallbackQuery, sessionmaker: async_sessionmaker[AsyncSession]
-):
+async def week_forecast_days(callback: CallbackQuery, profile: UserProfile | None):
     """
     Send a message which allows the user to choose the weather forecast
     for a certain day or to choose the weather plots mode.
@@ -280,16 +289,9 @@ async def week_forecast_days(
 
     await callback.answer()
 
-    lang, msg, _ = await sv.create_message(
-        user_id=callback.from_user.id,
-        msg_type="weather_week",
-        sessionmaker=sessionmaker,
-    )
+    lang, msg, _ = sv.create_message(profile=profile, msg_type="weather_week")
     await callback.message.edit_text(
-        msg,
-        reply_markup=await kb.days_kb(
-            user_id=callback.from_user.id, lang=lang, sessionmaker=sessionmaker
-        ),
+        msg, reply_markup=kb.days_kb(profile=profile, lang=lang)
     )
 
 
@@ -297,7 +299,11 @@ async def week_forecast_days(
     StateFilter(default_state), F.data.in_([str(day).zfill(2) for day in range(1, 32)])
 )
 async def get_forecast_week(
-    callback: CallbackQuery, sessionmaker: async_sessionmaker[AsyncSession]
+    callback: CallbackQuery,
+    state: FSMContext,
+    profile: UserProfile | None,
+    weather_client: WeatherClient,
+    text_cache: TextCache,
 ):
     """
     Send weather forecast for the following day.
@@ -306,26 +312,26 @@ async def get_forecast_week(
     await callback.answer()
 
     try:
-        lang, _, error_msg = await sv.create_message(
-            user_id=callback.from_user.id, sessionmaker=sessionmaker
-        )
-        res: dict[str, str] = await sv.create_forecast_week(
-            user_id=callback.from_user.id, lang=lang, sessionmaker=sessionmaker
-        )
-        await callback.message.edit_text(
-            res[callback.data], reply_markup=kb.back_kb(lang, "days")
+        lang, _, error_msg = sv.create_message(profile=profile)
+        res = await sv.create_forecast_week(
+            profile=profile,
+            lang=lang,
+            day=callback.data,
+            weather_client=weather_client,
+            text_cache=text_cache,
         )
+        await callback.message.edit_text(res, reply_markup=kb.back_kb(lang, "days"))
     except DatabaseError as e:
         logger.exception(e)
-        await callback.message.edit_text(ERROR_LEXICON_BOTH["DatabaseError"])
+        await callback.message.edit_text(ERROR_LEXICON_BOTH["DataError"])
+    except SetupRequiredError:
+        await _restart_setup(callback.message, state, profile)
     except GetWeatherError:
         await callback.message.edit_text(error_msg)
 
 
 @router.callback_query(StateFilter(default_state), F.data.in_(["plots", "back_pl"]))
-async def get_plots(
-    callback: CallbackQuery, sessionmaker: async_sessionmaker[AsyncSession]
-):
+async def get_plots(callback: CallbackQuery, profile: UserProfile | None):
     """
     Send the weather plots list.
     """
@@ -333,20 +339,27 @@ async def get_plots(
     await callback.answer()
 
     try:
-        lang, msg, _ = await sv.create_message(
-            user_id=callback.from_user.id, msg_type="plots", sessionmaker=sessionmaker
-        )
+        lang, msg, _ = sv.create_message(profile=profile, msg_type="plots")
         await callback.message.answer(msg, reply_markup=kb.plots_kb(lang))
     except DatabaseError as e:
         logger.exception(e)
-        await callback.message.answer(ERROR_LEXICON_BOTH["DatabaseError"])
+        await callback.message.answer(ERROR_LEXICON_BOTH["DataError"])
 
 
 @router.callback_query(
-    StateFilter(default_state), F.data.in_(["temp", "wind", "precip", "humid"])
+    StateFilter(default_state),
+    F.data.in_(
+        ["temp", "wind", "precip", "humid", "temp_h", "wind_h", "precip_h", "humid_h"]
+    ),
 )
 async def get_plot(
-    callback: CallbackQuery, bot: Bot, sessionmaker: async_sessionmaker[AsyncSession]
+    callback: CallbackQuery,
+    bot: Bot,
+    state: FSMContext,
+    profile: UserProfile | None,
+    weather_client: WeatherClient,
+    plot_renderer: sv.PlotRenderer,
+    plot_cache: PlotCache,
 ):
     """
     Send a weather plot.
@@ -355,34 +368,125 @@ async def get_plot(
     await callback.answer()
 
     try:
-        user_id = callback.from_user.id
-        file_path = f"{os.getcwd()}/temp/{user_id}_plot.png"
-        lang, _, error_msg = await sv.create_message(
-            user_id=callback.from_user.id, sessionmaker=sessionmaker
-        )
+        lang, _, error_msg = sv.create_message(profile=profile)
 
-        await sv.create_plot(
-            user_id=user_id,
+        plot = await sv.create_plot(
+            profile=profile,
             lang=lang,
             plot_type=callback.data,
-            sessionmaker=sessionmaker,
-        )
-
-        await bot.send_photo(
-            chat_id=callback.message.chat.id,
-            photo=FSInputFile(file_path),
-            reply_markup=kb.back_kb(lang, "plots"),
+            weather_client=weather_client,
+            plot_renderer=plot_renderer,
+            plot_cache=plot_cache,
         )
 
-        if await aos.path.exists(file_path):
-            await aos.remove(file_path)
+        if plot.file_id is not None:
+            # the plot has already been uploaded, send it without rendering
+            await bot.send_photo(
+                chat_id=callback.message.chat.id,
+                photo=plot.file_id,
+                reply_markup=kb.back_kb(lang, "plots"),
+            )
+        else:
+            message = await bot.send_photo(
+                chat_id=callback.message.chat.id,
+                photo=BufferedInputFile(plot.png, filename=f"{callback.data}_plot.png"),
+                reply_markup=kb.back_kb(lang, "plots"),
+            )
+            await plot_cache.set_file_id(plot.key, message.photo[-1].file_id)
     except DatabaseError as e:
         logger.exception(e)
-        await callback.message.answer(ERROR_LEXICON_BOTH["DatabaseError"])
+        await callback.message.answer(ERROR_LEXICON_BOTH["DataError"])
+    except SetupRequiredError:
+        await _restart_setup(callback.message, state, profile)
     except GetWeatherError:
         await callback.message.answer(error_msg, reply_markup=kb.back_kb(lang, "plots"))
 
 
+async def _subscribe(
+    profile: UserProfile | None,
+    delivery_time: str,
+    sessionmaker: async_sessionmaker[AsyncSession],
+) -> str:
+    try:
+        parsed = datetime.strptime(delivery_time.strip(), "%H:%M").time()
+    except ValueError:
+        _, msg, _ = sv.create_message(profile=profile, msg_type="wrong_time")
+        return msg
+
+    await sv.create_subscription(
+        profile=profile, delivery_time=parsed, sessionmaker=sessionmaker
+    )
+    _, msg, _ = sv.create_message(profile=profile, msg_type="subscribed")
+    return msg.format(parsed.strftime("%H:%M"))
+
+
+@router.message(Command(commands=["subscribe"]), StateFilter(default_state))
+async def subscribe_command(
+    message: Message,
+    command: CommandObject,
+    state: FSMContext,
+    profile: UserProfile | None,
+    sessionmaker: async_sessionmaker[AsyncSession],
+):
+    """
+    Subscribe the user to the daily forecast or send the delivery time options.
+    """
+
+    try:
+        lang, msg, _ = sv.create_message(profile=profile, msg_type="/subscribe")
+        sv.get_user(profile)
+
+        if command.args:
+            await message.answer(
+                await _subscribe(profile, command.args, sessionmaker=sessionmaker)
+            )
+        else:
+            delivery_time = await get_subscription(profile.user_id, sessionmaker)
+
+            if delivery_time is not None:
+                _, current, _ = sv.create_message(
+                    profile=profile, msg_type="subscription"
+                )
+                msg = current.format(delivery_time.strftime("%H:%M")) + msg
+
+            await message.answer(msg, reply_markup=kb.subscribe_kb(lang))
+    except DatabaseError as e:
+        logger.exception(e)
+        await message.answer(ERROR_LEXICON_BOTH["DataError"])
+    except SetupRequiredError:
+        await _restart_setup(message, state, profile)
+
+
+@router.callback_query(StateFilter(default_state), F.data.startswith("sub_"))
+async def subscription(
+    callback: CallbackQuery,
+    state: FSMContext,
+    profile: UserProfile | None,
+    sessionmaker: async_sessionmaker[AsyncSession],
+):
+    """
+    Set the daily forecast time or unsubscribe the user.
+    """
+
+    await callback.answer()
+
+    try:
+        if callback.data == "sub_off":
+            await unsubscribe(callback.from_user.id, sessionmaker)
+            _, msg, _ = sv.create_message(profile=profile, msg_type="unsubscribed")
+        else:
+            msg = await _subscribe(
+                profile, callback.data.removeprefix("sub_"), sessionmaker=sessionmaker
+            )
+
+        await callback.message.edit_text(msg)
+    except DatabaseError as e:
+        logger.exception(e)
+        await callback.message.edit_text(ERROR_LEXICON_BOTH["DataError"])
+    except SetupRequiredError:
+        await _restart_setup(callback.message, state, profile)
+
+
 @router.message()
 async def unknown(message: Message):
     """
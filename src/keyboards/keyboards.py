@@ -1,3 +1,6 @@
+from datetime import date, timedelta
+from functools import lru_cache
+
 from aiogram.types import (
     InlineKeyboardButton,
     InlineKeyboardMarkup,
@@ -5,17 +8,22 @@ from aiogram.types import (
     ReplyKeyboardMarkup,
 )
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
-
+from src.database import UserProfile
 from src.lexicon import KB_LEXICON_BOTH, KB_LEXICON_EN, KB_LEXICON_RU
-from src.services import days_generator
+from src.services import local_date
 
+KB_LEXICONS = {"RU": KB_LEXICON_RU, "EN": KB_LEXICON_EN}
 
-def language_kb() -> InlineKeyboardMarkup:
-    """
-    Build a keyboard which allows the user to select a language.
-    """
+Keyboard = InlineKeyboardMarkup | ReplyKeyboardMarkup
+
+DELIVERY_TIMES = ("06:00", "07:00", "08:00", "09:00", "10:00", "12:00")
+
+
+def _lexicon(lang: str) -> dict[str, str]:
+    return KB_LEXICONS.get(lang, KB_LEXICON_EN)
 
+
+def _build_language_kb() -> InlineKeyboardMarkup:
     kb_builder = InlineKeyboardBuilder()
 
     kb_builder.row(
@@ -25,29 +33,14 @@ def language_kb() -> InlineKeyboardMarkup:
     return kb_builder.as_markup()
 
 
-def location_kb(lang: str) -> ReplyKeyboardMarkup:
-    """
-    Build a keyboard which allows the user to set his location.
-    """
-
+def _build_location_kb(lexicon: dict[str, str]) -> ReplyKeyboardMarkup:
     kb_builder = ReplyKeyboardBuilder()
 
-    if lang == "RU":
-        kb_builder.add(
-            KeyboardButton(text=KB_LEXICON_RU["get_location"], request_location=True)
-        )
-    else:
-        kb_builder.add(
-            KeyboardButton(text=KB_LEXICON_EN["get_location"], request_location=True)
-        )
+    kb_builder.add(KeyboardButton(text=lexicon["get_location"], request_location=True))
     return kb_builder.as_markup(resize_keyboard=True, one_time_keyboard=True)
 
 
-def temp_kb() -> InlineKeyboardMarkup:
-    """
-    Build a keyboard which allows the user to select temperature measurement units.
-    """
-
+def _build_temp_kb() -> InlineKeyboardMarkup:
     kb_builder = InlineKeyboardBuilder()
 
     kb_builder.row(
@@ -59,142 +52,195 @@ def temp_kb() -> InlineKeyboardMarkup:
     return kb_builder.as_markup()
 
 
-def wind_kb(lang: str) -> InlineKeyboardMarkup:
-    """
-    Build a keyboard which allows the user to select wind speed measurement units.
-    """
+def _build_wind_kb(lexicon: dict[str, str]) -> InlineKeyboardMarkup:
+    kb_builder = InlineKeyboardBuilder()
 
+    kb_builder.row(
+        InlineKeyboardButton(text=lexicon["mps"], callback_data="mps"),
+        InlineKeyboardButton(text=lexicon["kmph"], callback_data="kmph"),
+    )
+    return kb_builder.as_markup()
+
+
+def _build_weather_kb(lexicon: dict[str, str]) -> InlineKeyboardMarkup:
     kb_builder = InlineKeyboardBuilder()
 
-    if lang == "RU":
-        kb_builder.row(
-            InlineKeyboardButton(text=KB_LEXICON_RU["mps"], callback_data="mps"),
-            InlineKeyboardButton(text=KB_LEXICON_RU["kmph"], callback_data="kmph"),
-        )
-    else:
-        kb_builder.row(
-            InlineKeyboardButton(text=KB_LEXICON_EN["mps"], callback_data="mps"),
-            InlineKeyboardButton(text=KB_LEXICON_EN["kmph"], callback_data="kmph"),
-        )
+    kb_builder.row(
+        InlineKeyboardButton(text=lexicon["today"], callback_data="forecast_today"),
+        InlineKeyboardButton(text=lexicon["week"], callback_data="forecast_week"),
+        width=1,
+    )
     return kb_builder.as_markup()
 
 
-def weather_kb(lang: str) -> InlineKeyboardMarkup:
+def _build_plots_kb(lexicon: dict[str, str]) -> InlineKeyboardMarkup:
+    kb_builder = InlineKeyboardBuilder()
+
+    # the daily and the hourly plots of the same value are side by side
+    kb_builder.row(
+        *(
+            InlineKeyboardButton(text=lexicon[plot_type], callback_data=plot_type)
+            for measure in ("temp", "wind", "precip", "humid")
+            for plot_type in (measure, f"{measure}_h")
+        ),
+        width=2,
+    )
+    kb_builder.row(InlineKeyboardButton(text=lexicon["back"], callback_data="back_ds"))
+    return kb_builder.as_markup()
+
+
+def _build_back_kb(lexicon: dict[str, str], callback_data: str) -> InlineKeyboardMarkup:
+    kb_builder = InlineKeyboardBuilder()
+
+    kb_builder.row(
+        InlineKeyboardButton(text=lexicon["back"], callback_data=callback_data)
+    )
+    return kb_builder.as_markup()
+
+
+def _build_subscribe_kb(lexicon: dict[str, str]) -> InlineKeyboardMarkup:
+    kb_builder = InlineKeyboardBuilder()
+
+    kb_builder.row(
+        *(
+            InlineKeyboardButton(text=s, callback_data=f"sub_{s}")
+            for s in DELIVERY_TIMES
+        ),
+        width=3,
+    )
+    kb_builder.row(
+        InlineKeyboardButton(text=lexicon["unsubscribe"], callback_data="sub_off")
+    )
+    return kb_builder.as_markup()
+
+
+def build_keyboards() -> dict[tuple[str, str], Keyboard]:
     """
-    Build a keyboard which allows the user to choose the weather forecast mode.
+    Build all the static keyboards for every language.
     """
 
-    kb_builder = InlineKeyboardBuilder()
+    keyboards = {
+        ("language", ""): _build_language_kb(),
+        ("temp", ""): _build_temp_kb(),
+        ("back", ""): InlineKeyboardBuilder().as_markup(),
+    }
 
-    if lang == "RU":
-        kb_builder.row(
-            InlineKeyboardButton(
-                text=KB_LEXICON_RU["today"], callback_data="forecast_today"
-            ),
-            InlineKeyboardButton(
-                text=KB_LEXICON_RU["week"], callback_data="forecast_week"
-            ),
-            width=1,
+    for lang, lexicon in KB_LEXICONS.items():
+        keyboards.update(
+            {
+                ("location", lang): _build_location_kb(lexicon),
+                ("wind", lang): _build_wind_kb(lexicon),
+                ("weather", lang): _build_weather_kb(lexicon),
+                ("plots", lang): _build_plots_kb(lexicon),
+                ("back_days", lang): _build_back_kb(lexicon, "back_ds"),
+                ("back_plots", lang): _build_back_kb(lexicon, "back_pl"),
+                ("subscribe", lang): _build_subscribe_kb(lexicon),
+            }
         )
-    else:
-        kb_builder.row(
-            InlineKeyboardButton(
-                text=KB_LEXICON_EN["today"], callback_data="forecast_today"
-            ),
-            InlineKeyboardButton(
-                text=KB_LEXICON_EN["week"], callback_data="forecast_week"
-            ),
-            width=1,
-        )
-    return kb_builder.as_markup()
 
+    return keyboards
+
+
+# the markups are built once and shared by all users, aiogram models are
+# mutable, so the callers must never change a returned markup in place
+KEYBOARDS = build_keyboards()
 
-async def days_kb(
-    user_id: int, lang: str, sessionmaker: async_sessionmaker[AsyncSession]
-) -> InlineKeyboardMarkup:
+
+def _keyboard(name: str, lang: str) -> Keyboard:
+    return KEYBOARDS[(name, lang if lang in KB_LEXICONS else "EN")]
+
+
+def language_kb() -> InlineKeyboardMarkup:
     """
-    Build a keyboard which allows the user to choose the weather forecast for a certain day
-    or to choose the weather plots mode.
+    Get a keyboard which allows the user to select a language.
+    """
+
+    return KEYBOARDS[("language", "")]
+
+
+def location_kb(lang: str) -> ReplyKeyboardMarkup:
+    """
+    Get a keyboard which allows the user to set his location.
+    """
+
+    return _keyboard("location", lang)
+
+
+def temp_kb() -> InlineKeyboardMarkup:
+    """
+    Get a keyboard which allows the user to select temperature measurement units.
+    """
+
+    return KEYBOARDS[("temp", "")]
+
+
+def wind_kb(lang: str) -> InlineKeyboardMarkup:
+    """
+    Get a keyboard which allows the user to select wind speed measurement units.
+    """
+
+    return _keyboard("wind", lang)
+
+
+def weather_kb(lang: str) -> InlineKeyboardMarkup:
+    """
+    Get a keyboard which allows the user to choose the weather forecast mode.
     """
 
+    return _keyboard("weather", lang)
+
+
+# the cached markups are shared as well and must not be changed in place
+@lru_cache(maxsize=32)
+def _days_kb(today: date, lang: str) -> InlineKeyboardMarkup:
     kb_builder = InlineKeyboardBuilder()
 
-    days = await days_generator(user_id=user_id, sessionmaker=sessionmaker)
+    days = tuple((today + timedelta(days=i)).strftime("%d") for i in range(3))
 
     kb_builder.row(
         *(InlineKeyboardButton(text=s, callback_data=s) for s in days), width=4
     )
-
-    if lang == "RU":
-        kb_builder.row(
-            InlineKeyboardButton(text=KB_LEXICON_RU["plots"], callback_data="plots")
-        )
-    else:
-        kb_builder.row(
-            InlineKeyboardButton(text=KB_LEXICON_EN["plots"], callback_data="plots")
-        )
+    kb_builder.row(
+        InlineKeyboardButton(text=_lexicon(lang)["plots"], callback_data="plots")
+    )
     return kb_builder.as_markup()
 
 
-def plots_kb(lang: str) -> InlineKeyboardMarkup:
+def days_kb(profile: UserProfile, lang: str) -> InlineKeyboardMarkup:
     """
-    Build a keyboard which allows the user to choose the certain weather plot.
+    Get a keyboard which allows the user to choose the weather forecast for a certain day
+    or to choose the weather plots mode.
     """
 
-    kb_builder = InlineKeyboardBuilder()
+    # the keyboard only depends on the local date, so it rolls over at local midnight
+    return _days_kb(local_date(profile), lang if lang in KB_LEXICONS else "EN")
 
-    if lang == "RU":
-        kb_builder.row(
-            InlineKeyboardButton(text=KB_LEXICON_RU["temp"], callback_data="temp"),
-            InlineKeyboardButton(text=KB_LEXICON_RU["wind"], callback_data="wind"),
-            InlineKeyboardButton(text=KB_LEXICON_RU["precip"], callback_data="precip"),
-            InlineKeyboardButton(text=KB_LEXICON_RU["humid"], callback_data="humid"),
-            InlineKeyboardButton(text=KB_LEXICON_RU["back"], callback_data="back_ds"),
-            width=1,
-        )
-    else:
-        kb_builder.row(
-            InlineKeyboardButton(text=KB_LEXICON_EN["temp"], callback_data="temp"),
-            InlineKeyboardButton(text=KB_LEXICON_EN["wind"], callback_data="wind"),
-            InlineKeyboardButton(text=KB_LEXICON_EN["precip"], callback_data="precip"),
-            InlineKeyboardButton(text=KB_LEXICON_EN["humid"], callback_data="humid"),
-            InlineKeyboardButton(text=KB_LEXICON_EN["back"], callback_data="back_ds"),
-            width=1,
-        )
-    return kb_builder.as_markup()
+
+def plots_kb(lang: str) -> InlineKeyboardMarkup:
+    """
+    Get a keyboard which allows the user to choose the certain weather plot.
+    """
+
+    return _keyboard("plots", lang)
 
 
 def back_kb(lang: str, to: str) -> InlineKeyboardMarkup:
     """
-    Build a keyboard which allows the user to go back to the menu.
+    Get a keyboard which allows the user to go back to the menu.
     """
 
-    kb_builder = InlineKeyboardBuilder()
+    match to:
+        case "days":
+            return _keyboard("back_days", lang)
+        case "plots":
+            return _keyboard("back_plots", lang)
 
-    if lang == "RU":
-        if to == "days":
-            kb_builder.row(
-                InlineKeyboardButton(
-                    text=KB_LEXICON_RU["back"], callback_data="back_ds"
-                )
-            )
-        elif to == "plots":
-            kb_builder.row(
-                InlineKeyboardButton(
-                    text=KB_LEXICON_RU["back"], callback_data="back_pl"
-                )
-            )
-    else:
-        if to == "days":
-            kb_builder.row(
-                InlineKeyboardButton(
-                    text=KB_LEXICON_EN["back"], callback_data="back_ds"
-                )
-            )
-        elif to == "plots":
-            kb_builder.row(
-                InlineKeyboardButton(
-                    text=KB_LEXICON_EN["back"], callback_data="back_pl"
-                )
-            )
-    return kb_builder.as_markup()
+    return KEYBOARDS[("back", "")]
+
+
+def subscribe_kb(lang: str) -> InlineKeyboardMarkup:
+    """
+    Get a keyboard which allows the user to choose the daily forecast time.
+    """
+
+    return _keyboard("subscribe", lang)
@@ -20,6 +20,7 @@ LEXICON_COMMANDS_BOTH = {
     "/weather": "Weather forecast / Прогноз погоды",
     "/profile": "Config / Конфигурация",
     "/settings": "Settings / Настройки",
+    "/subscribe": "Daily forecast / Ежедневный прогноз",
 }
 
 ERROR_LEXICON_BOTH = {
@@ -14,6 +14,14 @@ LEXICON_EN = {
     "weather_week": "<b>Choose the desired day:</b>",
     "plots": "<b>Choose the desired plot:</b>",
     "your_profile": "Here are your current settings:",
+    "/subscribe": "<b>Choose the time of the daily forecast</b>\n\
+                \nor send it in the HH:MM format, for example /subscribe 07:30",
+    "subscription": "You receive the forecast every day at {}\n\n",
+    "subscribed": "\u2705You will receive the forecast every day at {}",
+    "unsubscribed": "You have unsubscribed from the daily forecast",
+    "wrong_time": "Send the time in the HH:MM format, for example /subscribe 07:30",
+    "setup_required": "Your settings are not complete, let's finish the setup",
+    "daily_forecast": "<b>Your daily forecast for today:</b>\n\n",
 }
 
 KB_LEXICON_EN = {
@@ -29,10 +37,40 @@ KB_LEXICON_EN = {
     "wind": "Wind plot",
     "precip": "Precipation plot",
     "humid": "Humidity plot",
+    "temp_h": "Hourly temperature",
+    "wind_h": "Hourly wind",
+    "precip_h": "Hourly precipation",
+    "humid_h": "Hourly humidity",
     "back": "\U0001f519Back",
+    "unsubscribe": "Unsubscribe",
 }
 
 ERROR_LEXICON_EN = {
     "GetWeatherError": "Something went wrong.\U0001f622\
                         \nTry again later"
 }
+
+FORECAST_LEXICON_EN = {
+    "today": "{condition}\n\
+                \nAir temperature: {temp}\u00b0,\
+                \nfeels like: {feelslike}\u00b0\n\
+                \nWind direction: {wind_dir},\
+                \nwind speed: {wind_speed}\n\
+                \nAir pressure: {pressure} mmHg\n\
+                \nPrecipitation: {precip}\n\
+                \nHumidity: {humidity}%\n\
+                \nCloud cover: {cloud}%",
+    "day": "{condition}\n\
+                    \nAverage air temperature: {avgtemp}\u00b0,\
+                    \nmaximum: {maxtemp}\u00b0,\nminimum: {mintemp}\u00b0\n\
+                    \nMaximum wind speed: {maxwind}\n\
+                    \nPrecipitation: {precip}\n\
+                    \nAverage air humidity: {avghumidity}%",
+    "kmph": "{} km/h",
+    "mps": "{} m/s",
+    "precip": "{} mm",
+    "no_precip": "not expected",
+    "stale": "\n\n<i>\u26a0\ufe0fThe weather service is not responding,\
+                \nthe data was updated {} min ago</i>",
+    "wind_dir": {},
+}
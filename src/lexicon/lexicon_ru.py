@@ -14,6 +14,14 @@ LEXICON_RU = {
     "weather_week": "<b>Выберите нужный день:</b>",
     "plots": "<b>Выберите нужный график:</b>",
     "your_profile": "Вот ваши текущие настройки:",
+    "/subscribe": "<b>Выберите время ежедневного прогноза</b>\n\
+                \nили отправьте его в формате ЧЧ:ММ, например /subscribe 07:30",
+    "subscription": "Вы получаете прогноз каждый день в {}\n\n",
+    "subscribed": "\u2705Вы будете получать прогноз каждый день в {}",
+    "unsubscribed": "Вы отписались от ежедневного прогноза",
+    "wrong_time": "Отправьте время в формате ЧЧ:ММ, например /subscribe 07:30",
+    "setup_required": "Ваши настройки не завершены, давайте закончим настройку",
+    "daily_forecast": "<b>Ваш ежедневный прогноз на сегодня:</b>\n\n",
 }
 
 KB_LEXICON_RU = {
@@ -29,10 +37,57 @@ KB_LEXICON_RU = {
     "wind": "График ветра",
     "precip": "График осадков",
     "humid": "График влажности",
+    "temp_h": "Температура по часам",
+    "wind_h": "Ветер по часам",
+    "precip_h": "Осадки по часам",
+    "humid_h": "Влажность по часам",
     "back": "\U0001f519Назад",
+    "unsubscribe": "Отписаться",
 }
 
 ERROR_LEXICON_RU = {
     "GetWeatherError": "Что-то пошло не так.\U0001f622\
                         \nПовторите попытку позже"
 }
+
+FORECAST_LEXICON_RU = {
+    "today": "{condition}\n\
+                \nТемпература воздуха: {temp}\u00b0,\
+                \nощущается как: {feelslike}\u00b0\n\
+                \nНаправление ветра: {wind_dir},\
+                \nскорость ветра: {wind_speed}\n\
+                \nДавление воздуха: {pressure} мм рт.ст.\n\
+                \nОсадки: {precip}\n\
+                \nВлажность: {humidity}%\n\
+                \nОблачность: {cloud}%",
+    "day": "{condition}\n\
+                    \nСредняя температура воздуха: {avgtemp}\u00b0,\
+                    \nмаксимальная: {maxtemp}\u00b0,\nминимальная: {mintemp}\u00b0\n\
+                    \nМаксимальная скорость ветра: {maxwind}\n\
+                    \nОсадки: {precip}\n\
+                    \nСредняя влажность воздуха: {avghumidity}%",
+    "kmph": "{} км/ч",
+    "mps": "{} м/с",
+    "precip": "{} мм",
+    "no_precip": "не ожидаются",
+    "stale": "\n\n<i>\u26a0\ufe0fПогодный сервис не отвечает,\
+                \nданные обновлены {} мин назад</i>",
+    "wind_dir": {
+        "N": "С",
+        "NNE": "ССВ",
+        "NE": "СВ",
+        "ENE": "ВСВ",
+        "E": "В",
+        "ESE": "ВЮВ",
+        "SE": "ЮВ",
+        "SSE": "ЮЮВ",
+        "S": "Ю",
+        "SSW": "ЮЮЗ",
+        "SW": "ЮЗ",
+        "WSW": "ЗЮЗ",
+        "W": "З",
+        "WNW": "ЗСЗ",
+        "NW": "СЗ",
+        "NNW": "ССЗ",
+    },
+}
@@ -0,0 +1,2 @@
+from .database import *  # noqa: F403
+from .metrics import *  # noqa: F403
@@ -0,0 +1,35 @@
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .metrics import DB_CHECKED_OUT, DB_CONNECTION_HOLD, DB_QUERY_LATENCY
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Collect the pool and query metrics of the engine.
+    """
+
+    @event.listens_for(engine.pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+        connection_record.info["checkout_time"] = time.perf_counter()
+        DB_CHECKED_OUT.inc()
+
+    @event.listens_for(engine.pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record) -> None:
+        started = connection_record.info.pop("checkout_time", None)
+
+        if started is not None:
+            DB_CONNECTION_HOLD.observe(time.perf_counter() - started)
+            DB_CHECKED_OUT.dec()
+
+    # the start time lives on the execution context, so nothing is left
+    # behind on the connection when the query fails
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        context.query_start_time = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        DB_QUERY_LATENCY.observe(time.perf_counter() - context.query_start_time)
@@ -0,0 +1,60 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+HANDLER_LATENCY = Histogram(
+    "bot_handler_duration_seconds", "Handler processing time", ["handler"]
+)
+HANDLER_ERRORS = Counter(
+    "bot_handler_errors_total", "Unhandled handler exceptions", ["handler"]
+)
+
+UPSTREAM_LATENCY = Histogram(
+    "weather_api_request_duration_seconds", "Weather API request time", ["endpoint"]
+)
+UPSTREAM_ERRORS = Counter(
+    "weather_api_errors_total", "Failed weather API requests", ["endpoint"]
+)
+UPSTREAM_RETRIES = Counter(
+    "weather_api_retries_total", "Retried weather API requests", ["endpoint"]
+)
+UPSTREAM_BATCH_SIZE = Histogram(
+    "weather_api_batch_size",
+    "Locations per weather API request",
+    ["endpoint"],
+    buckets=(1, 2, 5, 10, 20, 50),
+)
+UPSTREAM_BREAKER_STATE = Gauge(
+    "weather_api_breaker_state",
+    "Circuit breaker state: 0 closed, 1 half-open, 2 open",
+    ["name"],
+)
+
+DB_QUERY_LATENCY = Histogram("db_query_duration_seconds", "Database query time")
+DB_CONNECTION_HOLD = Histogram(
+    "db_connection_hold_seconds", "Time a pooled connection is checked out"
+)
+DB_CHECKED_OUT = Gauge("db_pool_checked_out", "Checked out pooled connections")
+DB_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time waited for a pooled connection"
+)
+
+FSM_STORAGE_LATENCY = Histogram(
+    "fsm_storage_duration_seconds", "Redis FSM storage round trip time", ["operation"]
+)
+
+PLOT_RENDER_LATENCY = Histogram("plot_render_duration_seconds", "Plot render time")
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by result", ["cache", "result"]
+)
+
+THROTTLED_UPDATES = Counter(
+    "throttled_updates_total", "Updates dropped by the rate limiter", ["kind"]
+)
+
+SUBSCRIPTION_DELIVERIES = Counter(
+    "subscription_deliveries_total", "Daily forecast deliveries by result", ["result"]
+)
+
+WARMER_REFRESHES = Counter(
+    "cache_warmer_refreshes_total", "Forecasts refreshed ahead of expiry", ["result"]
+)
@@ -1 +1,3 @@
+from .metrics import *  # noqa: F403
+from .profile import *  # noqa: F403
 from .throttling import *  # noqa: F403
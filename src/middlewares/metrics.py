@@ -0,0 +1,27 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from src.metrics import HANDLER_ERRORS, HANDLER_LATENCY
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Measure the processing time of every handler.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        name = data["handler"].callback.__name__
+
+        try:
+            with HANDLER_LATENCY.labels(handler=name).time():
+                return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.labels(handler=name).inc()
+            raise
@@ -0,0 +1,74 @@
+import logging
+from dataclasses import replace
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.cache import ProfileCache
+from src.database import UserProfile, get_profile, set_timezone
+from src.errors import DatabaseError
+from src.services import resolve_timezone
+
+logger = logging.getLogger(__name__)
+
+
+class UserProfileMiddleware(BaseMiddleware):
+    """
+    Resolve the user profile once per update for the handlers that need it.
+    """
+
+    def __init__(self, cache: ProfileCache) -> None:
+        self.cache = cache
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        data["profile_cache"] = self.cache
+        user: User | None = data.get("event_from_user")
+
+        # skip the db for the handlers which do not use the profile
+        if user is not None and "profile" in data["handler"].params:
+            profile = self.cache.get(user.id)
+
+            if profile is None:
+                try:
+                    profile = await get_profile(
+                        user_id=user.id, sessionmaker=data["sessionmaker"]
+                    )
+                except DatabaseError as e:
+                    logger.exception(e)
+                else:
+                    if profile is not None:
+                        if profile.timezone is None and profile.latitude is not None:
+                            profile = await self._resolve_timezone(
+                                profile, data["sessionmaker"]
+                            )
+
+                        self.cache.set(profile)
+
+            data["profile"] = profile
+
+        return await handler(event, data)
+
+    @staticmethod
+    async def _resolve_timezone(
+        profile: UserProfile, sessionmaker: async_sessionmaker[AsyncSession]
+    ) -> UserProfile:
+        # the users saved before the timezone column pay for the lookup once,
+        # not on every update
+        timezone = await resolve_timezone(profile.latitude, profile.longitude)
+
+        if timezone is None:
+            return profile
+
+        try:
+            await set_timezone(profile.user_id, timezone, sessionmaker)
+        except DatabaseError as e:
+            logger.exception(e)
+
+        return replace(profile, timezone=timezone)
@@ -1,13 +1,60 @@
-import datetime
+import logging
 from typing import Any, Awaitable, Callable
 
 from aiogram import BaseMiddleware
-from aiogram.types import CallbackQuery, Message, TelegramObject
+from aiogram.types import CallbackQuery, Message, TelegramObject, User
+from redis.asyncio.client import Redis
+from redis.exceptions import RedisError
 
+from src.config import ThrottlingConfig
+from src.metrics import THROTTLED_UPDATES
 
-class AntiFloodMiddleware(BaseMiddleware):
-    time_updates = {}
-    timedelta_limiter = datetime.timedelta(seconds=0.5)
+logger = logging.getLogger(__name__)
+
+# take a token from the user and the global buckets atomically,
+# the buckets expire as soon as they would be full again
+TOKEN_BUCKET_SCRIPT = """
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local buckets = {}
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2 - 1])
+    local burst = tonumber(ARGV[i * 2])
+
+    if rate > 0 then
+        local state = redis.call("HMGET", key, "tokens", "ts")
+        local tokens = tonumber(state[1]) or burst
+        local ts = tonumber(state[2]) or now
+
+        tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+        if tokens < 1 then
+            return 0
+        end
+
+        buckets[#buckets + 1] = {key, tokens - 1, math.ceil(burst / rate * 1000)}
+    end
+end
+
+for _, bucket in ipairs(buckets) do
+    redis.call("HSET", bucket[1], "tokens", bucket[2], "ts", now)
+    redis.call("PEXPIRE", bucket[1], bucket[3])
+end
+
+return 1
+"""
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Distributed per-user and global rate limiter based on token buckets in Redis.
+    """
+
+    prefix = "throttling"
+
+    def __init__(self, redis: Redis, config: ThrottlingConfig) -> None:
+        self._config = config
+        self._take = redis.register_script(TOKEN_BUCKET_SCRIPT)
 
     async def __call__(
         self,
@@ -15,14 +62,48 @@ class AntiFloodMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: dict[str, Any],
     ) -> Any:
-        if isinstance(event, (Message, CallbackQuery)):
-            tg_user_id = event.from_user.id
-            if tg_user_id in self.time_updates.keys():
-                if (
-                    datetime.datetime.now() - self.time_updates[tg_user_id]
-                ) > self.timedelta_limiter:
-                    self.time_updates[tg_user_id] = datetime.datetime.now()
-                    return await handler(event, data)
-            else:
-                self.time_updates[tg_user_id] = datetime.datetime.now()
-                return await handler(event, data)
+        user: User | None = data.get("event_from_user")
+
+        if user is None or await self._allowed(event, user.id):
+            return await handler(event, data)
+
+        THROTTLED_UPDATES.labels(
+            kind="message" if isinstance(event, Message) else "callback"
+        ).inc()
+
+        if isinstance(event, CallbackQuery):
+            # stop the loading animation of the dropped button click
+            await event.answer()
+
+    async def _allowed(self, event: TelegramObject, user_id: int) -> bool:
+        if isinstance(event, Message):
+            kind = "message"
+            limits = (
+                self._config.user_message_rate,
+                self._config.user_message_burst,
+                self._config.global_message_rate,
+                self._config.global_message_burst,
+            )
+        else:
+            kind = "callback"
+            limits = (
+                self._config.user_callback_rate,
+                self._config.user_callback_burst,
+                self._config.global_callback_rate,
+                self._config.global_callback_burst,
+            )
+
+        try:
+            return bool(
+                await self._take(
+                    keys=[
+                        f"{self.prefix}:{kind}:{user_id}",
+                        f"{self.prefix}:{kind}:global",
+                    ],
+                    args=limits,
+                )
+            )
+        except RedisError as e:
+            # do not block the users while Redis is unavailable
+            logger.warning("Rate limiter is unavailable: %s", e)
+            return True
@@ -0,0 +1 @@
+from .backends import *  # noqa: F403
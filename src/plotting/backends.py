@@ -0,0 +1,75 @@
+import io
+from dataclasses import dataclass
+from typing import Callable
+
+from . import pillow_plots
+
+RenderPlot = Callable[[tuple[str, ...], tuple[float, ...], str, str, str], bytes]
+
+
+def render_plot(
+    x: tuple[str, ...],
+    y: tuple[float, ...],
+    xlabel: str,
+    ylabel: str,
+    title: str,
+) -> bytes:
+    """
+    Render a line plot to PNG bytes, runs in a worker process.
+    """
+
+    # the object-oriented API keeps no global pyplot state
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    ax = fig.subplots()
+
+    # the markers and the labels of every point fit only the short plots
+    step = max(1, -(-len(x) // 8))
+    marker = "o" if step == 1 else ""
+    ax.plot(
+        range(len(y)),
+        y,
+        color="blue",
+        marker=marker,
+        markersize=6,
+        markerfacecolor="black",
+    )
+    ax.set_xticks(range(0, len(x), step), x[::step])
+
+    if step > 1:
+        ax.tick_params(axis="x", labelrotation=30)
+        fig.set_layout_engine("tight")
+
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+def _warm_up(font: str) -> None:
+    # load matplotlib and its font cache once per worker, it has its own fonts
+    import matplotlib.figure  # noqa: F401
+
+
+@dataclass(frozen=True, slots=True)
+class PlotBackend:
+    """
+    Chart library which renders the plots in the worker processes.
+
+    Both functions are module level, so they are passed to the workers.
+    """
+
+    render: RenderPlot
+    warm_up: Callable[[str], None]
+
+
+PLOT_BACKENDS = {
+    "matplotlib": PlotBackend(render=render_plot, warm_up=_warm_up),
+    "pillow": PlotBackend(
+        render=pillow_plots.render_plot, warm_up=pillow_plots.load_fonts
+    ),
+}
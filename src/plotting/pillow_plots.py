@@ -0,0 +1,195 @@
+import io
+import logging
+import math
+import os
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from PIL import ImageFont
+
+logger = logging.getLogger(__name__)
+
+# the size of the matplotlib figures, the chart is drawn twice as large
+# and reduced afterwards, which smooths the lines and the text
+WIDTH, HEIGHT = 640, 480
+SCALE = 2
+MAX_TICKS = 8
+
+_font_path: str | None = None
+
+
+def _bundled_font() -> str | None:
+    # matplotlib ships DejaVu Sans, it is found without importing matplotlib
+    if (spec := find_spec("matplotlib")) is None or spec.origin is None:
+        return None
+
+    path = os.path.join(
+        os.path.dirname(spec.origin), "mpl-data", "fonts", "ttf", "DejaVuSans.ttf"
+    )
+    return path if os.path.exists(path) else None
+
+
+def load_fonts(font: str) -> None:
+    """
+    Find the font of the charts, runs once in every worker process.
+    """
+
+    from PIL import ImageFont
+
+    global _font_path
+
+    # the system fonts are searched by the file name as well
+    for path in (font, _bundled_font()):
+        if path is None:
+            continue
+
+        try:
+            ImageFont.truetype(path, 10)
+        except OSError:
+            continue
+
+        _font_path = path
+        break
+    else:
+        logger.warning("Font %s is not found, Cyrillic text is not shown", font)
+
+    _font.cache_clear()
+
+
+@lru_cache
+def _font(size: int) -> "ImageFont.FreeTypeFont":
+    from PIL import ImageFont
+
+    if _font_path is None:
+        return ImageFont.load_default(size)
+
+    return ImageFont.truetype(_font_path, size)
+
+
+def _y_ticks(y: tuple[float, ...]) -> tuple[float, float, list[float], int]:
+    low, high = min(y), max(y)
+
+    if low == high:
+        low, high = low - 1, high + 1
+
+    # the lines do not touch the frame
+    margin = (high - low) * 0.05
+    low, high = low - margin, high + margin
+
+    # a round step which gives about five ticks
+    raw = (high - low) / 5
+    magnitude = 10 ** math.floor(math.log10(raw))
+    step = next(m for m in (1, 2, 5, 10) if m * magnitude >= raw) * magnitude
+
+    first, last = math.ceil(low / step), math.floor(high / step)
+    decimals = max(0, -math.floor(math.log10(step)))
+    return low, high, [index * step for index in range(first, last + 1)], decimals
+
+
+def render_plot(
+    x: tuple[str, ...],
+    y: tuple[float, ...],
+    xlabel: str,
+    ylabel: str,
+    title: str,
+) -> bytes:
+    """
+    Render a line plot to PNG bytes with Pillow, runs in a worker process.
+    """
+
+    from PIL import Image, ImageDraw
+
+    s = SCALE
+    image = Image.new("RGB", (WIDTH * s, HEIGHT * s), "white")
+    draw = ImageDraw.Draw(image)
+    title_font, label_font, tick_font = _font(17 * s), _font(14 * s), _font(13 * s)
+
+    low, high, y_ticks, decimals = _y_ticks(y)
+    y_labels = [f"{tick:.{decimals}f}" for tick in y_ticks]
+
+    # the plot area leaves room for the labels around it
+    label_height = draw.textbbox((0, 0), ylabel, font=label_font, anchor="lt")[3]
+    left = (
+        18 * s
+        + label_height
+        + max(draw.textlength(label, font=tick_font) for label in y_labels)
+    )
+    top, right, bottom = 40 * s, (WIDTH - 20) * s, (HEIGHT - 55) * s
+
+    span = max(len(y) - 1, 1)
+
+    def position(index: int, value: float) -> tuple[float, float]:
+        share = 0.5 if len(y) == 1 else 0.05 + 0.9 * index / span
+        return (
+            left + (right - left) * share,
+            bottom - (bottom - top) * (value - low) / (high - low),
+        )
+
+    draw.rectangle((left, top, right, bottom), outline="black", width=s)
+
+    for tick, label in zip(y_ticks, y_labels):
+        _, tick_y = position(0, tick)
+        draw.line((left - 4 * s, tick_y, left, tick_y), fill="black", width=s)
+        draw.text(
+            (left - 7 * s, tick_y), label, fill="black", font=tick_font, anchor="rm"
+        )
+
+    # the markers and the labels of every point fit only the short plots
+    step = max(1, -(-len(x) // MAX_TICKS))
+
+    for index in range(0, len(x), step):
+        tick_x, _ = position(index, low)
+        draw.line((tick_x, bottom, tick_x, bottom + 4 * s), fill="black", width=s)
+        draw.text(
+            (tick_x, bottom + 7 * s),
+            x[index],
+            fill="black",
+            font=tick_font,
+            anchor="mt",
+        )
+
+    points = [position(index, value) for index, value in enumerate(y)]
+    draw.line(points, fill="blue", width=2 * s, joint="curve")
+
+    if step == 1:
+        radius = 4 * s
+        for point_x, point_y in points:
+            draw.ellipse(
+                (
+                    point_x - radius,
+                    point_y - radius,
+                    point_x + radius,
+                    point_y + radius,
+                ),
+                fill="black",
+                outline="blue",
+                width=s,
+            )
+
+    draw.text(
+        (WIDTH * s / 2, 20 * s), title, fill="black", font=title_font, anchor="mm"
+    )
+    draw.text(
+        ((left + right) / 2, (HEIGHT - 8) * s),
+        xlabel,
+        fill="black",
+        font=label_font,
+        anchor="mb",
+    )
+
+    # the vertical label is drawn on its own layer and turned
+    box = draw.textbbox((0, 0), ylabel, font=label_font, anchor="lt")
+    layer = Image.new("L", (box[2], box[3]), 0)
+    ImageDraw.Draw(layer).text((0, 0), ylabel, fill=255, font=label_font, anchor="lt")
+    layer = layer.rotate(90, expand=True)
+    image.paste("black", (10 * s, int((top + bottom - layer.height) / 2)), mask=layer)
+
+    # the chart has a few colours, a palette image is smaller and
+    # faster to compress than the full colour one
+    image = image.reduce(s).quantize(32, method=Image.Quantize.FASTOCTREE)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
@@ -0,0 +1,2 @@
+from .metrics import *  # noqa: F403
+from .webhook import *  # noqa: F403
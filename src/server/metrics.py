@@ -0,0 +1,57 @@
+import logging
+
+from aiohttp import web
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from src.config import MetricsConfig
+
+logger = logging.getLogger(__name__)
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    """
+    Expose the metrics in the Prometheus text format.
+    """
+
+    return web.Response(
+        body=generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST}
+    )
+
+
+class MetricsServer:
+    """
+    HTTP server of the /metrics endpoint running in the bot process.
+    """
+
+    def __init__(self, config: MetricsConfig) -> None:
+        self._config = config
+        self._runner: web.AppRunner | None = None
+
+    async def start(self) -> None:
+        """
+        Start the server, called on the dispatcher startup.
+        """
+
+        app = web.Application()
+        app.router.add_get(self._config.path, metrics_handler)
+
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(
+            self._runner, host=self._config.host, port=self._config.port
+        ).start()
+        logger.info(
+            "Metrics are served on %s:%s%s",
+            self._config.host,
+            self._config.port,
+            self._config.path,
+        )
+
+    async def close(self) -> None:
+        """
+        Stop the server, called on the dispatcher shutdown.
+        """
+
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import signal
+from contextlib import suppress
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from src.config import WebhookConfig
+
+logger = logging.getLogger(__name__)
+
+
+class LimitedRequestHandler(SimpleRequestHandler):
+    """
+    Webhook handler which processes a limited number of updates concurrently.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        max_concurrent_updates: int,
+        secret_token: str | None = None,
+        **data: Any,
+    ) -> None:
+        super().__init__(
+            dispatcher=dispatcher,
+            bot=bot,
+            handle_in_background=True,
+            secret_token=secret_token,
+            **data,
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrent_updates)
+
+    async def _background_feed_update(self, bot: Bot, update: dict[str, Any]) -> None:
+        async with self._semaphore:
+            await super()._background_feed_update(bot=bot, update=update)
+
+
+async def run_webhook(
+    dispatcher: Dispatcher, bot: Bot, config: WebhookConfig, **data: Any
+) -> None:
+    """
+    Receive updates through the webhook until SIGINT or SIGTERM.
+    """
+
+    app = web.Application()
+    LimitedRequestHandler(
+        dispatcher=dispatcher,
+        bot=bot,
+        max_concurrent_updates=config.max_concurrent_updates,
+        secret_token=config.secret or None,
+        **data,
+    ).register(app, path=config.path)
+    setup_application(app, dispatcher, bot=bot, **data)
+
+    # without the public url the endpoint only accepts local test updates
+    if config.url:
+        await bot.set_webhook(
+            url=f"{config.url.rstrip('/')}{config.path}",
+            secret_token=config.secret or None,
+            allowed_updates=dispatcher.resolve_used_update_types(),
+        )
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=config.host, port=config.port).start()
+    logger.info(
+        "Webhook is listening on %s:%s%s", config.host, config.port, config.path
+    )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
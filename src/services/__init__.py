@@ -1 +1,7 @@
+from .plots import *  # noqa: F403
+from .preload import *  # noqa: F403
 from .services import *  # noqa: F403
+from .timezones import *  # noqa: F403
+from .sender import *  # noqa: F403
+from .subscriptions import *  # noqa: F403
+from .warmer import *  # noqa: F403
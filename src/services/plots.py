@@ -0,0 +1,92 @@
+import asyncio
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator
+
+from src.config import PlotConfig
+from src.metrics import PLOT_RENDER_LATENCY
+from src.plotting import PLOT_BACKENDS
+
+
+@contextmanager
+def _without_main() -> Iterator[None]:
+    # a spawned process imports the main module of the parent first, which
+    # loads aiogram, SQLAlchemy, redis and the rest into every plot worker,
+    # while the workers need only src.plotting
+    main = sys.modules["__main__"]
+    spec, path = main.__spec__, main.__dict__.pop("__file__", None)
+    main.__spec__ = None
+
+    try:
+        yield
+    finally:
+        main.__spec__ = spec
+
+        if path is not None:
+            main.__file__ = path
+
+
+class PlotRenderer:
+    """
+    Bounded process pool which renders the weather plots off the event loop.
+    """
+
+    def __init__(self, config: PlotConfig) -> None:
+        if config.backend not in PLOT_BACKENDS:
+            raise ValueError(f"Unknown plot backend: {config.backend}")
+
+        self._config = config
+        self._backend = PLOT_BACKENDS[config.backend]
+        self._executor: ProcessPoolExecutor | None = None
+
+    async def start(self) -> None:
+        """
+        Start the worker processes, called on the dispatcher startup.
+        """
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self._config.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=self._backend.warm_up,
+            initargs=(self._config.font,),
+        )
+
+        # the processes start and load the chart library in the background,
+        # not when the first plot is requested, the pool spawns all of them
+        # here and never later
+        with _without_main():
+            for _ in range(self._config.workers):
+                self._executor.submit(self._backend.warm_up, self._config.font)
+
+    async def close(self) -> None:
+        """
+        Stop the worker processes, called on the dispatcher shutdown.
+        """
+
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            # a process does not exit until its pool is joined, which
+            # matters for the worker processes of the supervisor
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+    async def render(
+        self,
+        x: tuple[str, ...],
+        y: tuple[float, ...],
+        xlabel: str,
+        ylabel: str,
+        title: str,
+    ) -> bytes:
+        """
+        Render a line plot to PNG bytes in the worker pool.
+        """
+
+        if self._executor is None:
+            raise RuntimeError("PlotRenderer is not started")
+
+        with PLOT_RENDER_LATENCY.time():
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._backend.render, x, y, xlabel, ylabel, title
+            )
@@ -0,0 +1,43 @@
+import asyncio
+import logging
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class Preloader:
+    """
+    Background task which loads the heavy modules and data after the startup.
+
+    The bot receives the updates right away, and the first updates which
+    need the loaded parts do not wait for them.
+    """
+
+    def __init__(self, *loaders: Callable[[], Any]) -> None:
+        self._loaders = loaders
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """
+        Start the loading, called on the dispatcher startup.
+        """
+
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """
+        Stop the loading, called on the dispatcher shutdown.
+        """
+
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        for loader in self._loaders:
+            try:
+                # the loaders block, so they run in a thread
+                await asyncio.to_thread(loader)
+            except Exception:
+                logger.exception("Preloading failed")
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramRetryAfter,
+)
+from redis.asyncio.client import Redis
+from redis.exceptions import RedisError
+
+from src.config import SubscriptionConfig
+from src.middlewares.throttling import TOKEN_BUCKET_SCRIPT
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitedSender:
+    """
+    Message sender which respects the global and the per-chat Telegram limits.
+
+    The limits are token buckets in Redis shared by all the bot replicas.
+    """
+
+    prefix = "sender"
+
+    def __init__(self, redis: Redis, config: SubscriptionConfig) -> None:
+        self._config = config
+        self._take = redis.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def send(self, bot: Bot, chat_id: int, text: str) -> bool:
+        """
+        Send a message waiting for the rate limits, return False if the chat is gone.
+
+        The other errors are raised, the message may be sent again later.
+        """
+
+        while True:
+            await self._acquire(chat_id)
+
+            try:
+                await bot.send_message(chat_id=chat_id, text=text)
+                return True
+            except TelegramRetryAfter as e:
+                # the limits were exceeded anyway, wait as long as Telegram asks
+                logger.warning("Flood control, retry in %s s", e.retry_after)
+                await asyncio.sleep(e.retry_after)
+            except TelegramForbiddenError as e:
+                # the user has blocked the bot or deleted the account
+                logger.info("Can not send a message to %s: %s", chat_id, e)
+                return False
+            except TelegramBadRequest as e:
+                # only a deleted chat is gone, a broken message is not the user's fault
+                if "chat not found" not in e.message.lower():
+                    raise
+
+                logger.info("Can not send a message to %s: %s", chat_id, e)
+                return False
+
+    async def _acquire(self, chat_id: int) -> None:
+        # an empty bucket is refilled with a token every 1 / rate seconds
+        delay = 1 / self._config.global_rate if self._config.global_rate > 0 else 0
+
+        while True:
+            try:
+                allowed = await self._take(
+                    keys=[f"{self.prefix}:{chat_id}", f"{self.prefix}:global"],
+                    args=(
+                        self._config.chat_rate,
+                        self._config.chat_burst,
+                        self._config.global_rate,
+                        self._config.global_burst,
+                    ),
+                )
+            except RedisError as e:
+                # pace the messages locally while Redis is unavailable
+                logger.warning("Sender rate limiter is unavailable: %s", e)
+                await asyncio.sleep(delay)
+                return
+
+            if allowed:
+                return
+
+            await asyncio.sleep(delay)
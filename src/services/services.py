@@ -1,70 +1,85 @@
-import os
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
+from typing import Callable
 
-import matplotlib.pyplot as plt
 import pytz
-import timezonefinder
+import src.lexicon as lex
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from src.cache import CachedPlot, PlotCache, TextCache
+from src.database import UserProfile, set_timezone, subscribe
+from src.errors import DatabaseError, GetWeatherError, SetupRequiredError
+from src.external_services import (
+    CurrentWeather,
+    DayForecast,
+    Forecast,
+    WeatherClient,
+)
 
-import src.lexicon as lex
-from src.database import get_data, get_language
-from src.external_services import get_weather
-
-WIND_DIR_RU = {
-    "N": "С",
-    "NNE": "ССВ",
-    "NE": "СВ",
-    "ENE": "ВСВ",
-    "E": "В",
-    "ESE": "ВЮВ",
-    "SE": "ЮВ",
-    "SSE": "ЮЮВ",
-    "S": "Ю",
-    "SSW": "ЮЮЗ",
-    "SW": "ЮЗ",
-    "WSW": "ЗЮЗ",
-    "W": "З",
-    "WNW": "ЗСЗ",
-    "NW": "СЗ",
-    "NNW": "ССЗ",
-}
-
-
-async def days_generator(
-    user_id: int, sessionmaker: async_sessionmaker[AsyncSession]
-) -> tuple:
+from .plots import PlotRenderer
+from .timezones import delivery_timezone, resolve_timezone
+
+
+def local_now(profile: UserProfile) -> datetime:
+    """
+    Get the current time in the user timezone.
+    """
+
+    # the timezone is resolved when the location is saved or the profile is
+    # loaded, the lookup does not run on the event loop here
+    if profile.timezone is None:
+        return datetime.now()
+
+    return datetime.now(pytz.timezone(profile.timezone))
+
+
+def local_date(profile: UserProfile) -> date:
+    """
+    Get the current date in the user timezone.
+    """
+
+    return local_now(profile).date()
+
+
+def days_generator(profile: UserProfile) -> tuple:
     """
     Get 3 days using tz.
     """
 
-    user_info = await get_data(user_id=user_id, sessionmaker=sessionmaker)
+    today = local_date(profile)
 
-    tf = timezonefinder.TimezoneFinder()
-    dt = datetime.now()
+    return tuple((today + timedelta(days=i)).strftime("%d") for i in range(3))
 
-    timezone_str = tf.certain_timezone_at(
-        lat=float(user_info["latitude"]), lng=float(user_info["longitude"])
-    )
 
-    if timezone_str is None:
-        return tuple((dt + timedelta(days=i)).strftime("%d") for i in range(3))
-    else:
-        timezone = pytz.timezone(timezone_str)
-        return tuple(
-            (dt + timezone.utcoffset(dt) + timedelta(days=i)).strftime("%d")
-            for i in range(3)
-        )
+def get_user(profile: UserProfile | None) -> UserProfile:
+    """
+    Get the resolved user profile or fail if the user is not in the db
+    or has not completed the setup.
+    """
+
+    if profile is None:
+        raise DatabaseError
+
+    if None in (
+        profile.latitude,
+        profile.longitude,
+        profile.temp_unit,
+        profile.wind_unit,
+    ):
+        raise SetupRequiredError
+
+    return profile
 
 
-async def create_message(
-    user_id: int, sessionmaker: async_sessionmaker[AsyncSession], msg_type: str = ""
-) -> tuple:
+def create_message(profile: UserProfile | None, msg_type: str = "") -> tuple:
     """
     Get lang, a message for the user
     and a possible error message.
     """
 
-    lang = await get_language(user_id=user_id, sessionmaker=sessionmaker)
+    # the language is set first, so the messages of the setup use it too
+    if profile is None:
+        raise DatabaseError
+
+    lang = profile.language
 
     if lang == "RU":
         if msg_type:
@@ -82,301 +97,357 @@ async def create_message(
     return lang, msg, error_msg
 
 
-async def create_forecast_today(
-    user_id: int, lang: str, sessionmaker: async_sessionmaker[AsyncSession]
+FORECAST_LEXICON = {"RU": lex.FORECAST_LEXICON_RU, "EN": lex.FORECAST_LEXICON_EN}
+
+
+def _wind_speed(wind_kph: float, wind_unit: str, lexicon: dict) -> str:
+    if wind_unit == "kmph":
+        return lexicon["kmph"].format(wind_kph)
+
+    return lexicon["mps"].format(int(wind_kph) // 3.6)
+
+
+def _precip(precip_mm: float, lexicon: dict) -> str:
+    if int(precip_mm) == 0:
+        return lexicon["no_precip"]
+
+    return lexicon["precip"].format(precip_mm)
+
+
+def render_current(
+    current: CurrentWeather, lang: str, temp_unit: str, wind_unit: str
 ) -> str:
     """
-    Create weather forecast for today.
+    Render the current weather message using the language templates.
     """
 
-    user_info = await get_data(user_id=user_id, sessionmaker=sessionmaker)
+    lexicon = FORECAST_LEXICON.get(lang, lex.FORECAST_LEXICON_EN)
+    celsius = temp_unit == "celsius"
+
+    return lexicon["today"].format(
+        condition=current.condition.capitalize(),
+        temp=current.temp_c if celsius else current.temp_f,
+        feelslike=current.feelslike_c if celsius else current.feelslike_f,
+        wind_dir=lexicon["wind_dir"].get(current.wind_dir, current.wind_dir),
+        wind_speed=_wind_speed(current.wind_kph, wind_unit, lexicon),
+        pressure=round(int(current.pressure_mb) * 0.750064),
+        precip=_precip(current.precip_mm, lexicon),
+        humidity=current.humidity,
+        cloud=current.cloud,
+    )
 
-    if lang == "RU":
-        weather_info = await get_weather(
-            True,
-            q=f"{float(user_info['latitude'])},{float(user_info['longitude'])}",
-            aqi="no",
-            lang="ru",
-        )
-    else:
-        weather_info = await get_weather(
-            True,
-            q=f"{float(user_info['latitude'])},{float(user_info['longitude'])}",
-            aqi="no",
-            lang="en",
-        )
 
-    condition = str(weather_info["current"]["condition"]["text"])
+def render_day(day: DayForecast, lang: str, temp_unit: str, wind_unit: str) -> str:
+    """
+    Render the day forecast message using the language templates.
+    """
 
-    if user_info["temp_unit"] == "celsius":
-        temp = str(weather_info["current"]["temp_c"])
-        feelslike_t = str(weather_info["current"]["feelslike_c"])
-    else:
-        temp = str(weather_info["current"]["temp_f"])
-        feelslike_t = str(weather_info["current"]["feelslike_f"])
+    lexicon = FORECAST_LEXICON.get(lang, lex.FORECAST_LEXICON_EN)
+    celsius = temp_unit == "celsius"
+
+    return lexicon["day"].format(
+        condition=day.condition.capitalize(),
+        avgtemp=day.avgtemp_c if celsius else day.avgtemp_f,
+        maxtemp=day.maxtemp_c if celsius else day.maxtemp_f,
+        mintemp=day.mintemp_c if celsius else day.mintemp_f,
+        maxwind=_wind_speed(day.maxwind_kph, wind_unit, lexicon),
+        precip=_precip(day.totalprecip_mm, lexicon),
+        avghumidity=day.avghumidity,
+    )
 
-    if user_info["wind_unit"] == "kmph":
-        if lang == "RU":
-            wind_speed = f"{weather_info['current']['wind_kph']} км/ч"
-        else:
-            wind_speed = f"{weather_info['current']['wind_kph']} km/h"
-    else:
-        if lang == "RU":
-            wind_speed = f"{int(weather_info['current']['wind_kph']) // 3.6} м/с"
-        else:
-            wind_speed = f"{int(weather_info['current']['wind_kph']) // 3.6} m/s"
 
-    if lang == "RU":
-        wind_degree = WIND_DIR_RU[weather_info["current"]["wind_dir"]]
-    else:
-        wind_degree = weather_info["current"]["wind_dir"]
+def render_stale(forecast: Forecast, lang: str) -> str:
+    """
+    Render the note about the outdated forecast or nothing for the fresh one.
+    """
 
-    pressure = str(round(int(weather_info["current"]["pressure_mb"]) * 0.750064))
+    if not forecast.stale:
+        return ""
 
-    if int(weather_info["current"]["precip_mm"]) == 0:
-        if lang == "RU":
-            precip = "не ожидаются"
-        else:
-            precip = "not expected"
-    else:
-        if lang == "RU":
-            precip = f"{weather_info['current']['precip_mm']} мм"
-        else:
-            precip = f"{weather_info['current']['precip_mm']} mm"
+    lexicon = FORECAST_LEXICON.get(lang, lex.FORECAST_LEXICON_EN)
+    now = datetime.now().timestamp()
+    return lexicon["stale"].format(int(now - (forecast.version or now)) // 60)
 
-    humidity = str(weather_info["current"]["humidity"])
-    cloud = str(weather_info["current"]["cloud"])
 
-    if lang == "RU":
-        res = f"{condition.capitalize()}\n\
-                \nТемпература воздуха: {temp}\u00b0,\
-                \nощущается как: {feelslike_t}\u00b0\n\
-                \nНаправление ветра: {wind_degree},\
-                \nскорость ветра: {wind_speed}\n\
-                \nДавление воздуха: {pressure} мм рт.ст.\n\
-                \nОсадки: {precip}\n\
-                \nВлажность: {humidity}%\n\
-                \nОблачность: {cloud}%"
-    else:
-        res = f"{condition.capitalize()}\n\
-                \nAir temperature: {temp}\u00b0,\
-                \nfeels like: {feelslike_t}\u00b0\n\
-                \nWind direction: {wind_degree},\
-                \nwind speed: {wind_speed}\n\
-                \nAir pressure: {pressure} mmHg\n\
-                \nPrecipitation: {precip}\n\
-                \nHumidity: {humidity}%\n\
-                \nCloud cover: {cloud}%"
+async def render_forecast(
+    user_info: UserProfile,
+    lang: str,
+    today: bool,
+    day: str,
+    weather_client: WeatherClient,
+    text_cache: TextCache | None,
+    render: Callable[[Forecast], str],
+) -> str:
+    """
+    Render the forecast message or get it from the shared cache.
+    """
+
+    request = {
+        "today": today,
+        "latitude": user_info.latitude,
+        "longitude": user_info.longitude,
+        "lang": lang.lower(),
+        "days": 3,
+    }
+    forecast_key = weather_client.cache_key(**request)
+
+    if text_cache is None or forecast_key is None:
+        forecast = await weather_client.get_forecast(**request)
+        return render(forecast) + render_stale(forecast, lang)
+
+    # the parsed forecast mostly comes from the process memory, the message
+    # depends only on its version, the units and the day
+    forecast = await weather_client.get_forecast(**request)
 
-    return res
+    # the stale message must not outlive the outage
+    if forecast.stale:
+        return render(forecast) + render_stale(forecast, lang)
+
+    key = text_cache.key(forecast_key, forecast.version)
+    field = text_cache.field(user_info.temp_unit, user_info.wind_unit, day)
+    text = await text_cache.get(key, field)
+
+    if text is None:
+        text = render(forecast)
+        await text_cache.set(key, field, text, ttl=weather_client.cache_ttl(forecast))
+
+    return text
+
+
+async def create_forecast_today(
+    profile: UserProfile | None,
+    lang: str,
+    weather_client: WeatherClient,
+    text_cache: TextCache | None = None,
+) -> str:
+    """
+    Create weather forecast for today.
+    """
+
+    user_info = get_user(profile)
+
+    return await render_forecast(
+        user_info=user_info,
+        lang=lang,
+        today=True,
+        day="now",
+        weather_client=weather_client,
+        text_cache=text_cache,
+        render=lambda forecast: render_current(
+            forecast.current, lang, user_info.temp_unit, user_info.wind_unit
+        ),
+    )
 
 
 async def create_forecast_week(
-    user_id: int, lang: str, sessionmaker: async_sessionmaker[AsyncSession]
-) -> dict[str, str]:
+    profile: UserProfile | None,
+    lang: str,
+    day: str,
+    weather_client: WeatherClient,
+    text_cache: TextCache | None = None,
+) -> str:
     """
-    Create weather forecast for the following days.
+    Create weather forecast for the day of the following days.
     """
 
-    user_info = await get_data(user_id=user_id, sessionmaker=sessionmaker)
+    user_info = get_user(profile)
 
-    if lang == "RU":
-        weather_info = await get_weather(
-            False,
-            q=f"{float(user_info['latitude'])},{float(user_info['longitude'])}",
-            days="3",
-            aqi="no",
-            alerts="no",
-            lang="ru",
-        )
-    else:
-        weather_info = await get_weather(
-            False,
-            q=f"{float(user_info['latitude'])},{float(user_info['longitude'])}",
-            days="3",
-            aqi="no",
-            alerts="no",
-            lang="en",
-        )
+    def render(forecast: Forecast) -> str:
+        forecast_day = forecast.get_day(day)
 
-    res = {}
+        # the day has gone or the forecast does not cover it yet
+        if forecast_day is None:
+            raise GetWeatherError
 
-    for day in weather_info["forecast"]["forecastday"]:
-        day_n = str(day["date"][-2:])
-        condition = str(day["day"]["condition"]["text"])
+        return render_day(forecast_day, lang, user_info.temp_unit, user_info.wind_unit)
 
-        if user_info["temp_unit"] == "celsius":
-            maxtemp = str(day["day"]["maxtemp_c"])
-            mintemp = str(day["day"]["mintemp_c"])
-            avgtemp = str(day["day"]["avgtemp_c"])
-        else:
-            maxtemp = str(day["day"]["maxtemp_f"])
-            mintemp = str(day["day"]["mintemp_f"])
-            avgtemp = str(day["day"]["avgtemp_f"])
-
-        if user_info["wind_unit"] == "kmph":
-            if lang == "RU":
-                maxwind = f"{day['day']['maxwind_kph']} км/ч"
-            else:
-                maxwind = f"{day['day']['maxwind_kph']} km/h"
-        else:
-            if lang == "RU":
-                maxwind = f"{int(day['day']['maxwind_kph']) // 3.6} м/с"
-            else:
-                maxwind = f"{int(day['day']['maxwind_kph']) // 3.6} m/s"
-
-        if int(day["day"]["totalprecip_mm"]) == 0:
-            if lang == "RU":
-                totalprecip = "не ожидаются"
-            else:
-                totalprecip = "not expected"
-        else:
-            if lang == "RU":
-                totalprecip = f"{day['day']['totalprecip_mm']} мм"
-            else:
-                totalprecip = f"{day['day']['totalprecip_mm']} mm"
-
-        avghumidity = str(day["day"]["avghumidity"])
-
-        if lang == "RU":
-            info = f"{condition.capitalize()}\n\
-                    \nСредняя температура воздуха: {avgtemp}\u00b0,\
-                    \nмаксимальная: {maxtemp}\u00b0,\nминимальная: {mintemp}\u00b0\n\
-                    \nМаксимальная скорость ветра: {maxwind}\n\
-                    \nОсадки: {totalprecip}\n\
-                    \nСредняя влажность воздуха: {avghumidity}%"
-        else:
-            info = f"{condition.capitalize()}\n\
-                    \nAverage air temperature: {avgtemp}\u00b0,\
-                    \nmaximum: {maxtemp}\u00b0,\nminimum: {mintemp}\u00b0\n\
-                    \nMaximum wind speed: {maxwind}\n\
-                    \nPrecipitation: {totalprecip}\n\
-                    \nAverage air humidity: {avghumidity}%"
+    return await render_forecast(
+        user_info=user_info,
+        lang=lang,
+        today=False,
+        day=day,
+        weather_client=weather_client,
+        text_cache=text_cache,
+        render=render,
+    )
 
-        res.setdefault(day_n, info)
 
-    return res
+async def create_subscription(
+    profile: UserProfile | None,
+    delivery_time: time,
+    sessionmaker: async_sessionmaker[AsyncSession],
+) -> None:
+    """
+    Subscribe the user to the daily forecast at the local time.
+    """
 
+    user_info = get_user(profile)
+    timezone_str = user_info.timezone
 
-async def create_profile(
-    user_id: int, lang: str, sessionmaker: async_sessionmaker[AsyncSession]
-) -> str:
+    # the scheduler finds the subscribers by the saved timezone
+    if timezone_str is None:
+        timezone_str = await resolve_timezone(user_info.latitude, user_info.longitude)
+
+        if timezone_str is not None:
+            await set_timezone(user_info.user_id, timezone_str, sessionmaker)
+
+    # the same clock as the scheduler uses for the user
+    now = datetime.now(delivery_timezone(timezone_str))
+
+    # the time has already passed today, start delivering tomorrow
+    last_sent_on = now.date() if delivery_time <= now.time() else None
+
+    await subscribe(
+        data=(user_info.user_id, delivery_time, last_sent_on), sessionmaker=sessionmaker
+    )
+
+
+def create_profile(profile: UserProfile | None, lang: str) -> str:
     """
     Create user profile.
     """
 
-    user_info = await get_data(user_id=user_id, sessionmaker=sessionmaker)
+    user_info = get_user(profile)
+
+    if lang == "RU":
+        return f"Язык: {user_info.language}\
+                \nШирота: {user_info.latitude}\
+                \nДолгота: {user_info.longitude}\
+                \nЕдиницы измерения температуры: {lex.KB_LEXICON_RU[user_info.temp_unit]}\
+                \nЕдиницы измерения скорости ветра: {lex.KB_LEXICON_RU[user_info.wind_unit]}"
+    else:
+        return f"Language: {user_info.language}\
+                \nLatitude: {user_info.latitude}\
+                \nLongitude: {user_info.longitude}\
+                \nTemperature measurement units: {lex.KB_LEXICON_EN[user_info.temp_unit]}\
+                \nUnits of wind speed measurement: {lex.KB_LEXICON_EN[user_info.wind_unit]}"
+
 
+def _plot_labels(measure: str, unit: str, lang: str, hourly: bool) -> tuple[str, str]:
     if lang == "RU":
-        return f"Язык: {user_info['language']}\
-                \nШирота: {float(user_info['latitude'])}\
-                \nДолгота: {float(user_info['longitude'])}\
-                \nЕдиницы измерения температуры: {lex.KB_LEXICON_RU[user_info['temp_unit']]}\
-                \nЕдиницы измерения скорости ветра: {lex.KB_LEXICON_RU[user_info['wind_unit']]}"
+        match measure:
+            case "temp":
+                ylabel = f"Температура, {lex.KB_LEXICON_RU[unit]}"
+                title = "график температуры"
+            case "wind":
+                ylabel = f"Скорость ветра, {lex.KB_LEXICON_RU[unit]}"
+                title = "график скорости ветра"
+            case "precip":
+                ylabel, title = "Осадки, мм", "график осадков"
+            case _:
+                ylabel, title = "Влажность, %", "график влажности"
+
+        prefix = "Почасовой " if hourly else ""
     else:
-        return f"Language: {user_info['language']}\
-                \nLatitude: {float(user_info['latitude'])}\
-                \nLongitude: {float(user_info['longitude'])}\
-                \nTemperature measurement units: {lex.KB_LEXICON_EN[user_info['temp_unit']]}\
-                \nUnits of wind speed measurement: {lex.KB_LEXICON_EN[user_info['wind_unit']]}"
+        match measure:
+            case "temp":
+                ylabel = f"Temperature, {lex.KB_LEXICON_EN[unit]}"
+                title = "temperature plot"
+            case "wind":
+                ylabel = f"Wind speed, {lex.KB_LEXICON_EN[unit]}"
+                title = "wind speed plot"
+            case "precip":
+                ylabel, title = "Precipitation, mm", "precipitation plot"
+            case _:
+                ylabel, title = "Humidity, %", "humidity plot"
+
+        prefix = "Hourly " if hourly else ""
+
+    title = prefix + title if prefix else title.capitalize()
+    return ylabel, title
 
 
 async def create_plot(
-    user_id: int,
+    profile: UserProfile | None,
     lang: str,
     plot_type: str,
-    sessionmaker: async_sessionmaker[AsyncSession],
-) -> None:
+    weather_client: WeatherClient,
+    plot_renderer: PlotRenderer,
+    plot_cache: PlotCache,
+) -> CachedPlot:
     """
-    Create different weather plots.
+    Create the daily or the hourly ("_h" suffix) weather plots
+    or get them from the cache.
     """
 
-    user_info = await get_data(user_id=user_id, sessionmaker=sessionmaker)
+    import numpy as np
 
-    if lang == "RU":
-        weather_info = await get_weather(
-            False,
-            q=f"{float(user_info['latitude'])},{float(user_info['longitude'])}",
-            days="3",
-            aqi="no",
-            alerts="no",
-            lang="ru",
-        )
-    else:
-        weather_info = await get_weather(
-            False,
-            q=f"{float(user_info['latitude'])},{float(user_info['longitude'])}",
-            days="3",
-            aqi="no",
-            alerts="no",
-            lang="en",
-        )
+    user_info = get_user(profile)
+    hourly = plot_type.endswith("_h")
+    measure = plot_type.removesuffix("_h")
 
-    x = tuple(await days_generator(user_id=user_id, sessionmaker=sessionmaker))
-    y = []
+    forecast = await weather_client.get_forecast(
+        False,
+        latitude=user_info.latitude,
+        longitude=user_info.longitude,
+        lang=lang.lower(),
+        days=3,
+    )
 
-    if lang == "RU":
-        plt.xlabel("Дни")
-    else:
-        plt.xlabel("Days")
+    days = tuple(days_generator(user_info))
+    now = local_now(user_info)
+
+    # only the temperature and wind plots depend on the user units,
+    # the hourly ones start at the current hour
+    unit = {"temp": user_info.temp_unit, "wind": user_info.wind_unit}.get(measure, "")
+
+    key = plot_cache.key(
+        latitude=user_info.latitude,
+        longitude=user_info.longitude,
+        lang=lang,
+        unit=unit,
+        days=days + ((now.strftime("%H"),) if hourly else ()),
+        plot_type=plot_type,
+        version=forecast.version,
+    )
+    plot = await plot_cache.get(key)
+
+    if plot.file_id is not None or plot.png is not None:
+        return plot
+
+    series = weather_client.get_series(
+        forecast,
+        latitude=user_info.latitude,
+        longitude=user_info.longitude,
+        hourly=hourly,
+    )
 
-    match plot_type:
-        # temperature plot
+    match measure:
         case "temp":
-            for day in weather_info["forecast"]["forecastday"]:
-                if user_info["temp_unit"] == "celsius":
-                    y.append(int(day["day"]["avgtemp_c"]))
-                else:
-                    y.append(int(day["day"]["avgtemp_f"]))
-
-            if lang == "RU":
-                plt.ylabel(f"Температура, {lex.KB_LEXICON_RU[user_info['temp_unit']]}")
-                plt.title("График температуры")
-            else:
-                plt.ylabel(f"Temperature, {lex.KB_LEXICON_EN[user_info['temp_unit']]}")
-                plt.title("Temperature plot")
-
-        # wind speed plot
+            y = series.temp_c if unit == "celsius" else series.temp_c * 1.8 + 32
         case "wind":
-            for day in weather_info["forecast"]["forecastday"]:
-                if user_info["wind_unit"] == "kmph":
-                    y.append(int(day["day"]["maxwind_kph"]))
-                else:
-                    y.append(int(day["day"]["maxwind_kph"]) // 3.6)
-
-            if lang == "RU":
-                plt.ylabel(
-                    f"Скорость ветра, {lex.KB_LEXICON_RU[user_info['wind_unit']]}"
-                )
-                plt.title("График скорости ветра")
-            else:
-                plt.ylabel(f"Wind speed, {lex.KB_LEXICON_EN[user_info['wind_unit']]}")
-                plt.title("Wind speed plot")
-
-        # precipation plot
+            y = series.wind_kph if unit == "kmph" else series.wind_kph / 3.6
         case "precip":
-            for day in weather_info["forecast"]["forecastday"]:
-                y.append(int(day["day"]["totalprecip_mm"]))
-
-            if lang == "RU":
-                plt.ylabel("Осадки, мм")
-                plt.title("График осадков")
-            else:
-                plt.ylabel("Precipitation, mm")
-                plt.title("Precipitation plot")
-
-        # humidity plot
-        case "humid":
-            for day in weather_info["forecast"]["forecastday"]:
-                y.append(int(day["day"]["avghumidity"]))
-
-            if lang == "RU":
-                plt.ylabel("Влажность, %")
-                plt.title("График влажности")
-            else:
-                plt.ylabel("Humidity, %")
-                plt.title("Humidity plot")
-
-    plt.plot(x, y, color="blue", marker="o", markersize=6, markerfacecolor="black")
-    plt.savefig(f"{os.getcwd()}/temp/{user_id}_plot.png")
-    plt.close()
+            y = series.precip_mm
+        case _:
+            y = series.humidity
+
+    if hourly:
+        # the hours are shifted to the user time and the past ones are dropped
+        offset = int((now.utcoffset() or timedelta()).total_seconds())
+        # the hour starts by the local clock, the offset is not always whole hours
+        current_hour = int(now.replace(minute=0, second=0, microsecond=0).timestamp())
+        upcoming = series.time_epoch >= current_hour
+        hours = np.datetime_as_string(
+            (series.time_epoch[upcoming] + offset).astype("datetime64[s]"), unit="h"
+        )
+
+        x = tuple(f"{hour[8:10]} {hour[11:13]}:00" for hour in hours)
+        y = y[upcoming]
+        xlabel = "Часы" if lang == "RU" else "Hours"
+    else:
+        x = days
+        xlabel = "Дни" if lang == "RU" else "Days"
+
+    ylabel, title = _plot_labels(measure, unit, lang, hourly)
+
+    png = await plot_renderer.render(
+        x=x,
+        y=tuple(np.round(y, 1).tolist()),
+        xlabel=xlabel,
+        ylabel=ylabel,
+        title=title,
+    )
+    await plot_cache.set_png(key, png)
+
+    return CachedPlot(key=key, png=png)
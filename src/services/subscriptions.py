@@ -0,0 +1,199 @@
+import asyncio
+import itertools
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Iterator
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from redis.asyncio.client import Redis
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+import src.lexicon as lex
+from src.config import SubscriptionConfig
+from src.database import (
+    UserProfile,
+    claim_due_subscriptions,
+    get_subscription_timezones,
+    release_subscriptions,
+    unsubscribe,
+)
+from src.errors import DatabaseError, GetWeatherError
+from src.external_services import WeatherClient
+from src.metrics import SUBSCRIPTION_DELIVERIES
+
+from .sender import RateLimitedSender
+from .services import render_day, render_stale
+from .timezones import delivery_timezone
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriptionScheduler:
+    """
+    Background task which delivers the daily forecasts at the local time of the users.
+
+    The due subscribers are grouped by the forecast cache entry, so a group
+    costs a single upstream request however many users it has.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        config: SubscriptionConfig,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        weather_client: WeatherClient,
+    ) -> None:
+        self._config = config
+        self._sessionmaker = sessionmaker
+        self._weather_client = weather_client
+        self._sender = RateLimitedSender(redis=redis, config=config)
+        self._task: asyncio.Task | None = None
+
+    async def start(self, bot: Bot) -> None:
+        """
+        Start the scheduler, called on the dispatcher startup.
+        """
+
+        self._task = asyncio.create_task(self._run(bot))
+
+    async def close(self) -> None:
+        """
+        Stop the scheduler, called on the dispatcher shutdown.
+        """
+
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, bot: Bot) -> None:
+        while True:
+            try:
+                await self.tick(bot)
+            except DatabaseError as e:
+                logger.exception(e)
+            except Exception:
+                logger.exception("Daily forecast delivery failed")
+
+            await asyncio.sleep(self._config.interval)
+
+    async def tick(self, bot: Bot, now: datetime | None = None) -> int:
+        """
+        Deliver the forecasts of all the due subscribers, return the number of them.
+        """
+
+        now = now or datetime.now(timezone.utc)
+        groups: dict[tuple[str, date], list[UserProfile]] = defaultdict(list)
+
+        for timezone_str in await get_subscription_timezones(self._sessionmaker):
+            local = now.astimezone(delivery_timezone(timezone_str))
+            profiles = await claim_due_subscriptions(
+                timezone=timezone_str,
+                local_date=local.date(),
+                local_time=local.time().replace(tzinfo=None),
+                sessionmaker=self._sessionmaker,
+            )
+
+            for profile in profiles:
+                groups[(self._group(profile), local.date())].append(profile)
+
+        messages = await asyncio.gather(
+            *(self._render(day, group) for (_, day), group in groups.items())
+        )
+        await self._fan_out(bot, itertools.chain.from_iterable(messages))
+        return sum(len(group) for group in groups.values())
+
+    def _group(self, profile: UserProfile) -> str:
+        # the users sharing a forecast cache entry share the upstream request
+        request = {
+            "today": False,
+            "latitude": profile.latitude,
+            "longitude": profile.longitude,
+            "lang": profile.language.lower(),
+        }
+        return self._weather_client.cache_key(**request) or str(request)
+
+    async def _render(
+        self, day: date, group: list[UserProfile]
+    ) -> list[tuple[UserProfile, date, str]]:
+        first = group[0]
+
+        try:
+            forecast = await self._weather_client.get_forecast(
+                False,
+                latitude=first.latitude,
+                longitude=first.longitude,
+                lang=first.language.lower(),
+            )
+        except GetWeatherError:
+            logger.warning("Can not get the daily forecast for %s users", len(group))
+            SUBSCRIPTION_DELIVERIES.labels(result="failed").inc(len(group))
+            # the next tick tries again instead of skipping the day
+            await self._release([profile.user_id for profile in group], day)
+            return []
+
+        forecast_day = forecast.get_day(day.strftime("%d"))
+
+        if forecast_day is None:
+            SUBSCRIPTION_DELIVERIES.labels(result="failed").inc(len(group))
+            return []
+
+        # the message only differs in the units inside the group
+        texts: dict[tuple[str, str], str] = {}
+
+        for profile in group:
+            units = (profile.temp_unit, profile.wind_unit)
+
+            if units not in texts:
+                header = lex.LEXICON_RU if profile.language == "RU" else lex.LEXICON_EN
+                texts[units] = (
+                    header["daily_forecast"]
+                    + render_day(forecast_day, profile.language, *units)
+                    + render_stale(forecast, profile.language)
+                )
+
+        return [
+            (profile, day, texts[(profile.temp_unit, profile.wind_unit)])
+            for profile in group
+        ]
+
+    async def _fan_out(
+        self, bot: Bot, messages: Iterator[tuple[UserProfile, date, str]]
+    ) -> None:
+        # a fixed number of workers share the iterator instead of a task per message
+        async def worker() -> None:
+            for profile, day, text in messages:
+                await self._send(bot, profile, day, text)
+
+        await asyncio.gather(*(worker() for _ in range(self._config.concurrency)))
+
+    async def _send(self, bot: Bot, profile: UserProfile, day: date, text: str) -> None:
+        try:
+            sent = await self._sender.send(bot, profile.user_id, text)
+        except TelegramAPIError as e:
+            logger.warning(
+                "Can not deliver the daily forecast to %s: %s", profile.user_id, e
+            )
+            SUBSCRIPTION_DELIVERIES.labels(result="failed").inc()
+            await self._release([profile.user_id], day)
+            return
+
+        if sent:
+            SUBSCRIPTION_DELIVERIES.labels(result="sent").inc()
+            return
+
+        SUBSCRIPTION_DELIVERIES.labels(result="blocked").inc()
+
+        try:
+            # the chat is gone, do not try to deliver there anymore
+            await unsubscribe(profile.user_id, self._sessionmaker)
+        except DatabaseError as e:
+            logger.exception(e)
+
+    async def _release(self, user_ids: list[int], day: date) -> None:
+        try:
+            await release_subscriptions(user_ids, day, self._sessionmaker)
+        except DatabaseError as e:
+            logger.exception(e)
@@ -0,0 +1,64 @@
+import asyncio
+import threading
+from datetime import tzinfo
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+import pytz
+
+if TYPE_CHECKING:
+    from timezonefinder import TimezoneFinder
+
+# the finder loads its polygon data once and is not thread-safe
+_finder: "TimezoneFinder | None" = None
+_finder_lock = threading.Lock()
+
+
+def get_finder() -> "TimezoneFinder":
+    """
+    Get the shared timezone finder.
+    """
+
+    global _finder
+
+    with _finder_lock:
+        if _finder is None:
+            # numpy and the polygon data are loaded on the first use,
+            # not on the start of the bot
+            from timezonefinder import TimezoneFinder
+
+            _finder = TimezoneFinder()
+
+    return _finder
+
+
+@lru_cache(maxsize=4096)
+def _cell_timezone(latitude: float, longitude: float) -> str | None:
+    finder = get_finder()
+
+    with _finder_lock:
+        return finder.certain_timezone_at(lat=latitude, lng=longitude)
+
+
+def timezone_at(latitude: float, longitude: float) -> str | None:
+    """
+    Get the timezone name of the location rounded to ~1 km.
+    """
+
+    return _cell_timezone(round(float(latitude), 2), round(float(longitude), 2))
+
+
+async def resolve_timezone(latitude: float, longitude: float) -> str | None:
+    """
+    Get the timezone name of the location without blocking the event loop.
+    """
+
+    return await asyncio.to_thread(timezone_at, latitude, longitude)
+
+
+def delivery_timezone(timezone: str | None) -> tzinfo:
+    """
+    Get the timezone of the daily forecast delivery, UTC if the location has none.
+    """
+
+    return pytz.timezone(timezone or "UTC")
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import uuid
+
+from redis.asyncio.client import Redis
+from redis.exceptions import RedisError
+
+from src.cache import ForecastCache
+from src.config import WarmerConfig
+from src.errors import GetWeatherError
+from src.external_services import WeatherClient
+from src.metrics import WARMER_REFRESHES
+
+logger = logging.getLogger(__name__)
+
+
+class CacheWarmer:
+    """
+    Background task which refreshes the most requested forecasts before they expire.
+
+    The request counts decay with the configured half-life, so the ranking
+    follows the current demand. Only one bot replica warms the cache per
+    interval and it makes no more than the budgeted number of upstream calls.
+    """
+
+    leader_key = "warmer:leader"
+
+    def __init__(
+        self,
+        redis: Redis,
+        config: WarmerConfig,
+        cache: ForecastCache,
+        weather_client: WeatherClient,
+    ) -> None:
+        self._redis = redis
+        self._config = config
+        self._cache = cache
+        self._weather_client = weather_client
+        self._token = uuid.uuid4().hex
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """
+        Start the warmer, called on the dispatcher startup.
+        """
+
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """
+        Stop the warmer, called on the dispatcher shutdown.
+        """
+
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._config.interval)
+
+            try:
+                if await self._is_leader():
+                    await self.warm()
+            except RedisError as e:
+                logger.warning("Cache warmer is unavailable: %s", e)
+            except Exception:
+                logger.exception("Cache warming failed")
+
+    async def _is_leader(self) -> bool:
+        # the key expires by itself, so the next interval may go to any replica
+        return bool(
+            await self._redis.set(
+                self.leader_key,
+                self._token,
+                nx=True,
+                px=int(self._config.interval * 1000),
+            )
+        )
+
+    async def warm(self) -> int:
+        """
+        Refresh the popular forecasts expiring soon, return the number of them.
+        """
+
+        await self._cache.decay_popularity(
+            factor=0.5 ** (self._config.interval / self._config.half_life),
+            min_score=0.01,
+        )
+
+        keys = await self._cache.popular(self._config.top)
+        ttls = await self._cache.ttls(keys)
+
+        # the keys are ordered by popularity, so the budget goes to the hottest ones
+        expiring = [
+            key for key, ttl in zip(keys, ttls) if ttl < self._config.refresh_ahead
+        ][: self._config.budget]
+
+        results = await asyncio.gather(
+            *(self._refresh(key) for key in expiring), return_exceptions=True
+        )
+        return sum(res is True for res in results)
+
+    async def _refresh(self, key: str) -> bool:
+        try:
+            await self._weather_client.refresh(key)
+        except GetWeatherError:
+            WARMER_REFRESHES.labels(result="failed").inc()
+            return False
+
+        WARMER_REFRESHES.labels(result="refreshed").inc()
+        return True
@@ -1 +1,2 @@
 from .states import *  # noqa: F403
+from .storage import *  # noqa: F403
@@ -0,0 +1,197 @@
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseEventIsolation, StorageKey
+from aiogram.fsm.storage.memory import DisabledEventIsolation
+from aiogram.fsm.storage.redis import RedisStorage
+
+from src.metrics import FSM_STORAGE_LATENCY
+
+
+class MeasuredRedisStorage(RedisStorage):
+    """
+    Redis FSM storage which measures every round trip.
+    """
+
+    async def set_state(
+        self, key: StorageKey, state: str | State | None = None
+    ) -> None:
+        with FSM_STORAGE_LATENCY.labels(operation="set_state").time():
+            await super().set_state(key, state)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        with FSM_STORAGE_LATENCY.labels(operation="get_state").time():
+            return await super().get_state(key)
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        with FSM_STORAGE_LATENCY.labels(operation="set_data").time():
+            await super().set_data(key, data)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        with FSM_STORAGE_LATENCY.labels(operation="get_data").time():
+            return await super().get_data(key)
+
+
+@dataclass(slots=True)
+class _Record:
+    state: str | None = None
+    data: dict[str, Any] = field(default_factory=dict)
+    loaded: bool = False
+    state_changed: bool = False
+    data_changed: bool = False
+
+
+class PipelinedRedisStorage(MeasuredRedisStorage):
+    """
+    Redis FSM storage which makes at most one read and one write per update.
+
+    Inside buffer() the state and the data of a key are read together on the
+    first access, the changes are kept in memory and written in one pipeline
+    at the end. Outside of it every call is a round trip, as usual.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._records: ContextVar[dict[StorageKey, _Record] | None] = ContextVar(
+            "fsm_records", default=None
+        )
+
+    def create_isolation(
+        self, isolation: BaseEventIsolation | None = None
+    ) -> "PipelinedEventIsolation":
+        return PipelinedEventIsolation(storage=self, isolation=isolation)
+
+    @asynccontextmanager
+    async def buffer(self) -> AsyncIterator[None]:
+        """
+        Buffer the reads and the writes until the end of the block.
+        """
+
+        if self._records.get() is not None:
+            yield
+            return
+
+        records: dict[StorageKey, _Record] = {}
+        token = self._records.set(records)
+
+        try:
+            yield
+        finally:
+            self._records.reset(token)
+            await self._flush(records)
+
+    async def set_state(
+        self, key: StorageKey, state: str | State | None = None
+    ) -> None:
+        if (record := self._record(key)) is None:
+            return await super().set_state(key, state)
+
+        record.state = state.state if isinstance(state, State) else state
+        record.state_changed = True
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        if (record := self._record(key)) is None:
+            return await super().get_state(key)
+
+        await self._load(key, record)
+        return record.state
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        if (record := self._record(key)) is None:
+            return await super().set_data(key, data)
+
+        record.data = data.copy()
+        record.data_changed = True
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        if (record := self._record(key)) is None:
+            return await super().get_data(key)
+
+        await self._load(key, record)
+        return record.data.copy()
+
+    def _record(self, key: StorageKey) -> _Record | None:
+        if (records := self._records.get()) is None:
+            return None
+
+        return records.setdefault(key, _Record())
+
+    async def _load(self, key: StorageKey, record: _Record) -> None:
+        if record.loaded:
+            return
+
+        with FSM_STORAGE_LATENCY.labels(operation="load").time():
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.get(self.key_builder.build(key, "state"))
+                pipe.get(self.key_builder.build(key, "data"))
+                state, data = await pipe.execute()
+
+        # the changes made before the first read win over the stored values
+        if not record.state_changed:
+            record.state = state.decode() if isinstance(state, bytes) else state
+        if not record.data_changed:
+            record.data = {} if data is None else self.json_loads(data)
+        record.loaded = True
+
+    async def _flush(self, records: dict[StorageKey, _Record]) -> None:
+        changed = [
+            (key, record)
+            for key, record in records.items()
+            if record.state_changed or record.data_changed
+        ]
+
+        if not changed:
+            return
+
+        with FSM_STORAGE_LATENCY.labels(operation="flush").time():
+            async with self.redis.pipeline(transaction=True) as pipe:
+                for key, record in changed:
+                    if record.state_changed:
+                        self._write(pipe, key, "state", record.state, self.state_ttl)
+                    if record.data_changed:
+                        self._write(
+                            pipe,
+                            key,
+                            "data",
+                            self.json_dumps(record.data) if record.data else None,
+                            self.data_ttl,
+                        )
+
+                await pipe.execute()
+
+    def _write(self, pipe, key: StorageKey, part: str, value, ttl) -> None:
+        redis_key = self.key_builder.build(key, part)
+
+        if value is None:
+            pipe.delete(redis_key)
+        else:
+            pipe.set(redis_key, value, ex=ttl)
+
+
+class PipelinedEventIsolation(BaseEventIsolation):
+    """
+    Event isolation which buffers the FSM storage while an update is handled.
+
+    The dispatcher holds the isolation lock around the state lookup and the
+    handlers, so the whole update shares one read and one write.
+    """
+
+    def __init__(
+        self,
+        storage: PipelinedRedisStorage,
+        isolation: BaseEventIsolation | None = None,
+    ) -> None:
+        self._storage = storage
+        self._isolation = isolation or DisabledEventIsolation()
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncIterator[None]:
+        async with self._isolation.lock(key):
+            async with self._storage.buffer():
+                yield
+
+    async def close(self) -> None:
+        await self._isolation.close()
@@ -0,0 +1,498 @@
+import gc
+
+# see bot.py, the workers import the module as __mp_main__,
+# so their collector stays on
+if __name__ == "__main__":
+    gc.disable()
+
+import asyncio
+import hmac
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from contextlib import suppress
+from multiprocessing.context import BaseContext
+from multiprocessing.process import BaseProcess
+from multiprocessing.queues import Queue
+from queue import Empty
+from typing import Any, Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiohttp import web
+from redis.asyncio.client import Redis
+
+from bot import connect, setup_dispatcher
+from src.config import Config, SupervisorConfig, WebhookConfig, load_config
+from src.database import dispose_sessionmaker, get_sessionmaker
+from src.handlers import router
+from src.keyboards import set_main_menu
+from src.states import PipelinedRedisStorage
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = 1.0
+
+Worker = Callable[[int, Queue, Any], None]
+
+
+def shard_key(update: dict[str, Any]) -> int:
+    """
+    Get the id of the user who has sent the update, or of the chat.
+    """
+
+    for value in update.values():
+        if not isinstance(value, dict):
+            continue
+
+        for field in ("from", "user", "chat"):
+            if isinstance(sender := value.get(field), dict) and "id" in sender:
+                return sender["id"]
+
+    return update.get("update_id", 0)
+
+
+class UpdateWorker:
+    """
+    Worker process which handles the updates of its shard of the users.
+
+    The updates of one user are handled one after another in the order
+    they have arrived, the updates of different users concurrently.
+    """
+
+    def __init__(
+        self,
+        index: int,
+        queue: Queue,
+        heartbeats: Any,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        data: dict[str, Any],
+        max_concurrent_updates: int,
+    ) -> None:
+        self._index = index
+        self._queue = queue
+        self._heartbeats = heartbeats
+        self._dispatcher = dispatcher
+        self._bot = bot
+        self._data = data
+        self._semaphore = asyncio.Semaphore(max_concurrent_updates)
+        self._tails: dict[int, asyncio.Task] = {}
+
+    async def run(self) -> None:
+        """
+        Handle the updates from the queue until the stop sentinel.
+        """
+
+        heartbeat = asyncio.create_task(self._beat())
+
+        try:
+            while (update := await self._get()) is not None:
+                self._submit(update)
+
+            # the updates taken before the sentinel are finished, not dropped
+            await asyncio.gather(*self._tails.values(), return_exceptions=True)
+        finally:
+            heartbeat.cancel()
+
+    async def _get(self) -> dict[str, Any] | None:
+        # the timeout lets the blocked thread go if the worker is failing
+        while True:
+            with suppress(Empty):
+                return await asyncio.to_thread(
+                    self._queue.get, timeout=HEARTBEAT_INTERVAL
+                )
+
+    def _submit(self, update: dict[str, Any]) -> None:
+        key = shard_key(update)
+        task = asyncio.create_task(self._handle(update, self._tails.get(key)))
+        self._tails[key] = task
+        task.add_done_callback(lambda t: self._forget(key, t))
+
+    def _forget(self, key: int, task: asyncio.Task) -> None:
+        if self._tails.get(key) is task:
+            del self._tails[key]
+
+    async def _handle(
+        self, update: dict[str, Any], previous: asyncio.Task | None
+    ) -> None:
+        if previous is not None:
+            await asyncio.wait([previous])
+
+        async with self._semaphore:
+            try:
+                await self._dispatcher.feed_raw_update(self._bot, update, **self._data)
+            except Exception:
+                logger.exception("Update %s failed", update.get("update_id"))
+
+    async def _beat(self) -> None:
+        while True:
+            self._heartbeats[self._index] = time.time()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+
+async def _worker_main(index: int, queue: Queue, heartbeats: Any) -> None:
+    config = load_config()
+
+    # every worker serves its own metrics next to the supervisor health port
+    config.metrics.port += index + 1
+    # the background tasks run once, in the first worker
+    config.subscriptions.enabled = config.subscriptions.enabled and index == 0
+    config.warmer.enabled = config.warmer.enabled and index == 0
+
+    redis = Redis(host=config.redis.host, port=config.redis.port)
+    sessionmaker = get_sessionmaker(config.postgres)
+    bot = Bot(token=config.bot.token, default=DefaultBotProperties(parse_mode="HTML"))
+    disp, data = setup_dispatcher(
+        config=config,
+        redis=redis,
+        storage=PipelinedRedisStorage(
+            redis=redis,
+            state_ttl=config.fsm.state_ttl or None,
+            data_ttl=config.fsm.data_ttl or None,
+        ),
+        sessionmaker=sessionmaker,
+    )
+    worker = UpdateWorker(
+        index=index,
+        queue=queue,
+        heartbeats=heartbeats,
+        dispatcher=disp,
+        bot=bot,
+        data={"dispatcher": disp, **data},
+        max_concurrent_updates=config.supervisor.max_concurrent_updates,
+    )
+
+    await asyncio.gather(
+        connect(redis, sessionmaker),
+        disp.emit_startup(bot=bot, dispatcher=disp, bots=[bot], **data),
+    )
+    gc.freeze()
+    logger.info("Worker %s is started", index)
+
+    try:
+        await worker.run()
+    finally:
+        await disp.emit_shutdown(bot=bot, dispatcher=disp, bots=[bot], **data)
+        await dispose_sessionmaker(sessionmaker)
+        await bot.session.close()
+        logger.info("Worker %s is stopped", index)
+
+
+def run_worker(index: int, queue: Queue, heartbeats: Any) -> None:
+    """
+    Entry point of the worker process.
+    """
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f"%(asctime)s | worker {index} | %(levelname)s | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    # the supervisor decides when the workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_worker_main(index, queue, heartbeats))
+
+
+class Supervisor:
+    """
+    Run the worker processes and shard the updates between them by user.
+
+    Dead workers are started again, SIGHUP restarts all of them one by one
+    without losing the queued updates.
+    """
+
+    def __init__(
+        self,
+        config: SupervisorConfig,
+        workers: int,
+        target: Worker = run_worker,
+        context: BaseContext | None = None,
+    ) -> None:
+        self._config = config
+        self._target = target
+        self._context = context or multiprocessing.get_context("spawn")
+        self._queues: list[Queue] = [self._context.Queue() for _ in range(workers)]
+        self._heartbeats = self._context.Array("d", workers, lock=False)
+        self._processes: list[BaseProcess | None] = [None] * workers
+        self._restarts = [0] * workers
+        self._routed = [0] * workers
+        self._restarting: set[int] = set()
+
+    def start(self) -> None:
+        """
+        Start all the workers.
+        """
+
+        for index in range(len(self._queues)):
+            self._spawn(index)
+
+    def route(self, update: dict[str, Any]) -> None:
+        """
+        Pass the update to the worker of its user.
+        """
+
+        index = shard_key(update) % len(self._queues)
+        self._queues[index].put(update)
+        self._routed[index] += 1
+
+    async def monitor(self) -> None:
+        """
+        Start again the workers which have died.
+        """
+
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+            for index, process in enumerate(self._processes):
+                if index in self._restarting or (process and process.is_alive()):
+                    continue
+
+                logger.error(
+                    "Worker %s has exited with %s, restarting",
+                    index,
+                    process.exitcode,
+                )
+                self._restarts[index] += 1
+                self._spawn(index)
+
+    async def restart(self) -> None:
+        """
+        Restart the workers one by one, the others keep handling the updates.
+        """
+
+        for index in range(len(self._queues)):
+            self._restarting.add(index)
+
+            try:
+                await self._stop(index)
+                self._spawn(index)
+                self._restarts[index] += 1
+            finally:
+                self._restarting.discard(index)
+
+        logger.info("All workers are restarted")
+
+    async def stop(self) -> None:
+        """
+        Stop all the workers letting them finish the queued updates.
+        """
+
+        self._restarting.update(range(len(self._queues)))
+        await asyncio.gather(*(self._stop(i) for i in range(len(self._queues))))
+
+    def health(self) -> dict[str, Any]:
+        """
+        Get the state of every worker and whether all of them are healthy.
+        """
+
+        now = time.time()
+        workers = []
+
+        for index, process in enumerate(self._processes):
+            heartbeat_age = now - self._heartbeats[index]
+            queued = None
+
+            with suppress(NotImplementedError):
+                queued = self._queues[index].qsize()
+
+            workers.append(
+                {
+                    "index": index,
+                    "pid": process.pid if process else None,
+                    "alive": bool(process and process.is_alive()),
+                    "healthy": bool(process and process.is_alive())
+                    and heartbeat_age < self._config.heartbeat_timeout,
+                    "heartbeat_age": round(heartbeat_age, 3),
+                    "restarts": self._restarts[index],
+                    "routed": self._routed[index],
+                    "queued": queued,
+                }
+            )
+
+        return {
+            "healthy": all(worker["healthy"] for worker in workers),
+            "workers": workers,
+        }
+
+    def _spawn(self, index: int) -> None:
+        # the new worker gets a fresh heartbeat deadline to start up
+        self._heartbeats[index] = time.time()
+        process = self._context.Process(
+            target=self._target,
+            args=(index, self._queues[index], self._heartbeats),
+            name=f"worker-{index}",
+        )
+        process.start()
+        self._processes[index] = process
+
+    async def _stop(self, index: int) -> None:
+        process = self._processes[index]
+
+        if process is None or not process.is_alive():
+            return
+
+        # the sentinel goes after the queued updates, so they are handled first
+        self._queues[index].put(None)
+        await asyncio.to_thread(process.join, self._config.shutdown_timeout)
+
+        if process.is_alive():
+            logger.warning("Worker %s has not stopped in time, terminating", index)
+            process.terminate()
+            await asyncio.to_thread(process.join)
+
+
+async def poll(bot: Bot, supervisor: Supervisor) -> None:
+    """
+    Receive the updates with long polling and route them to the workers.
+    """
+
+    offset = None
+    allowed_updates = router.resolve_used_update_types()
+
+    while True:
+        try:
+            updates = await bot.get_updates(
+                offset=offset, timeout=30, allowed_updates=allowed_updates
+            )
+        except Exception as e:
+            logger.warning("Can not get updates: %s", e)
+            await asyncio.sleep(1)
+            continue
+
+        for update in updates:
+            supervisor.route(
+                update.model_dump(mode="json", by_alias=True, exclude_none=True)
+            )
+            offset = update.update_id + 1
+
+
+def create_app(supervisor: Supervisor) -> web.Application:
+    """
+    Build the app with the aggregate health endpoint.
+    """
+
+    async def health(request: web.Request) -> web.Response:
+        state = supervisor.health()
+        return web.json_response(state, status=200 if state["healthy"] else 503)
+
+    app = web.Application()
+    app.router.add_get("/health", health)
+    return app
+
+
+def create_webhook_app(
+    supervisor: Supervisor, webhook: WebhookConfig
+) -> web.Application:
+    """
+    Build the public app which receives the updates from Telegram.
+    """
+
+    async def receive(request: web.Request) -> web.Response:
+        secret = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+
+        # the comparison takes the same time wherever the tokens differ
+        if webhook.secret and not hmac.compare_digest(
+            secret.encode(), webhook.secret.encode()
+        ):
+            return web.Response(status=401)
+
+        supervisor.route(await request.json())
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(webhook.path, receive)
+    return app
+
+
+async def _serve(app: web.Application, host: str, port: int) -> web.AppRunner:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    return runner
+
+
+async def main(config: Config) -> None:
+    workers = config.supervisor.workers or os.cpu_count() or 1
+    supervisor = Supervisor(config=config.supervisor, workers=workers)
+    supervisor.start()
+    logger.info("Started %s workers", workers)
+
+    bot = Bot(token=config.bot.token, default=DefaultBotProperties(parse_mode="HTML"))
+    webhook = config.webhook if config.webhook.enabled else None
+    # the health endpoint stays private, the webhook has its own public port
+    runners = [
+        await _serve(
+            create_app(supervisor), config.supervisor.host, config.supervisor.port
+        )
+    ]
+
+    steps = [set_main_menu(bot)]
+
+    if webhook is not None:
+        runners.append(
+            await _serve(
+                create_webhook_app(supervisor, webhook), webhook.host, webhook.port
+            )
+        )
+
+        # without the public url the endpoint only accepts local test updates
+        if webhook.url:
+            steps.append(
+                bot.set_webhook(
+                    url=f"{webhook.url.rstrip('/')}{webhook.path}",
+                    secret_token=webhook.secret or None,
+                    allowed_updates=router.resolve_used_update_types(),
+                )
+            )
+    else:
+        steps.append(bot.delete_webhook(drop_pending_updates=True))
+
+    await asyncio.gather(*steps)
+    gc.freeze()
+    gc.enable()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    tasks = [asyncio.create_task(supervisor.monitor())]
+
+    if webhook is None:
+        tasks.append(asyncio.create_task(poll(bot, supervisor)))
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop.set)
+
+    with suppress(NotImplementedError):
+        loop.add_signal_handler(
+            signal.SIGHUP,
+            lambda: tasks.append(asyncio.create_task(supervisor.restart())),
+        )
+
+    try:
+        await stop.wait()
+    finally:
+        # stop receiving first, then let the workers finish what they have got
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for runner in runners:
+            await runner.cleanup()
+        await supervisor.stop()
+        await bot.session.close()
+        logger.info("Supervisor is stopped")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | supervisor | %(levelname)s | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    try:
+        asyncio.run(main(load_config()))
+    except Exception as e:
+        logger.exception(e)